@@ -0,0 +1,19 @@
+"""FileRoulette benchmarks.
+
+Each benchmark is a script which can be run from the root of the repository,
+for example:
+
+    python -m benchmarks.parsing
+
+Contents
+--------
+parsing.py
+    Compare the compiled extraction rules with the hand-written parsers.
+pipelining.py
+    Compare pipelined HEAD probes with HEAD probes sent through requests.
+suite.py
+    Time the hot paths of a scan, with seeded inputs and JSON results.
+pages/
+    Sample pages from the supported sites, used by the parsing and suite
+    benchmarks.
+"""
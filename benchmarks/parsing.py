@@ -0,0 +1,108 @@
+"""Compare the compiled extraction rules with the hand-written parsers.
+
+Every sample page in the `pages` folder is checked many times over, once with
+the module's compiled extraction rules, and once with the hand-written
+`check_output` the module used before (which is reproduced below). The sample
+pages follow the layout of the real pages, with the same amount of
+surrounding markup.
+"""
+
+import argparse
+import json
+import os
+import re
+import timeit
+
+from bs4 import BeautifulSoup
+
+from fileroulette.modules import BaseModule, gofileio, upfile
+
+# The folder holding the sample pages.
+PAGES_DIR = os.path.join(os.path.dirname(__file__), "pages")
+# The default number of times each page is checked.
+DEF_NUMBER = 2000
+
+
+def legacy_upfile(content):
+    """Check an UploadFiles.io page the way the module used to."""
+    if "Sorry it's gone..." in content or "Premium Access Only" in content:
+        return False
+    soup = BeautifulSoup(content, features="html.parser")
+    _, post = BaseModule._split_after(content, '<div class="details">')
+    _, post = BaseModule._split_after(post, "<h3>")
+    file_name, _ = BaseModule._split_before(post, "</h3>")
+    details_div = soup.find("div", class_="details")
+    size_string = re.search("Size:(.*)", str(details_div.p)).group(0)
+    _, file_size = BaseModule._split_after(size_string, ": ")
+    if file_name != "None" and "" not in [file_name, file_size]:
+        return {"File Name": file_name, "File Size": file_size}
+    return False
+
+
+def legacy_gofileio(content):
+    """Check a Gofile.io API response the way the module used to."""
+    data = json.loads(content)
+    if data["status"] != "error":
+        return {
+            "File Name": data["data"][0]["name"],
+            "File Size": data["data"][0]["size"],
+        }
+    return False
+
+
+# The sample pages of each module, with the legacy parser they're compared to.
+SUITES = [
+    (upfile.Module, legacy_upfile, "upfile_"),
+    (gofileio.Module, legacy_gofileio, "gofileio_"),
+]
+
+
+def main():
+    """Run the benchmark and print the results."""
+    argparser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    argparser.add_argument(
+        "-n",
+        dest="number",
+        type=int,
+        default=DEF_NUMBER,
+        help="number of times each page is checked "
+        "(default: {})".format(DEF_NUMBER),
+    )
+    args = argparser.parse_args()
+
+    print(
+        "{:<22} {:>12} {:>12} {:>8}".format(
+            "page", "legacy (us)", "rules (us)", "speedup"
+        )
+    )
+    for module_class, legacy, prefix in SUITES:
+        module = module_class(agent=False, proxy=False)
+        for name in sorted(os.listdir(PAGES_DIR)):
+            if not name.startswith(prefix):
+                continue
+            with open(os.path.join(PAGES_DIR, name)) as page_file:
+                content = page_file.read()
+            # Both parsers must agree before their speeds are compared. (The
+            # legacy UploadFiles.io parser leaves "</p>" on the end of the file
+            # size, so only their verdicts are compared.)
+            if bool(module.check_output(content)) != bool(legacy(content)):
+                raise AssertionError(
+                    "The rules disagree with the legacy parser on "
+                    "{}".format(name)
+                )
+            timings = [
+                timeit.timeit(lambda: check(content), number=args.number)
+                for check in (legacy, module.check_output)
+            ]
+            (legacy_time, rules_time) = (
+                timing / args.number * 1e6 for timing in timings
+            )
+            print(
+                "{:<22} {:>12.1f} {:>12.1f} {:>7.1f}x".format(
+                    name, legacy_time, rules_time, legacy_time / rules_time
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""Compare pipelined HEAD probes with HEAD probes sent through requests.
+
+A local HTTP/1.1 server is started in a separate process (so that it doesn't
+compete with the probes for the interpreter lock), answering HEAD requests
+with "404 Not Found" for most keys and "200 OK" for the rest. The same keys
+are then probed twice, once through `_get_page_header` as it is normally
+used, and once with the HEAD requests pipelined. Both must see the same
+status codes before their speeds are compared. With `--proxy`, the probes of
+both kinds go through a SOCKS5 proxy.
+"""
+
+import argparse
+import hashlib
+import multiprocessing
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from fileroulette.libs.proxies import ProxyCheck
+from fileroulette.modules import BaseModule
+
+# The default number of keys probed by each kind of probe.
+DEF_NUMBER = 2000
+# The default number of HEAD requests pipelined at a time.
+DEF_DEPTHS = "16"
+# The seed of the keyspace walk, so both kinds of probe see the same keys.
+SEED = 1
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Answer HEAD requests as a file host would."""
+
+    protocol_version = "HTTP/1.1"
+    # Like most production servers, send each response straight away rather
+    # than waiting to batch it up with the next.
+    disable_nagle_algorithm = True
+
+    def do_HEAD(self):
+        """Send "200 OK" for one key in ten, and "404 Not Found" otherwise."""
+        digest = hashlib.md5(self.path.encode()).digest()
+        if digest[0] < 26:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Content-Length", "1024")
+        else:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        """Keep quiet."""
+
+
+def _serve(connection):
+    """Run the local server, sending its port back over a pipe."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    connection.send(server.server_address[1])
+    server.serve_forever()
+
+
+class LocalSite(BaseModule):
+    """A module which probes the local server."""
+
+    allowed_chars = "a1"
+    key_length = 8
+    learn_fingerprints = False
+
+    def __init__(self, port):
+        """Point the module at the local server."""
+        self.base_url = "http://127.0.0.1:{}/{{}}".format(port)
+        super(LocalSite, self).__init__("local", agent=False, proxy=False)
+        self.select_shard(0, 1, SEED)
+
+
+def run(port, number, depth, proxy):
+    """Probe `number` keys, and return their status codes and timings.
+
+    Parameters
+    ----------
+    port : int
+        The port of the local server.
+    number : int
+        The number of keys to probe.
+    depth : int
+        The number of HEAD requests to pipeline at a time, or 0 to send them
+        through requests.
+    proxy : tuple or None
+        The (ip, port) of a SOCKS5 proxy to probe through.
+
+    Returns
+    -------
+    codes : list
+        The status code seen for every key.
+    wall : float
+        The time (in seconds) the probes took.
+    cpu : float
+        The processor time (in seconds) the probes took.
+
+    """
+    module = LocalSite(port)
+    module.pipeline_depth = depth
+    if proxy:
+        module.use_proxies([ProxyCheck(proxy, True, None)])
+    session = module._create_new_session()
+    codes = list()
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    for _ in range(number):
+        url = module._next_url(session)
+        (response, _) = module._get_page_header(session, url)
+        codes.append(response.status_code)
+        response.close()
+    wall = time.perf_counter() - wall
+    cpu = time.process_time() - cpu
+    if module.proxy_pool:
+        module.proxy_pool.close()
+    return (codes, wall, cpu)
+
+
+def main():
+    """Run the benchmark and print the results."""
+    argparser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    argparser.add_argument(
+        "-n",
+        dest="number",
+        type=int,
+        default=DEF_NUMBER,
+        help="number of keys probed each way (default: {})".format(
+            DEF_NUMBER
+        ),
+    )
+    argparser.add_argument(
+        "-d",
+        dest="depths",
+        default=DEF_DEPTHS,
+        help="comma-separated pipeline depths to try "
+        "(default: {})".format(DEF_DEPTHS),
+    )
+    argparser.add_argument(
+        "--proxy",
+        dest="proxy",
+        help="probe through the SOCKS5 proxy at IP:PORT",
+    )
+    args = argparser.parse_args()
+    proxy = None
+    if args.proxy:
+        (ip, port) = args.proxy.split(":")
+        proxy = (ip, int(port))
+
+    (receiver, sender) = multiprocessing.Pipe(duplex=False)
+    server = multiprocessing.Process(target=_serve, args=(sender,))
+    server.daemon = True
+    server.start()
+    port = receiver.recv()
+    try:
+        print(
+            "{:<12} {:>10} {:>10} {:>14} {:>8}".format(
+                "probe", "probes/s", "wall (s)", "cpu (us/key)", "speedup"
+            )
+        )
+        (expected, base_wall, base_cpu) = run(port, args.number, 0, proxy)
+        rows = [("requests", base_wall, base_cpu)]
+        for depth in (int(depth) for depth in args.depths.split(",")):
+            (codes, wall, cpu) = run(port, args.number, depth, proxy)
+            if codes != expected:
+                raise AssertionError(
+                    "Pipelining at depth {} saw different status "
+                    "codes.".format(depth)
+                )
+            rows.append(("depth {}".format(depth), wall, cpu))
+        for name, wall, cpu in rows:
+            print(
+                "{:<12} {:>10.0f} {:>10.2f} {:>14.1f} {:>7.1f}x".format(
+                    name,
+                    args.number / wall,
+                    wall,
+                    cpu / args.number * 1e6,
+                    base_wall / wall,
+                )
+            )
+    finally:
+        server.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,454 @@
+"""Time the hot paths of a scan, with repeatable inputs and timings.
+
+Every benchmark is timed the same way: the random number generator is seeded
+with SEED, the benchmark's inputs are built, and `timeit` picks a number of
+calls that takes at least `--min-time` seconds. Those calls are then timed
+`--repeat` times over, with garbage collection off, and the fastest, median
+and spread of the runs are reported per call. The benchmarks are:
+
+urlgen/<module>
+    `urlgen` with the module's template, charset and key length.
+keygen/<module>
+    `_next_url_batch`, which turns the next URL_BATCH_SIZE positions of the
+    keyspace walk into URLs. As this replaced `urlgen`, the suite fails (with
+    exit status 1) if it takes longer per URL than `urlgen/<module>`.
+check_output/<page>
+    The module's `check_output` on each sample page in the `pages` folder,
+    both live and dead.
+dispatch/<module>
+    `_get_page_content` on a seeded mix of status codes (see DISPATCH_MIX),
+    answered instantly by a canned transport instead of the network, so only
+    the module's own work is timed: throttling, status dispatch, retries,
+    reading (or streaming) the page, and the counters.
+split_after/<hit or miss>, split_before/<hit or miss>
+    `_split_after` and `_split_before` on a live page, with a target that is
+    on the page and one that isn't.
+session/<default or random_agent>
+    `_create_new_session`, with and without a random user agent.
+load_proxies/<count>
+    `_load_proxies` on a seeded `proxies.txt` of `--proxies` lines.
+
+With `--json FILE`, the results are also written to FILE as JSON, along with
+the Python version and platform they were measured on. With `--compare FILE`,
+each benchmark is compared with the results saved in FILE earlier, so a
+change to a parser or the key generator can be measured before and after:
+
+    python -m benchmarks.suite --json before.json
+    python -m benchmarks.suite --compare before.json
+"""
+
+import argparse
+import atexit
+import datetime
+import itertools
+import json
+import os
+import platform
+import random
+import re
+import shutil
+import statistics
+import sys
+import tempfile
+import timeit
+
+import requests
+
+from fileroulette import MODULE_DICT
+from fileroulette.libs.urlgen import urlgen
+from fileroulette.modules import URL_BATCH_SIZE
+
+# The folder holding the sample pages.
+PAGES_DIR = os.path.join(os.path.dirname(__file__), "pages")
+# The seed of the random number generator, and of each module's keyspace
+# walk, so that every run sees the same inputs.
+SEED = 1
+# The default number of times each benchmark is timed.
+DEF_REPEAT = 7
+# The default least time (in seconds) each timing takes.
+DEF_MIN_TIME = 0.2
+# The default number of proxies in the proxy file.
+DEF_PROXY_COUNT = 1000
+# The number of URLs the dispatch benchmark cycles through.
+DISPATCH_URLS = 1024
+# The responses of the dispatch benchmark, as (status code, page, weight).
+# The page is "live" or "dead" for a sample page of that kind, or None for
+# an empty body. None of these codes are printed by `_check_status`, or
+# slow the host's throttle down.
+DISPATCH_MIX = (
+    (200, "live", 1),
+    (200, "dead", 4),
+    (404, None, 40),
+    (410, None, 5),
+    (500, None, 2),
+    (502, None, 2),
+)
+# The targets looked for by the split benchmarks, as (name, target).
+SPLIT_TARGETS = (("hit", '<div class="details">'), ("miss", '<div id="x">'))
+
+
+class _CannedTransport:
+    """Answer every request at once from a table, without any network."""
+
+    multiplexed = False
+
+    def __init__(self, answers):
+        """Answer each URL with its (status code, body) from `answers`."""
+        self._answers = answers
+
+    def close(self):
+        """Do nothing, as there are no connections."""
+
+    def send(self, session, method, url, **kwargs):
+        """Return the canned response to a request."""
+        (status_code, body) = self._answers[url]
+        response = requests.Response()
+        response.status_code = status_code
+        response.url = url
+        response.headers["Content-Type"] = "text/html"
+        # The body has already "arrived", so it's read from memory.
+        response._content = b"" if method == "HEAD" else body
+        response._content_consumed = True
+        return response
+
+
+def _sample_pages(module):
+    """Return a module's sample pages, as (file name, content, live)."""
+    pages = list()
+    for name in sorted(os.listdir(PAGES_DIR)):
+        if not name.startswith(module.name + "_"):
+            continue
+        with open(os.path.join(PAGES_DIR, name), encoding="utf-8") as page:
+            content = page.read()
+        pages.append((name, content, bool(module.check_output(content))))
+    return pages
+
+
+def _new_module(module_class):
+    """Initialize a module, walking the keyspace from a seeded start."""
+    module = module_class(agent=False, proxy=False)
+    module.select_shard(0, 1, SEED)
+    return module
+
+
+def _dispatch_case(module_class):
+    """Build the dispatch benchmark of a module."""
+    module = _new_module(module_class)
+    pages = _sample_pages(module)
+    bodies = {
+        "live": [page.encode() for _, page, live in pages if live],
+        "dead": [page.encode() for _, page, live in pages if not live],
+    }
+    mix = [
+        (status_code, kind)
+        for status_code, kind, _ in DISPATCH_MIX
+        if kind is None or bodies[kind]
+    ]
+    weights = [
+        weight
+        for _, kind, weight in DISPATCH_MIX
+        if kind is None or bodies[kind]
+    ]
+    urls = list()
+    while len(urls) < DISPATCH_URLS:
+        urls += module._next_url_batch()
+    answers = dict()
+    for url in urls:
+        (status_code, kind) = random.choices(mix, weights)[0]
+        body = random.choice(bodies[kind]) if kind else b""
+        answers[url] = (status_code, body)
+    module.transport = _CannedTransport(answers)
+    # Learning which headers belong to dead pages would soon skip every GET,
+    # as the canned headers are all alike.
+    module.fingerprints = None
+    session = module._create_new_session()
+    cycle = itertools.cycle(urls)
+    return lambda: module._get_page_content(session, next(cycle))
+
+
+def _proxy_case(count):
+    """Build the proxy loading benchmark, with a proxy file of `count`."""
+    module = _new_module(MODULE_DICT["upfile"])
+    folder = tempfile.mkdtemp()
+    atexit.register(shutil.rmtree, folder, ignore_errors=True)
+    with open(os.path.join(folder, "proxies.txt"), "w") as proxy_file:
+        for _ in range(count):
+            proxy_file.write(
+                "{}.{}.{}.{}:{}\n".format(
+                    *(random.randint(1, 254) for _ in range(4)),
+                    random.randint(1024, 65535)
+                )
+            )
+
+    def load():
+        # `_load_proxies` reads the proxy file in the working directory.
+        working = os.getcwd()
+        os.chdir(folder)
+        try:
+            module._load_proxies()
+        finally:
+            os.chdir(working)
+
+    return load
+
+
+def cases(proxies=DEF_PROXY_COUNT):
+    """List every benchmark.
+
+    Parameters
+    ----------
+    proxies : int
+        The number of proxies in the proxy loading benchmark's file.
+
+    Returns
+    -------
+    list
+        Every benchmark, as (name, build), where `build` returns the
+        function to time. It's only called once the seed has been set.
+
+    """
+    found = list()
+    for module_name, module_class in sorted(MODULE_DICT.items()):
+        found.append(
+            (
+                "urlgen/{}".format(module_name),
+                lambda module_class=module_class: lambda: urlgen(
+                    module_class.base_url,
+                    module_class.allowed_chars,
+                    module_class.key_length,
+                ),
+            )
+        )
+        found.append(
+            (
+                "keygen/{}".format(module_name),
+                lambda module_class=module_class: _new_module(
+                    module_class
+                )._next_url_batch,
+            )
+        )
+        module = module_class(agent=False, proxy=False)
+        for name, content, _ in _sample_pages(module):
+            found.append(
+                (
+                    "check_output/{}".format(name),
+                    lambda module=module, content=content: lambda: (
+                        module.check_output(content)
+                    ),
+                )
+            )
+        found.append(
+            (
+                "dispatch/{}".format(module_name),
+                lambda module_class=module_class: _dispatch_case(
+                    module_class
+                ),
+            )
+        )
+    with open(os.path.join(PAGES_DIR, "upfile_live.html")) as page_file:
+        page = page_file.read()
+    for function in ("_split_after", "_split_before"):
+        split = getattr(MODULE_DICT["upfile"], function)
+        for name, target in SPLIT_TARGETS:
+            found.append(
+                (
+                    "{}/{}".format(function.lstrip("_"), name),
+                    lambda split=split, target=target: lambda: split(
+                        page, target
+                    ),
+                )
+            )
+    for name, agent in (("default", False), ("random_agent", True)):
+        found.append(
+            (
+                "session/{}".format(name),
+                lambda agent=agent: MODULE_DICT["upfile"](
+                    agent=agent, proxy=False
+                )._create_new_session,
+            )
+        )
+    found.append(
+        ("load_proxies/{}".format(proxies), lambda: _proxy_case(proxies))
+    )
+    return found
+
+
+def measure(build, repeat=DEF_REPEAT, min_time=DEF_MIN_TIME):
+    """Time a benchmark.
+
+    Parameters
+    ----------
+    build : callable
+        Returns the function to time, called once the seed has been set.
+    repeat : int
+        The number of times the function is timed.
+    min_time : float
+        The least time (in seconds) each timing takes.
+
+    Returns
+    -------
+    dict
+        The fastest ("best") and median time per call, and the standard
+        deviation of the times per call (all in seconds), with the number
+        of calls in each timing and the number of timings.
+
+    """
+    random.seed(SEED)
+    timer = timeit.Timer(build())
+    # Find how many calls take at least `min_time`, which also warms up
+    # any caches the function uses.
+    number = 1
+    while True:
+        if timer.timeit(number) >= min_time:
+            break
+        number *= 2
+    times = [
+        timing / number
+        for timing in timer.repeat(repeat=repeat, number=number)
+    ]
+    return {
+        "best": min(times),
+        "median": statistics.median(times),
+        "stdev": statistics.stdev(times) if repeat > 1 else 0.0,
+        "number": number,
+        "repeat": repeat,
+    }
+
+
+def check_keygen(results):
+    """Compare the key generator of every module with `urlgen`, per URL.
+
+    Parameters
+    ----------
+    results : dict
+        The results of the benchmarks, by name, as returned by `measure`.
+
+    Returns
+    -------
+    list
+        The names of the modules whose key generator is the slower of the
+        two. Modules missing either benchmark are skipped.
+
+    """
+    slower = list()
+    for module_name in sorted(MODULE_DICT):
+        keygen = results.get("keygen/{}".format(module_name))
+        old = results.get("urlgen/{}".format(module_name))
+        if keygen is None or old is None:
+            continue
+        per_url = keygen["best"] / URL_BATCH_SIZE
+        print(
+            "keygen/{} takes {:.2f} us per URL, {:.1f}x as fast as "
+            "urlgen.".format(
+                module_name, per_url * 1e6, old["best"] / per_url
+            )
+        )
+        if per_url >= old["best"]:
+            slower.append(module_name)
+    return slower
+
+
+def main():
+    """Run the benchmarks and print the results."""
+    argparser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    argparser.add_argument(
+        "-k",
+        dest="pattern",
+        help="only run the benchmarks whose names match this regex",
+    )
+    argparser.add_argument(
+        "--repeat",
+        dest="repeat",
+        type=int,
+        default=DEF_REPEAT,
+        help="number of times each benchmark is timed "
+        "(default: {})".format(DEF_REPEAT),
+    )
+    argparser.add_argument(
+        "--min-time",
+        dest="min_time",
+        type=float,
+        default=DEF_MIN_TIME,
+        help="least time (in seconds) each timing takes "
+        "(default: {})".format(DEF_MIN_TIME),
+    )
+    argparser.add_argument(
+        "--proxies",
+        dest="proxies",
+        type=int,
+        default=DEF_PROXY_COUNT,
+        help="number of proxies in the proxy file "
+        "(default: {})".format(DEF_PROXY_COUNT),
+    )
+    argparser.add_argument(
+        "--json",
+        dest="json",
+        help="also write the results to this file, as JSON",
+    )
+    argparser.add_argument(
+        "--compare",
+        dest="compare",
+        help="compare the results with those saved in this JSON file",
+    )
+    args = argparser.parse_args()
+
+    baseline = dict()
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)["results"]
+    print(
+        "{:<32} {:>12} {:>12} {:>7} {:>9}".format(
+            "benchmark", "best (us)", "median (us)", "stdev", "change"
+        )
+    )
+    results = dict()
+    for name, build in cases(args.proxies):
+        if args.pattern and not re.search(args.pattern, name):
+            continue
+        result = measure(build, args.repeat, args.min_time)
+        results[name] = result
+        change = ""
+        if name in baseline:
+            # The fastest times are the least disturbed by everything else
+            # running on the machine, so those are compared.
+            change = "{:+.1%}".format(
+                result["best"] / baseline[name]["best"] - 1
+            )
+        print(
+            "{:<32} {:>12.2f} {:>12.2f} {:>6.1%} {:>9}".format(
+                name,
+                result["best"] * 1e6,
+                result["median"] * 1e6,
+                result["stdev"] / result["median"],
+                change,
+            ),
+            flush=True,
+        )
+    if args.json:
+        with open(args.json, "w") as json_file:
+            json.dump(
+                {
+                    "python": sys.version.split()[0],
+                    "implementation": platform.python_implementation(),
+                    "platform": platform.platform(),
+                    "seed": SEED,
+                    "created": datetime.datetime.now().isoformat(
+                        timespec="seconds"
+                    ),
+                    "results": results,
+                },
+                json_file,
+                indent=2,
+            )
+            json_file.write("\n")
+    slower = check_keygen(results)
+    if slower:
+        sys.exit(
+            "The key generator is slower than urlgen for: {}".format(
+                ", ".join(slower)
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
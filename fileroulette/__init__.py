@@ -1,6 +1,16 @@
 """FileRoulette: Find random data on various hosting services."""
 
-from fileroulette.libs import module_loader
+from fileroulette.libs import module_loader, multiproc
+from fileroulette.libs.metrics import MetricsServer, SummaryReporter
+from fileroulette.libs.pipeline import DEF_QUEUE_SIZE
+from fileroulette.libs.profiling import DEF_PROFILE_DIR, PROFILERS
+from fileroulette.libs.proxies import DEF_CHECK_URL
+from fileroulette.libs.sinks import DEF_FSYNC, open_sink
+from fileroulette.modules import (
+    DEF_CONCURRENCY,
+    DEF_COVERAGE_DIR,
+    DEF_STAGE_WORKERS,
+)
 
 # Load a dictionary of all installed modules.
 MODULE_DICT = module_loader.MODULE_DICT
@@ -8,10 +18,196 @@ MODULE_DICT = module_loader.MODULE_DICT
 # Describe the purpose of this application.
 DESCRIPTION = "Find random data on various hosting services."
 
+# The scan engines a module can be run with.
+ENGINES = ["sync", "threads", "pipeline"]
 
-def run_module(module_name, agent=False, proxy=False):
-    """Initialize and run the specified module."""
+
+def run_engine(
+    module,
+    engine="sync",
+    concurrency=DEF_CONCURRENCY,
+    workers=None,
+    queue_size=DEF_QUEUE_SIZE,
+    connect_timeout=None,
+    read_timeout=None,
+    deadline=None,
+    hedge=False,
+    warm=True,
+    pipeline_depth=0,
+    transport=None,
+    metrics_port=None,
+    summary_interval=None,
+    metrics_label=None,
+):
+    """Run an initialized module on the chosen scan engine.
+
+    The timeouts (in seconds) and the per-probe deadline override the
+    module's own, unless they're None. If `hedge` is set, slow requests are
+    hedged with a duplicate. The module's connection pools are sized for the
+    engine, and if `warm` is set, its connections are opened before the scan
+    starts. If `pipeline_depth` is set, HEAD probes are pipelined in batches
+    of that many. If `transport` is set, requests are carried by that
+    transport instead of the module's own. If `metrics_port` is set, the
+    module's counters and latency histograms are served on that port while
+    it runs, and if `summary_interval` is set, a summary line is printed
+    that often (in seconds), starting with `metrics_label` if it's given.
+    """
+    if connect_timeout is not None:
+        module.connect_timeout = connect_timeout
+    if read_timeout is not None:
+        module.read_timeout = read_timeout
+    if deadline is not None:
+        module.probe_deadline = deadline
+    if hedge:
+        module.hedge_requests = True
+    if pipeline_depth:
+        module.pipeline_depth = pipeline_depth
+    if transport:
+        module.use_transport(transport)
+    # Keep a connection for every request the engine can have in flight.
+    if engine == "threads":
+        in_flight = concurrency
+    elif engine == "pipeline":
+        counts = dict(DEF_STAGE_WORKERS)
+        counts.update(workers or dict())
+        in_flight = counts["probe"] + counts["fetch"]
+    else:
+        in_flight = 1
+    module.prepare_connections(in_flight, warm)
+    # Let every host have all of those requests in flight, until it starts
+    # throttling us.
+    module.throttle.initial = in_flight
+    server = reporter = None
+    if metrics_port is not None:
+        server = MetricsServer(
+            module,
+            metrics_port,
+            labels={"worker": metrics_label} if metrics_label else None,
+        )
+        print(
+            "Serving metrics on http://127.0.0.1:{}/metrics".format(
+                server.port
+            )
+        )
+    if summary_interval:
+        reporter = SummaryReporter(module, summary_interval, metrics_label)
+    try:
+        if engine == "threads":
+            module.run_threads(concurrency)
+        elif engine == "pipeline":
+            module.run_pipeline(workers=workers, queue_size=queue_size)
+        else:
+            module.run()
+    finally:
+        if reporter:
+            reporter.close()
+        if server:
+            server.close()
+
+
+def run_module(
+    module_name,
+    agent=False,
+    proxy=False,
+    processes=1,
+    coverage_dir=DEF_COVERAGE_DIR,
+    parse_processes=0,
+    proxy_check_url=DEF_CHECK_URL,
+    output=None,
+    output_format=None,
+    fsync=DEF_FSYNC,
+    profile=None,
+    profile_dir=DEF_PROFILE_DIR,
+    **options
+):
+    """Initialize and run the specified module.
+
+    If `coverage_dir` is set, the module records every key it probes in that
+    folder and skips keys probed by earlier runs. If `parse_processes` is set,
+    downloaded pages are checked in that many separate processes. If `proxy`
+    is set, every proxy is checked against `proxy_check_url` before the scan
+    starts. If `output` is set, every result is appended to that file, in
+    `output_format` (chosen by the file's extension if omitted), and synced
+    to disk according to the `fsync` policy. If `profile` names one of the
+    PROFILERS, the scan is profiled (in every worker process, with several
+    processes) and a report is written to `profile_dir` when it ends. Any
+    extra keyword arguments are passed on to `run_engine`.
+    """
+    sink = None
+    if output:
+        # Results are written on the sink's own thread, off the probe path.
+        sink = open_sink(output, output_format, fsync=fsync)
+    try:
+        if processes > 1:
+            # Spread the scan across several worker processes.
+            multiproc.run_processes(
+                module_name,
+                processes,
+                agent=agent,
+                proxy=proxy,
+                coverage_dir=coverage_dir,
+                proxy_check_url=proxy_check_url,
+                sink=sink,
+                profile=profile,
+                profile_dir=profile_dir,
+                **options
+            )
+        else:
+            _run_single(
+                module_name,
+                agent=agent,
+                proxy=proxy,
+                coverage_dir=coverage_dir,
+                parse_processes=parse_processes,
+                proxy_check_url=proxy_check_url,
+                sink=sink,
+                profile=profile,
+                profile_dir=profile_dir,
+                **options
+            )
+    finally:
+        if sink:
+            sink.close()
+            print("Wrote {} results to {}.".format(sink.written, sink.path))
+
+
+def _run_single(
+    module_name,
+    agent,
+    proxy,
+    coverage_dir,
+    parse_processes,
+    proxy_check_url,
+    sink,
+    profile,
+    profile_dir,
+    **options
+):
+    """Initialize and run the specified module in this process."""
     # Initialize the specified module.
     module = MODULE_DICT[module_name](agent=agent, proxy=proxy)
-    # Run the specified module.
-    module.run()
+    if proxy:
+        # Find the live proxies before the scan starts.
+        module.check_proxies(proxy_check_url)
+    if coverage_dir:
+        # Resume from where the last run left off.
+        module.enable_coverage(coverage_dir)
+    if parse_processes:
+        # Move page parsing off the scanning threads.
+        module.start_parser_pool(parse_processes)
+    module.use_sink(sink)
+    profiler = None
+    if profile:
+        # Only profile the scan itself, not the setup above.
+        profiler = PROFILERS[profile](module_name, profile_dir)
+        profiler.start()
+    try:
+        # Run the specified module on the chosen engine.
+        run_engine(module, **options)
+    finally:
+        module.stop_parser_pool()
+        if profiler:
+            profiler.stop()
+    # Summarize the run.
+    module.report_stats()
+    module.report_coverage()
@@ -2,8 +2,48 @@
 
 Contents
 --------
+connections.py
+    Share warm, keep-alive connections and TLS sessions between sessions.
+coverage.py
+    A persistent, memory-mapped record of which keys have been probed.
+extraction.py
+    Declarative, precompiled rules for extracting data from a page.
+fingerprint.py
+    Learn the headers of dead pages, so they can be skipped without a GET.
+hedging.py
+    Track recent latencies, and hedge slow calls with a duplicate.
+keygen.py
+    A precompiled, batched key generator and key/index codec.
+keyspace.py
+    A seekable, non-repeating random walk through every key of a keyspace.
+metrics.py
+    Latency histograms, a Prometheus metrics endpoint and summary lines.
 module_loader.py
     The dynamic module loader.
+multiproc.py
+    Run a data source module across several processes at once.
+parsing.py
+    Check downloaded pages in a pool of separate processes.
+pipeline.py
+    A staged, threaded pipeline with bounded queues between the stages.
+pipelining.py
+    Pipeline many requests over one keep-alive HTTP/1.1 connection.
+profiling.py
+    Profile a scan with cProfile, a sampling profiler or tracemalloc.
+proxies.py
+    Check a whole proxy list concurrently, and rank the live proxies.
+redirects.py
+    Learn how a site redirects its URLs, and skip the redirect next time.
+retry.py
+    Schedule keys that failed for a passing reason to be tried again.
+sinks.py
+    Write results to JSONL, CSV or SQLite in batches, on a writer thread.
+streaming.py
+    Inspect a page while it downloads, and stop as soon as we know enough.
+throttle.py
+    AIMD control of the number of requests in flight to each host.
+transports.py
+    Pluggable transports: HTTP/1.1 through requests, or HTTP/2 through httpx.
 urlgen.py
     A library for creating random URLs from provided specifications.
 """
@@ -0,0 +1,298 @@
+"""Share warm, keep-alive connections between every session of a module.
+
+By default, every requests session mounts its own adapter, with its own
+connection pools and its own TLS settings. A module that gives each worker a
+session therefore never lets one worker reuse another's idle connection,
+builds a fresh SSLContext (and reloads the whole CA bundle) for every
+connection, and makes a full TLS handshake every time. Through a SOCKS proxy
+such as Tor, each of those handshakes costs several slow round trips.
+
+This module defines the PooledAdapter class, a single adapter which every
+session of a module mounts. Its connection pools are sized to the number of
+requests the module keeps in flight, so idle connections are kept alive
+rather than thrown away, and all of its connections share one
+ResumingContext, which loads the CA bundle once and resumes each host's last
+TLS session instead of starting a new one. The adapter can also open and
+handshake connections ahead of time, so the first probes don't pay for them.
+"""
+
+import os
+import ssl
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from requests.adapters import HTTPAdapter
+from requests.utils import DEFAULT_CA_BUNDLE_PATH
+from urllib3.exceptions import HTTPError
+
+# The default number of idle connections kept for each host (and proxy).
+DEF_POOL_SIZE = 10
+# The maximum number of connections opened at the same time while warming up.
+WARM_THREADS = 64
+
+
+class ResumingContext(ssl.SSLContext):
+    """An SSLContext which resumes the last TLS session of every host.
+
+    Python only resumes a TLS session when it's handed the session to resume,
+    so this context remembers the session of every connection given back to
+    a PooledAdapter's pools, and offers it when the next connection to the
+    same host is made. With TLS 1.3, the session ticket only arrives after
+    the handshake, which is why sessions are collected once a connection has
+    been used rather than as soon as it's made.
+    """
+
+    def __new__(cls, ca_bundle=DEFAULT_CA_BUNDLE_PATH, on_resume=None):
+        """Create a client context, whatever arguments are given."""
+        return super(ResumingContext, cls).__new__(
+            cls, ssl.PROTOCOL_TLS_CLIENT
+        )
+
+    def __init__(self, ca_bundle=DEFAULT_CA_BUNDLE_PATH, on_resume=None):
+        """Load the CA bundle, and prepare the session cache.
+
+        Parameters
+        ----------
+        ca_bundle : str
+            The file (or folder) of CA certificates to verify servers with.
+        on_resume : callable or None
+            Called with no arguments whenever a TLS session is resumed.
+
+        """
+        self.minimum_version = ssl.TLSVersion.TLSv1_2
+        if os.path.isdir(ca_bundle):
+            self.load_verify_locations(capath=ca_bundle)
+        else:
+            self.load_verify_locations(ca_bundle)
+        self.on_resume = on_resume
+        self._sessions = dict()
+        self._lock = threading.Lock()
+
+    def remember(self, hostname, session):
+        """Keep a host's TLS session, to be resumed by its next connection."""
+        if hostname and session is not None:
+            with self._lock:
+                self._sessions[hostname] = session
+
+    def wrap_socket(self, sock, server_hostname=None, **kwargs):
+        """Wrap a socket, resuming the host's last TLS session if there is one.
+
+        The arguments are the same as those of `ssl.SSLContext.wrap_socket`.
+        """
+        if server_hostname and kwargs.get("session") is None:
+            with self._lock:
+                kwargs["session"] = self._sessions.get(server_hostname)
+        ssl_sock = super(ResumingContext, self).wrap_socket(
+            sock, server_hostname=server_hostname, **kwargs
+        )
+        if ssl_sock.session_reused and self.on_resume:
+            self.on_resume()
+        return ssl_sock
+
+
+class PooledAdapter(HTTPAdapter):
+    """A transport adapter meant to be shared by every session of a module.
+
+    Attributes
+    ----------
+    ca_bundle : str
+        The CA certificates loaded into the shared TLS settings. This is the
+        bundle requests verifies servers with by default, taking the
+        REQUESTS_CA_BUNDLE and CURL_CA_BUNDLE environment variables into
+        account just as it does.
+    pool_size : int
+        The number of idle connections kept for each host (and proxy).
+    ssl_context : ResumingContext
+        The TLS settings shared by every HTTPS connection.
+
+    """
+
+    def __init__(self, pool_size=DEF_POOL_SIZE, count=None):
+        """Initialize the adapter.
+
+        Parameters
+        ----------
+        pool_size : int
+            The number of idle connections kept for each host (and proxy).
+            This should be at least the number of requests which may be in
+            flight to a host at once, or connections will be thrown away
+            instead of being reused.
+        count : callable or None
+            Called with the name of a counter ("connections_opened" or
+            "tls_resumed") whenever a connection is opened or a TLS session
+            is resumed.
+
+        """
+        self.pool_size = pool_size
+        self._counter = count
+        self._pool_classes = dict()
+        self._manager_lock = threading.Lock()
+        self.ca_bundle = (
+            os.environ.get("REQUESTS_CA_BUNDLE")
+            or os.environ.get("CURL_CA_BUNDLE")
+            or DEFAULT_CA_BUNDLE_PATH
+        )
+        self.ssl_context = ResumingContext(
+            self.ca_bundle, on_resume=lambda: self._count("tls_resumed")
+        )
+        super(PooledAdapter, self).__init__(
+            pool_connections=DEF_POOL_SIZE, pool_maxsize=pool_size
+        )
+
+    def _count(self, name):
+        """Increase a counter, if the adapter was given a way to count."""
+        if self._counter:
+            self._counter(name)
+
+    def _pool_class(self, base):
+        """Return a counting, warmable subclass of a connection pool class.
+
+        Pools of the subclass count the connections they open (including
+        reconnections of a closed connection), can open connections ahead of
+        time, and hand the TLS session of every connection given back to them
+        to the shared context.
+        """
+        if base not in self._pool_classes:
+            adapter = self
+
+            class Connection(base.ConnectionCls):
+                def connect(self):
+                    adapter._count("connections_opened")
+                    super(Connection, self).connect()
+
+            class Pool(base):
+                ConnectionCls = Connection
+
+                def _put_conn(self, conn):
+                    sock = getattr(conn, "sock", None)
+                    session = getattr(sock, "session", None)
+                    adapter.ssl_context.remember(self.host, session)
+                    super(Pool, self)._put_conn(conn)
+
+                def warm(self, count, timeout):
+                    return adapter._warm_pool(self, count, timeout)
+
+            self._pool_classes[base] = Pool
+        return self._pool_classes[base]
+
+    def _shared_verify(self, verify):
+        """Return True if `verify` asks for the shared context's bundle."""
+        return verify is True or verify == self.ca_bundle
+
+    def _track(self, manager):
+        """Make a pool manager create counting, warmable pools."""
+        manager.pool_classes_by_scheme = {
+            scheme: self._pool_class(pool_class)
+            for scheme, pool_class in manager.pool_classes_by_scheme.items()
+        }
+        return manager
+
+    @staticmethod
+    def _warm_pool(pool, count, timeout):
+        """Open and handshake up to `count` idle connections in a pool.
+
+        Each connection has `timeout` seconds to be made.
+
+        Returns
+        -------
+        int
+            The number of connections that were opened.
+
+        """
+        # Take the slots first, so the connections can be put back into them.
+        slots = min(count, pool.pool.qsize())
+        connections = [pool._get_conn() for _ in range(slots)]
+
+        def connect(conn):
+            if conn.sock is not None:
+                # This connection was already open.
+                return None
+            conn.timeout = timeout
+            try:
+                conn.connect()
+            except (HTTPError, OSError):
+                conn.close()
+                return False
+            return True
+
+        with ThreadPoolExecutor(
+            max_workers=max(1, min(WARM_THREADS, len(connections)))
+        ) as executor:
+            opened = list(executor.map(connect, connections))
+        for conn, ok in zip(connections, opened):
+            # A slot whose connection failed is given back empty.
+            pool._put_conn(conn if ok is not False else None)
+        return sum(1 for ok in opened if ok)
+
+    def build_connection_pool_key_attributes(self, request, verify, cert=None):
+        """Give requests verified with the shared bundle the same pools.
+
+        requests only has this hook from version 2.32.2, which is why
+        requirements.txt asks for at least that version.
+        """
+        if self._shared_verify(verify):
+            verify = True
+        return super(
+            PooledAdapter, self
+        ).build_connection_pool_key_attributes(request, verify, cert)
+
+    def cert_verify(self, conn, url, verify, cert):
+        """Verify certificates with the CA bundle already in the context."""
+        super(PooledAdapter, self).cert_verify(conn, url, verify, cert)
+        if self._shared_verify(verify):
+            # Otherwise, the CA bundle would be loaded into the shared context
+            # again for every new connection.
+            conn.ca_certs = None
+            conn.ca_cert_dir = None
+
+    def init_poolmanager(self, connections, maxsize, block=False, **kwargs):
+        """Create the direct pool manager, with the shared TLS settings."""
+        kwargs.setdefault("ssl_context", self.ssl_context)
+        super(PooledAdapter, self).init_poolmanager(
+            connections, maxsize, block, **kwargs
+        )
+        self._track(self.poolmanager)
+
+    def proxy_manager_for(self, proxy, **kwargs):
+        """Return a proxy's pool manager, with the shared TLS settings."""
+        with self._manager_lock:
+            if proxy in self.proxy_manager:
+                return self.proxy_manager[proxy]
+            kwargs.setdefault("ssl_context", self.ssl_context)
+            return self._track(
+                super(PooledAdapter, self).proxy_manager_for(proxy, **kwargs)
+            )
+
+    def warm(self, url, proxies=None, count=DEF_POOL_SIZE, timeout=None):
+        """Open connections to a URL's host ahead of time.
+
+        The connections are made (and handshaked, for HTTPS) exactly as
+        they would be for a request, and left idle in the pool the request
+        would use. No request is sent.
+
+        Parameters
+        ----------
+        url : str
+            A URL on the host to connect to.
+        proxies : dict or None
+            The proxies the requests will be sent through, as they would be
+            passed to `requests.request`.
+        count : int
+            The number of connections to open. No more than `pool_size` are
+            kept.
+        timeout : float or None
+            How long (in seconds) each connection has to be made.
+
+        Returns
+        -------
+        int
+            The number of connections that were opened.
+
+        """
+        request = requests.Request("GET", url).prepare()
+        pool = self.get_connection_with_tls_context(request, True, proxies)
+        self.cert_verify(pool, url, True, None)
+        return pool.warm(count, timeout)
@@ -0,0 +1,166 @@
+"""A persistent, memory-mapped record of which keys have been probed.
+
+This module defines the CoverageMap class. A coverage map is a file holding a
+small header followed by one bit for every position in a module's keyspace
+walk. The bit is set once the key at that position has been probed. Since the
+header also stores the seed of the walk, a later run can reopen the file, walk
+the keyspace in exactly the same order, and skip every key that was already
+probed. This lets a scan be stopped and resumed at any time.
+"""
+
+import mmap
+import os
+import struct
+import threading
+
+# The header is made up of a magic string, the keyspace size and the seed.
+HEADER_FORMAT = "<8sQQ"
+HEADER_MAGIC = b"FRCOVER1"
+HEADER_SIZE = 32
+# How many bytes are examined at a time when skipping over probed keys.
+SCAN_CHUNK = 1 << 20
+# The number of bits set in every possible byte.
+BIT_COUNTS = bytes(bin(byte).count("1") for byte in range(256))
+
+
+def _count_bits(data):
+    """Count the bits set in a bytes object."""
+    if hasattr(int, "bit_count"):
+        # Python 3.10 and newer count the bits of a whole integer at once.
+        return int.from_bytes(data, "little").bit_count()
+    # Otherwise, turn every byte into the number of bits it has set.
+    return sum(data.translate(BIT_COUNTS))
+
+
+class CoverageMap:
+    """Track which positions of a keyspace walk have been probed.
+
+    Attributes
+    ----------
+    path : str
+        The location of the coverage file.
+    size : int
+        The number of positions (keys) tracked by the map.
+    seed : int
+        The seed of the keyspace walk the map belongs to.
+
+    """
+
+    def __init__(self, path, size, seed):
+        """Open the coverage file, creating it if it doesn't exist yet.
+
+        Parameters
+        ----------
+        path : str
+            The location of the coverage file.
+        size : int
+            The number of keys in the keyspace.
+        seed : int
+            The seed of the keyspace walk. This is only used when creating a
+            new file; an existing file keeps the seed stored in its header.
+
+        """
+        self.path = path
+        self.size = size
+        length = HEADER_SIZE + (size + 7) // 8
+        if not os.path.exists(path):
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(path, "wb") as coverage_file:
+                coverage_file.write(
+                    struct.pack(HEADER_FORMAT, HEADER_MAGIC, size, seed)
+                )
+                # Extend the file to full length. On most file systems this
+                # creates a sparse file, so untouched regions use no space.
+                coverage_file.truncate(length)
+        self._file = open(path, "r+b")
+        self._map = mmap.mmap(self._file.fileno(), length)
+        (magic, stored_size, self.seed) = struct.unpack_from(
+            HEADER_FORMAT, self._map
+        )
+        if magic != HEADER_MAGIC or stored_size != size:
+            self.close()
+            raise ValueError(
+                "'{}' is not a coverage file for this keyspace.".format(path)
+            )
+        # Marking a bit means reading and rewriting its byte, so only one
+        # thread may do it at a time.
+        self._lock = threading.Lock()
+
+    def __contains__(self, position):
+        """Return True if the key at the given position has been probed."""
+        byte = self._map[HEADER_SIZE + position // 8]
+        return bool(byte & (1 << (position % 8)))
+
+    def close(self):
+        """Flush the coverage map to disk and close the file."""
+        self.flush()
+        self._map.close()
+        self._file.close()
+
+    def count(self):
+        """Count how many keys have been probed.
+
+        Returns
+        -------
+        int
+            The number of positions marked as probed.
+
+        """
+        total = 0
+        for offset in range(HEADER_SIZE, len(self._map), SCAN_CHUNK):
+            chunk = self._map[offset:offset + SCAN_CHUNK]
+            total += _count_bits(chunk)
+        return total
+
+    def flush(self):
+        """Write any changes to the coverage map out to disk."""
+        self._map.flush()
+
+    def mark(self, position):
+        """Record that the key at the given position has been probed.
+
+        Parameters
+        ----------
+        position : int
+            The position in the keyspace walk.
+
+        """
+        offset = HEADER_SIZE + position // 8
+        with self._lock:
+            self._map[offset] |= 1 << (position % 8)
+
+    def next_unprobed(self, start, stop):
+        """Find the first position in a range that hasn't been probed yet.
+
+        Parameters
+        ----------
+        start : int
+            The first position to check.
+        stop : int
+            The position to stop before.
+
+        Returns
+        -------
+        int
+            The first unprobed position, or `stop` if every position in the
+            range has been probed.
+
+        """
+        position = start
+        while position < stop:
+            offset = HEADER_SIZE + position // 8
+            if position % 8 == 0 and self._map[offset] == 0xFF:
+                # Skip over whole bytes of probed keys at once.
+                chunk = self._map[offset:offset + SCAN_CHUNK]
+                position += (len(chunk) - len(chunk.lstrip(b"\xff"))) * 8
+                continue
+            if position not in self:
+                return position
+            position += 1
+        return stop
+
+    def percentage(self):
+        """Return the percentage of the keyspace that has been probed."""
+        return 100.0 * self.count() / self.size if self.size else 100.0
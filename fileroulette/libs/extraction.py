@@ -0,0 +1,270 @@
+"""Declarative rules for extracting useful data from a page.
+
+Rather than hand-writing `check_output` with string splitting, BeautifulSoup
+and `json.loads`, a data source module can describe what it's looking for:
+
+    reject_markers = ("Sorry it's gone...",)
+    extract_fields = {
+        "File Name": Selector("div.details h3"),
+        "File Size": Selector("div.details p", then=Regex(r"Size:\\s*(.+)")),
+    }
+
+The BaseModule compiles those class attributes once into an ExtractionRules
+object, whose `match` method does the work of `check_output`. Three kinds of
+extractor are available:
+
+Regex(pattern, group=1)
+    The given group of the first match of a regular expression.
+JSONPath(path)
+    A value from a JSON document, found by a dotted path such as
+    "data.0.name" (numbers index into lists).
+Selector(selector, attribute=None)
+    The text (or an attribute) of the first element matching a CSS-like
+    selector. Each step of the selector is a tag name, a .class, an #id or a
+    combination of them (such as "div.details"), and steps separated by spaces
+    are searched for one after the other, as with CSS descendants. Elements
+    are found with regular expressions rather than by building a document
+    tree, so an element's text runs up to the first matching closing tag.
+
+Every extractor takes an optional `then` extractor, which is applied to the
+text it found (for example, to pick a number out of a sentence).
+"""
+
+import html
+import json
+import re
+
+# Matches one step of a selector, such as "div.details" or "#main".
+_STEP = re.compile(r"([a-zA-Z][\w-]*)?((?:[.#][\w-]+)*)$")
+# Matches any HTML tag, so it can be stripped from an element's text.
+_TAG = re.compile(r"<[^>]*>")
+
+
+class _Page:
+    """The content of a page, with its JSON parsed at most once."""
+
+    def __init__(self, text):
+        """Wrap the text of a page."""
+        self.text = text
+        self._json = None
+        self._parsed = False
+
+    def json(self):
+        """Return the page's JSON document, or None if it isn't JSON."""
+        if not self._parsed:
+            self._parsed = True
+            try:
+                self._json = json.loads(self.text)
+            except ValueError:
+                self._json = None
+        return self._json
+
+
+class _Extractor:
+    """The common interface of every extractor."""
+
+    def __init__(self, then=None):
+        """Set the extractor applied to this extractor's result, if any."""
+        self.then = then
+
+    def _find(self, page):
+        """Return the raw value found in a page, or None."""
+        raise NotImplementedError
+
+    def extract(self, page):
+        """Extract a value from a page.
+
+        Parameters
+        ----------
+        page : _Page
+            The page to extract the value from.
+
+        Returns
+        -------
+        object or None
+            The extracted value, or None if it couldn't be found.
+
+        """
+        value = self._find(page)
+        if value is None or self.then is None:
+            return value
+        return self.then.extract(_Page(str(value)))
+
+
+class JSONPath(_Extractor):
+    """Extract a value from a JSON document by its dotted path."""
+
+    def __init__(self, path, then=None):
+        """Compile the path.
+
+        Parameters
+        ----------
+        path : str
+            The keys leading to the value, separated by dots. Keys made of
+            digits index into lists.
+        then : _Extractor or None
+            An extractor to apply to the value that was found.
+
+        """
+        super(JSONPath, self).__init__(then)
+        self.path = path
+        self._keys = [
+            int(key) if key.isdigit() else key for key in path.split(".")
+        ]
+
+    def _find(self, page):
+        value = page.json()
+        for key in self._keys:
+            try:
+                value = value[key]
+            except (IndexError, KeyError, TypeError):
+                return None
+        return value
+
+
+class Regex(_Extractor):
+    """Extract a group from the first match of a regular expression."""
+
+    def __init__(self, pattern, group=1, flags=0, then=None):
+        """Compile the regular expression.
+
+        Parameters
+        ----------
+        pattern : str
+            The regular expression.
+        group : int or str
+            The group to extract from the match.
+        flags : int
+            Flags from the re module, such as re.IGNORECASE.
+        then : _Extractor or None
+            An extractor to apply to the text that was found.
+
+        """
+        super(Regex, self).__init__(then)
+        self.pattern = re.compile(pattern, flags)
+        self.group = group
+
+    def _find(self, page):
+        match = self.pattern.search(page.text)
+        return match.group(self.group) if match else None
+
+
+class Selector(_Extractor):
+    """Extract the text or an attribute of an element, by CSS-like selector."""
+
+    def __init__(self, selector, attribute=None, then=None):
+        """Compile the selector into regular expressions.
+
+        Parameters
+        ----------
+        selector : str
+            The selector, such as "div.details h3".
+        attribute : str or None
+            The attribute to extract. If omitted, the element's text (with any
+            tags inside it removed) is extracted instead.
+        then : _Extractor or None
+            An extractor to apply to the text that was found.
+
+        """
+        super(Selector, self).__init__(then)
+        self.selector = selector
+        self.attribute = attribute
+        self._steps = [self._compile_step(step) for step in selector.split()]
+        if attribute:
+            self._attribute = re.compile(
+                r"""\b{}\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+))""".format(
+                    re.escape(attribute)
+                ),
+                re.IGNORECASE,
+            )
+
+    @staticmethod
+    def _compile_step(step):
+        """Compile one step of a selector into a regex for its opening tag."""
+        match = _STEP.match(step)
+        if not match:
+            raise ValueError("Unsupported selector step: '{}'".format(step))
+        (tag, qualifiers) = match.groups()
+        pattern = r"<(?P<tag>{})\b".format(re.escape(tag) if tag else r"\w+")
+        # Every class and id is checked with a lookahead, so they may appear
+        # in any order within the tag.
+        for qualifier in re.findall(r"[.#][\w-]+", qualifiers):
+            name = "class" if qualifier[0] == "." else "id"
+            pattern += (
+                r"""(?=[^>]*\b{}\s*=\s*["']?(?:[^"'>]*\s)?{}(?:[\s"'>]))"""
+            ).format(name, re.escape(qualifier[1:]))
+        return re.compile(pattern + r"[^>]*>", re.IGNORECASE)
+
+    def _find(self, page):
+        position = 0
+        for step in self._steps:
+            match = step.search(page.text, position)
+            if not match:
+                return None
+            position = match.end()
+        if self.attribute:
+            found = self._attribute.search(match.group(0))
+            if not found:
+                return None
+            value = next(g for g in found.groups() if g is not None)
+            return html.unescape(value)
+        end = page.text.find("</{}".format(match.group("tag")), position)
+        if end == -1:
+            return None
+        text = _TAG.sub("", page.text[position:end])
+        return html.unescape(text).strip()
+
+
+class ExtractionRules:
+    """A module's reject markers and field extractors, compiled together.
+
+    Attributes
+    ----------
+    reject_markers : tuple
+        Strings which, if found anywhere in a page, mean it's worthless.
+    fields : dict
+        The extractor for every field, by field name.
+
+    """
+
+    def __init__(self, reject_markers=(), fields=None):
+        """Compile the rules.
+
+        Parameters
+        ----------
+        reject_markers : tuple
+            Strings which, if found anywhere in a page, mean it's worthless.
+        fields : dict
+            The extractor for every field, by field name.
+
+        """
+        self.reject_markers = tuple(reject_markers)
+        self.fields = dict(fields or dict())
+
+    def match(self, content):
+        """Check a page, and extract every field from it.
+
+        Parameters
+        ----------
+        content : str
+            The text content of the page.
+
+        Returns
+        -------
+        dict or False
+            The value of every field, or False if the page held a reject
+            marker or any of the fields was missing or empty.
+
+        """
+        # Plain substring searches beat a single regex alternation here.
+        for marker in self.reject_markers:
+            if marker in content:
+                return False
+        page = _Page(content)
+        result = dict()
+        for name, extractor in self.fields.items():
+            value = extractor.extract(page)
+            if value is None or value == "":
+                return False
+            result[name] = value
+        return result
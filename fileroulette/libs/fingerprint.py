@@ -0,0 +1,118 @@
+"""Recognize dead pages from their headers alone.
+
+Some sites answer with "200 OK" even when a file has expired, so the only way
+to find out is to download the page and read it. Those dead pages tend to look
+alike, though: the same length, the same content type, the same cookies. This
+module defines the FingerprintCache class, which learns the headers of pages
+that `check_output` has confirmed to be dead, so that later pages with the same
+fingerprint can be skipped without downloading them.
+"""
+
+import collections
+import random
+import threading
+
+# A fingerprint must be confirmed dead this many times before it is trusted.
+DEF_THRESHOLD = 3
+# One in this many pages matching a dead fingerprint is downloaded anyway, to
+# make sure the fingerprint hasn't started matching live pages.
+VERIFY_RATE = 50
+# The maximum number of URLs waiting for their fingerprint to be confirmed.
+MAX_PENDING = 10000
+
+
+def fingerprint_of(response):
+    """Build the fingerprint of a response from its headers.
+
+    Parameters
+    ----------
+    response
+        The response to a HEAD request.
+
+    Returns
+    -------
+    tuple or None
+        The fingerprint, or None if the headers carry neither a length nor an
+        ETag. Without one of those, the fingerprint would match live pages
+        and dead pages alike.
+
+    """
+    headers = response.headers
+    length = headers.get("Content-Length")
+    etag = headers.get("ETag")
+    if length is None and etag is None:
+        return None
+    cookies = tuple(sorted(response.cookies.keys()))
+    return (length, headers.get("Content-Type"), etag, cookies)
+
+
+class FingerprintCache:
+    """Learn which header fingerprints belong to dead pages.
+
+    Attributes
+    ----------
+    threshold : int
+        How many times a fingerprint must be confirmed dead before it is used
+        to skip downloads.
+
+    """
+
+    def __init__(self, threshold=DEF_THRESHOLD):
+        """Initialize the fingerprint cache."""
+        self.threshold = threshold
+        self._dead = collections.Counter()
+        self._live = set()
+        self._pending = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def confirm(self, url, live):
+        """Record what a downloaded page turned out to be.
+
+        Parameters
+        ----------
+        url : str
+            The URL passed to `expect` when the page was probed.
+        live : bool
+            True if the page held useful data, otherwise False.
+
+        """
+        with self._lock:
+            fingerprint = self._pending.pop(url, None)
+            if fingerprint is None:
+                return
+            if live:
+                # Never skip pages that look like this one again.
+                self._live.add(fingerprint)
+                self._dead.pop(fingerprint, None)
+            elif fingerprint not in self._live:
+                self._dead[fingerprint] += 1
+
+    def expect(self, url, fingerprint):
+        """Remember the fingerprint of a page that is about to be downloaded.
+
+        Parameters
+        ----------
+        url : str
+            The URL of the page.
+        fingerprint : tuple
+            The fingerprint of the page's headers.
+
+        """
+        with self._lock:
+            self._pending[url] = fingerprint
+            if len(self._pending) > MAX_PENDING:
+                # Forget the oldest pages; they were probably never parsed.
+                self._pending.popitem(last=False)
+
+    def is_dead(self, fingerprint):
+        """Return True if pages with this fingerprint are known to be dead.
+
+        A small share of matching pages is reported as not dead anyway, so
+        that they get downloaded and the fingerprint is checked again.
+        """
+        with self._lock:
+            if fingerprint in self._live:
+                return False
+            if self._dead[fingerprint] < self.threshold:
+                return False
+        return random.randrange(VERIFY_RATE) != 0
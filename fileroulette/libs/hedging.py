@@ -0,0 +1,126 @@
+"""Cut the slow tail off request latencies with hedged requests.
+
+Most requests through a proxy come back quickly, but a few get stuck on a
+slow or dying proxy and take many times longer. Rather than wait those out,
+a hedged request fires a duplicate once the original has taken longer than
+nearly all requests do (such as the 95th percentile), and uses whichever of
+the two answers first. This module defines the LatencyTracker class, which
+keeps the recent latencies needed to choose that delay, and the `hedged_call`
+function, which runs the original and the duplicate.
+"""
+
+import collections
+import threading
+
+from concurrent.futures import FIRST_COMPLETED, wait
+
+# The number of recent latencies kept by a LatencyTracker.
+DEF_WINDOW = 1000
+# The fewest latencies needed before percentiles are reported.
+MIN_SAMPLES = 50
+# Percentiles are recalculated after this many new latencies.
+RECALCULATE_EVERY = 50
+
+
+class LatencyTracker:
+    """Keep a window of recent latencies, and report their percentiles."""
+
+    def __init__(self, window=DEF_WINDOW, min_samples=MIN_SAMPLES):
+        """Initialize the tracker.
+
+        Parameters
+        ----------
+        window : int
+            The number of recent latencies to keep.
+        min_samples : int
+            The fewest latencies needed before percentiles are reported.
+
+        """
+        self.min_samples = min_samples
+        self._samples = collections.deque(maxlen=window)
+        self._sorted = list()
+        self._stale = 0
+        self._lock = threading.Lock()
+
+    def percentile(self, fraction):
+        """Return a percentile of the recent latencies.
+
+        Parameters
+        ----------
+        fraction : float
+            The percentile, as a fraction (such as 0.95).
+
+        Returns
+        -------
+        float or None
+            The latency (in seconds), or None if there aren't enough
+            latencies yet.
+
+        """
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            if self._stale >= RECALCULATE_EVERY or not self._sorted:
+                # Sorting the window on every call would be wasteful, and
+                # the percentile moves slowly anyway.
+                self._sorted = sorted(self._samples)
+                self._stale = 0
+            index = int(fraction * len(self._sorted))
+            return self._sorted[min(index, len(self._sorted) - 1)]
+
+    def record(self, seconds):
+        """Add a latency (in seconds) to the window."""
+        with self._lock:
+            self._samples.append(seconds)
+            self._stale += 1
+
+
+def hedged_call(executor, primary, backup, delay, discard=None):
+    """Call a function, and call a backup too if it takes too long.
+
+    Parameters
+    ----------
+    executor : concurrent.futures.Executor
+        The executor which runs both calls.
+    primary : callable
+        The original call.
+    backup : callable
+        The duplicate call, made if the original takes longer than `delay`.
+    delay : float
+        How long (in seconds) to wait for the original before making the
+        duplicate.
+    discard : callable or None
+        Called with the result of the slower call, if it succeeds after the
+        winner (for example, to close a response nobody will read).
+
+    Returns
+    -------
+    result
+        The result of whichever call succeeded first.
+    hedged : bool
+        True if the duplicate was made and won.
+
+    Raises
+    ------
+    Exception
+        If every call that was made failed, the exception of the last one.
+
+    """
+    first = executor.submit(primary)
+    done, _ = wait([first], timeout=delay)
+    if done:
+        return (first.result(), False)
+    second = executor.submit(backup)
+    pending = {first, second}
+    while True:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        winners = [future for future in done if future.exception() is None]
+        if winners:
+            if discard:
+                for loser in pending:
+                    loser.add_done_callback(
+                        lambda f: f.exception() or discard(f.result())
+                    )
+            return (winners[0].result(), winners[0] is second)
+        if not pending:
+            raise done.pop().exception()
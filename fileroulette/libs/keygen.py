@@ -0,0 +1,161 @@
+"""Generate keys and URLs for a module from a precompiled specification.
+
+This module defines the KeyGenerator class. A key generator is built once from
+a module's base_url, allowed_chars and key_length, and from then on converts
+between keys, their numeric indexes and their URLs without redoing any of that
+setup work. URLs can be produced in large batches from a list of indexes.
+"""
+
+import itertools
+
+from fileroulette.libs.urlgen import build_pool
+
+# The most keys of a chunk of characters there can be for every key of that
+# chunk to be precomputed. Small tables stay in the CPU's caches, which saves
+# more time than looking up fewer, wider chunks from larger tables.
+CHUNK_LIMIT = 1 << 12
+
+
+class KeyGenerator:
+    """Convert between keys, key indexes and URLs for a single module.
+
+    Attributes
+    ----------
+    pool : str
+        The characters a key can be made from, in sorted order.
+    length : int
+        The length of every key.
+    size : int
+        The number of distinct keys.
+    prefix : str
+        The part of the URL template before the key.
+    suffix : str
+        The part of the URL template after the key.
+
+    """
+
+    def __init__(self, template: str, charset: str, length: int):
+        """Compile the key generator.
+
+        Parameters
+        ----------
+        template : str
+            A URL template with {} in the place where the key goes.
+        charset : str
+            A charset specification, as described in `urlgen`.
+        length : int
+            The length of every key.
+
+        """
+        if "{}" not in template:
+            raise ValueError("Template URL missing {} specification.")
+        (self.prefix, self.suffix) = template.split("{}", 1)
+        self.pool = build_pool(charset)
+        self.length = length
+        self.size = len(self.pool) ** length
+        self._digits = {character: i for i, character in enumerate(self.pool)}
+        # Keys are encoded a chunk of characters at a time, from the right,
+        # with every chunk precomputed. The chunks are as wide as CHUNK_LIMIT
+        # allows, but always leave a head of at least one character.
+        width = 1
+        while (
+            width + 1 < length
+            and len(self.pool) ** (width + 1) <= CHUNK_LIMIT
+        ):
+            width += 1
+        self._chunk_count = max(0, length - 1) // width
+        self._chunk_base = len(self.pool) ** width
+        self._chunks = self._all_keys(width)
+        self._heads = self._all_keys(length - self._chunk_count * width)
+
+    def _all_keys(self, length: int) -> list:
+        """List every key of a given length, in the order of their indexes."""
+        return [
+            "".join(key)
+            for key in itertools.product(self.pool, repeat=length)
+        ]
+
+    def decode(self, key: str) -> int:
+        """Convert a key into its index.
+
+        Parameters
+        ----------
+        key : str
+            A key made from the characters in the pool.
+
+        Returns
+        -------
+        int
+            The index of the key, between 0 and `size` - 1.
+
+        """
+        base = len(self.pool)
+        index = 0
+        for character in key:
+            index = index * base + self._digits[character]
+        return index
+
+    def encode(self, index: int) -> str:
+        """Convert an index into its key.
+
+        Parameters
+        ----------
+        index : int
+            The index of the key, between 0 and `size` - 1.
+
+        Returns
+        -------
+        str
+            The key at that index.
+
+        """
+        parts = list()
+        for _ in range(self._chunk_count):
+            (index, chunk) = divmod(index, self._chunk_base)
+            parts.append(self._chunks[chunk])
+        parts.append(self._heads[index])
+        return "".join(reversed(parts))
+
+    def key_from_url(self, url: str) -> str:
+        """Extract the key from a URL built by this generator."""
+        return url[len(self.prefix):len(url) - len(self.suffix)]
+
+    def url(self, key: str) -> str:
+        """Insert a key into the URL template."""
+        return self.prefix + key + self.suffix
+
+    def urls(self, indexes) -> list:
+        """Build the URLs for a batch of key indexes.
+
+        Parameters
+        ----------
+        indexes : iterable
+            The indexes of the keys.
+
+        Returns
+        -------
+        list
+            The URL for every index, in the same order.
+
+        """
+        (prefix, suffix) = (self.prefix, self.suffix)
+        (heads, chunks, base) = (self._heads, self._chunks, self._chunk_base)
+        # Most keys are a head and one or two chunks, which are looked up
+        # directly, without going through `encode`.
+        if self._chunk_count == 1:
+            return [
+                prefix + heads[index // base] + chunks[index % base] + suffix
+                for index in indexes
+            ]
+        if self._chunk_count == 2:
+            square = base * base
+            return [
+                prefix
+                + heads[index // square]
+                + chunks[index // base % base]
+                + chunks[index % base]
+                + suffix
+                for index in indexes
+            ]
+        encode = self.encode
+        return [prefix + encode(index) + suffix for index in indexes]
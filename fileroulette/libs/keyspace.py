@@ -0,0 +1,309 @@
+"""Walk every key of a module's keyspace exactly once, in a random order.
+
+Drawing keys at random means a long scan keeps re-probing keys it has already
+tried. This module defines the Keyspace class, which instead walks through a
+pseudo-random permutation of every possible key. The permutation is computed
+on the fly from the position in the walk, so it needs no memory, and any
+position can be jumped to directly. This makes it easy to split the keyspace
+into disjoint shards for several workers.
+"""
+
+import array
+import random
+
+from fileroulette.libs.keygen import KeyGenerator
+
+# The number of Feistel rounds used to build the permutation. This must be
+# even, as `permute_many` runs the rounds in pairs.
+ROUNDS = 4
+# A mask used to keep the round function within 64 bits.
+MASK_64 = (1 << 64) - 1
+# The widest half (in bits) for which `permute_many` precomputes the round
+# function for every value of a half, instead of computing it every round.
+TABLE_BITS = 16
+
+
+class KeyspaceExhausted(Exception):
+    """Raised when every key in a keyspace (or shard) has been used."""
+
+
+class Keyspace:
+    """A seekable, pseudo-random permutation of every key of a given shape.
+
+    Attributes
+    ----------
+    pool : str
+        The characters a key can be made from, in sorted order.
+    length : int
+        The length of every key.
+    size : int
+        The number of distinct keys in the keyspace.
+    seed : int
+        The seed that determines the order of the walk. Two Keyspace objects
+        with the same charset, length and seed walk in the same order.
+
+    """
+
+    def __init__(self, charset: str, length: int, seed: int = None):
+        """Initialize the keyspace.
+
+        Parameters
+        ----------
+        charset : str
+            A charset specification, as described in `urlgen`.
+        length : int
+            The length of every key.
+        seed : int or None
+            The seed for the permutation. If omitted, a random one is chosen.
+
+        """
+        self._codec = KeyGenerator("{}", charset, length)
+        self.pool = self._codec.pool
+        self.length = length
+        self.size = self._codec.size
+        self.seed = random.getrandbits(64) if seed is None else seed
+        # The permutation is built as a Feistel network over a power-of-two
+        # domain split into two equal halves, just large enough to hold every
+        # key. Positions that land outside the keyspace are encrypted again
+        # until they land inside it ("cycle walking"), which is a bijection
+        # on the keyspace itself.
+        self._half_bits = max(1, ((self.size - 1).bit_length() + 1) // 2)
+        self._half_mask = (1 << self._half_bits) - 1
+        rng = random.Random(self.seed)
+        self._round_keys = [rng.getrandbits(64) for _ in range(ROUNDS)]
+        # Built by `permute_many` the first time it's called.
+        self._round_tables = None
+
+    def __len__(self):
+        """Return the number of keys in the keyspace."""
+        return self.size
+
+    def _build_round_tables(self) -> list:
+        """Precompute the round function of every round, for every half.
+
+        Returns
+        -------
+        list
+            The tables of the rounds, paired up as (even round, odd round).
+
+        """
+        halves = range(1 << self._half_bits)
+        tables = [
+            array.array("H", (self._mix(half, round_key) for half in halves))
+            for round_key in self._round_keys
+        ]
+        return list(zip(tables[::2], tables[1::2]))
+
+    def _decrypt(self, value: int) -> int:
+        """Undo a single pass of the Feistel network over the full domain."""
+        left = value >> self._half_bits
+        right = value & self._half_mask
+        for round_key in reversed(self._round_keys):
+            (left, right) = (right ^ self._mix(left, round_key), left)
+        return (left << self._half_bits) | right
+
+    def _encrypt(self, value: int) -> int:
+        """Run a single pass of the Feistel network over the full domain."""
+        left = value >> self._half_bits
+        right = value & self._half_mask
+        for round_key in self._round_keys:
+            (left, right) = (right, left ^ self._mix(right, round_key))
+        return (left << self._half_bits) | right
+
+    def _mix(self, half: int, round_key: int) -> int:
+        """Scramble one half of a value with a round key."""
+        # This is the splitmix64 finalizer, trimmed to the size of a half.
+        mixed = (half ^ round_key) & MASK_64
+        mixed = ((mixed ^ (mixed >> 30)) * 0xBF58476D1CE4E5B9) & MASK_64
+        mixed = ((mixed ^ (mixed >> 27)) * 0x94D049BB133111EB) & MASK_64
+        return (mixed ^ (mixed >> 31)) & self._half_mask
+
+    def index(self, key: str) -> int:
+        """Convert a key into its index in the keyspace.
+
+        Parameters
+        ----------
+        key : str
+            A key made from the characters in the pool.
+
+        Returns
+        -------
+        int
+            The index of the key, between 0 and `size` - 1.
+
+        """
+        return self._codec.decode(key)
+
+    def key(self, index: int) -> str:
+        """Convert an index in the keyspace into its key.
+
+        Parameters
+        ----------
+        index : int
+            The index of the key, between 0 and `size` - 1.
+
+        Returns
+        -------
+        str
+            The key at that index.
+
+        """
+        return self._codec.encode(index)
+
+    def key_at(self, position: int) -> str:
+        """Return the key at a given position in the walk.
+
+        Parameters
+        ----------
+        position : int
+            The position in the walk, between 0 and `size` - 1.
+
+        Returns
+        -------
+        str
+            The key found at that position.
+
+        """
+        return self.key(self.permute(position))
+
+    def permute(self, position: int) -> int:
+        """Map a position in the walk onto the index of a key.
+
+        Every position maps to a different index, so walking the positions
+        from 0 to `size` - 1 visits every key exactly once.
+
+        Parameters
+        ----------
+        position : int
+            The position in the walk, between 0 and `size` - 1.
+
+        Returns
+        -------
+        int
+            The index of the key at that position.
+
+        """
+        if not 0 <= position < self.size:
+            raise IndexError("Position outside of the keyspace.")
+        value = self._encrypt(position)
+        while value >= self.size:
+            value = self._encrypt(value)
+        return value
+
+    def permute_many(self, positions) -> list:
+        """Map a batch of positions in the walk onto the indexes of keys.
+
+        This gives the same indexes as calling `permute` on every position,
+        but for keyspaces whose halves are at most TABLE_BITS wide, the round
+        function is looked up in a table rather than computed, which makes
+        it several times faster.
+
+        Parameters
+        ----------
+        positions : iterable
+            The positions in the walk, each between 0 and `size` - 1.
+
+        Returns
+        -------
+        list
+            The index of the key at every position, in the same order.
+
+        """
+        if self._half_bits > TABLE_BITS:
+            return [self.permute(position) for position in positions]
+        if self._round_tables is None:
+            self._round_tables = self._build_round_tables()
+        (size, bits, mask) = (self.size, self._half_bits, self._half_mask)
+        tables = self._round_tables
+        indexes = list()
+        for position in positions:
+            if not 0 <= position < size:
+                raise IndexError("Position outside of the keyspace.")
+            value = position
+            # This is `_encrypt`, repeated until the value lands inside the
+            # keyspace, as in `permute`. Rather than swapping the halves after
+            # every round, each pair of rounds scrambles one half in place
+            # and then the other, which leaves them in the same order.
+            while True:
+                left = value >> bits
+                right = value & mask
+                for (even, odd) in tables:
+                    left ^= even[right]
+                    right ^= odd[left]
+                value = (left << bits) | right
+                if value < size:
+                    break
+            indexes.append(value)
+        return indexes
+
+    def position(self, index: int) -> int:
+        """Map the index of a key back onto its position in the walk.
+
+        This is the inverse of `permute`.
+
+        Parameters
+        ----------
+        index : int
+            The index of a key, between 0 and `size` - 1.
+
+        Returns
+        -------
+        int
+            The position in the walk where that key is found.
+
+        """
+        if not 0 <= index < self.size:
+            raise IndexError("Index outside of the keyspace.")
+        value = self._decrypt(index)
+        while value >= self.size:
+            value = self._decrypt(value)
+        return value
+
+    def shard(self, index: int, count: int, align: int = 1) -> tuple:
+        """Return the range of positions belonging to one of several shards.
+
+        Parameters
+        ----------
+        index : int
+            The number of the shard, between 0 and `count` - 1.
+        count : int
+            The total number of shards.
+        align : int
+            Round the shard boundaries down to a multiple of this number.
+
+        Returns
+        -------
+        start : int
+            The first position in the shard.
+        stop : int
+            The position just after the last position in the shard.
+
+        """
+        if not 0 <= index < count:
+            raise IndexError("Shard index outside of the shard count.")
+        start = self.size * index // count // align * align
+        if index + 1 == count:
+            stop = self.size
+        else:
+            stop = self.size * (index + 1) // count // align * align
+        return (start, stop)
+
+    def walk(self, start: int = 0, stop: int = None):
+        """Yield every key from one position in the walk up to another.
+
+        Parameters
+        ----------
+        start : int
+            The first position in the walk.
+        stop : int or None
+            The position to stop before. Defaults to the end of the keyspace.
+
+        Yields
+        ------
+        str
+            The next key in the walk.
+
+        """
+        stop = self.size if stop is None else stop
+        for position in range(start, stop):
+            yield self.key_at(position)
@@ -0,0 +1,425 @@
+"""Show where a scan's time goes, while it runs.
+
+A module keeps running counters in its `stats` (probes, hits, responses by
+status category, exceptions by type, bytes received, and so on) and a
+latency Histogram for each stage of a probe: generating keys, HEAD requests,
+GET requests and `check_output`. This module defines the Histogram class,
+and two ways of watching them during a scan:
+
+MetricsServer
+    A small HTTP server which answers GET /metrics with the counters and
+    histograms in the Prometheus text format, for Prometheus (or curl) to
+    scrape.
+SummaryReporter
+    A thread which prints a one-line summary every few seconds: the probe
+    rate, hits, data received, and the median and 95th percentile latency
+    of every stage.
+"""
+
+import bisect
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# The upper bounds (in seconds) of the histogram buckets. They're spaced to
+# cover both a key being generated in microseconds and a request through Tor
+# taking tens of seconds.
+DEF_BUCKETS = (
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+# The address the metrics server listens on. It's only reachable locally.
+DEF_METRICS_HOST = "127.0.0.1"
+# The default time (in seconds) between summary lines.
+DEF_SUMMARY_INTERVAL = 10
+# The prefix of every exported metric name.
+PREFIX = "fileroulette"
+# Counters whose names start with one of these prefixes are exported as one
+# labelled metric, as (metric name, label name).
+LABELLED_COUNTERS = {
+    "status_": ("responses", "category"),
+    "exception_": ("exceptions", "type"),
+}
+# What each latency histogram measures, for the exported help text.
+STAGE_HELP = {
+    "keygen": "generating a batch of URLs",
+    "head": "HEAD requests",
+    "get": "GET requests",
+    "check_output": "checking a downloaded page",
+}
+
+
+class Histogram:
+    """Count latencies in buckets, as a Prometheus histogram does.
+
+    Attributes
+    ----------
+    buckets : tuple
+        The upper bounds (in seconds) of the buckets, in increasing order.
+        Latencies above the last bound fall into a final, unbounded bucket.
+
+    """
+
+    def __init__(self, buckets=DEF_BUCKETS):
+        """Initialize an empty histogram."""
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        """Count a latency (in seconds)."""
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += seconds
+
+    def quantile(self, fraction, snapshot=None):
+        """Estimate a quantile of the latencies counted so far.
+
+        Within a bucket, latencies are assumed to be spread evenly, as
+        Prometheus assumes for `histogram_quantile`.
+
+        Parameters
+        ----------
+        fraction : float
+            The quantile, as a fraction (such as 0.95).
+        snapshot : tuple or None
+            A snapshot to use, as returned by `snapshot`, rather than taking
+            a new one.
+
+        Returns
+        -------
+        float or None
+            The estimated latency (in seconds), or None if nothing has been
+            counted.
+
+        """
+        (counts, _, total) = snapshot or self.snapshot()
+        if not total:
+            return None
+        rank = fraction * total
+        seen = 0
+        for index, count in enumerate(counts):
+            if count and seen + count >= rank:
+                if index == len(self.buckets):
+                    # There's no upper bound to interpolate towards.
+                    return self.buckets[-1]
+                lower = self.buckets[index - 1] if index else 0.0
+                upper = self.buckets[index]
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+    def snapshot(self):
+        """Return a consistent copy of the histogram.
+
+        Returns
+        -------
+        counts : list
+            The number of latencies in each bucket (not cumulative), with
+            the unbounded bucket last.
+        sum : float
+            The sum of every latency counted.
+        count : int
+            The number of latencies counted.
+
+        """
+        with self._lock:
+            counts = list(self._counts)
+            return (counts, self._sum, sum(counts))
+
+
+def _format_seconds(seconds):
+    """Format a latency briefly, such as "850us", "42ms" or "1.3s"."""
+    if seconds is None:
+        return "-"
+    if seconds < 0.001:
+        return "{:.0f}us".format(seconds * 1e6)
+    if seconds < 1:
+        return "{:.0f}ms".format(seconds * 1e3)
+    return "{:.1f}s".format(seconds)
+
+
+def _format_bytes(count):
+    """Format a number of bytes briefly, such as "12.3 MB"."""
+    if count < 1024:
+        return "{} B".format(count)
+    for unit in ("KB", "MB", "GB"):
+        count /= 1024
+        if count < 1024 or unit == "GB":
+            return "{:.1f} {}".format(count, unit)
+
+
+def render_prometheus(stats, histograms, labels=None):
+    """Render counters and histograms in the Prometheus text format.
+
+    Parameters
+    ----------
+    stats : dict
+        The module's counters, by name.
+    histograms : dict
+        The module's latency Histogram for every stage, by stage name.
+    labels : dict or None
+        Labels added to every metric, such as the module's name.
+
+    Returns
+    -------
+    str
+        The metrics, ready to be served.
+
+    """
+    base = dict(labels or dict())
+
+    def label_text(extra=None):
+        merged = dict(base, **(extra or dict()))
+        if not merged:
+            return ""
+        return "{{{}}}".format(
+            ",".join(
+                '{}="{}"'.format(
+                    name, str(value).replace("\\", "\\\\").replace('"', '\\"')
+                )
+                for name, value in sorted(merged.items())
+            )
+        )
+
+    lines = list()
+    grouped = dict()
+    for name, value in sorted(stats.items()):
+        for prefix, (metric, label) in LABELLED_COUNTERS.items():
+            if name.startswith(prefix):
+                grouped.setdefault((metric, label), list()).append(
+                    (name[len(prefix):], value)
+                )
+                break
+        else:
+            metric = "{}_{}_total".format(PREFIX, name)
+            lines.append("# TYPE {} counter".format(metric))
+            lines.append("{}{} {}".format(metric, label_text(), value))
+    for (metric, label), values in sorted(grouped.items()):
+        metric = "{}_{}_total".format(PREFIX, metric)
+        lines.append("# TYPE {} counter".format(metric))
+        for value_label, value in values:
+            lines.append(
+                "{}{} {}".format(
+                    metric, label_text({label: value_label}), value
+                )
+            )
+    metric = "{}_latency_seconds".format(PREFIX)
+    lines.append(
+        "# HELP {} Latency of each stage: {}.".format(
+            metric,
+            ", ".join(
+                "{} ({})".format(stage, text)
+                for stage, text in STAGE_HELP.items()
+            ),
+        )
+    )
+    lines.append("# TYPE {} histogram".format(metric))
+    for stage, histogram in sorted(histograms.items()):
+        (counts, total_sum, total) = histogram.snapshot()
+        cumulative = 0
+        bounds = [str(bound) for bound in histogram.buckets] + ["+Inf"]
+        for bound, count in zip(bounds, counts):
+            cumulative += count
+            lines.append(
+                "{}_bucket{} {}".format(
+                    metric,
+                    label_text({"stage": stage, "le": bound}),
+                    cumulative,
+                )
+            )
+        lines.append(
+            "{}_sum{} {}".format(
+                metric, label_text({"stage": stage}), total_sum
+            )
+        )
+        lines.append(
+            "{}_count{} {}".format(metric, label_text({"stage": stage}), total)
+        )
+    return "\n".join(lines) + "\n"
+
+
+def format_summary(stats, histograms, previous, elapsed):
+    """Format a one-line summary of a module's progress.
+
+    Parameters
+    ----------
+    stats : dict
+        The module's counters, by name.
+    histograms : dict
+        The module's latency Histogram for every stage, by stage name.
+    previous : dict
+        The counters at the time of the last summary, used for the rate.
+    elapsed : float
+        The time (in seconds) since the last summary.
+
+    Returns
+    -------
+    str
+        A line such as "1200 probes (98.0/s), 1 hits, 2.1 MB received |
+        head p50=45ms p95=310ms | ... | rejected=1150 error=12".
+
+    """
+    probes = stats.get("probes", 0)
+    rate = (probes - previous.get("probes", 0)) / elapsed if elapsed else 0.0
+    parts = [
+        "{} probes ({:.1f}/s), {} hits, {} received".format(
+            probes,
+            rate,
+            stats.get("hits", 0),
+            _format_bytes(stats.get("bytes_received", 0)),
+        )
+    ]
+    for stage in STAGE_HELP:
+        histogram = histograms.get(stage)
+        snapshot = histogram and histogram.snapshot()
+        if snapshot and snapshot[2]:
+            parts.append(
+                "{} p50={} p95={}".format(
+                    stage,
+                    _format_seconds(histogram.quantile(0.5, snapshot)),
+                    _format_seconds(histogram.quantile(0.95, snapshot)),
+                )
+            )
+    statuses = " ".join(
+        "{}={}".format(name[len("status_"):], value)
+        for name, value in sorted(stats.items())
+        if name.startswith("status_")
+    )
+    if statuses:
+        parts.append(statuses)
+    errors = sum(
+        value
+        for name, value in stats.items()
+        if name.startswith("exception_")
+    )
+    if errors:
+        parts.append("{} exceptions".format(errors))
+    return " | ".join(parts)
+
+
+class MetricsServer:
+    """Serve a module's metrics over HTTP, in the Prometheus text format.
+
+    Attributes
+    ----------
+    port : int
+        The port the server listens on.
+
+    """
+
+    def __init__(self, module, port, host=DEF_METRICS_HOST, labels=None):
+        """Start the server on a thread of its own.
+
+        Parameters
+        ----------
+        module : BaseModule
+            The module whose metrics are served.
+        port : int
+            The port to listen on, or 0 to pick a free one.
+        host : str
+            The address to listen on.
+        labels : dict or None
+            Labels added to every metric. The module's name is always added.
+
+        """
+        labels = dict({"module": module.name}, **(labels or dict()))
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = render_prometheus(
+                    module.snapshot_stats(), module.histograms, labels
+                ).encode()
+                self.send_response(200)
+                self.send_header(
+                    "Content-Type", "text/plain; version=0.0.4; charset=utf-8"
+                )
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="metrics", daemon=True
+        )
+        self._thread.start()
+
+    def close(self):
+        """Stop the server."""
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class SummaryReporter:
+    """Print a summary line of a module's progress every few seconds."""
+
+    def __init__(self, module, interval=DEF_SUMMARY_INTERVAL, label=None):
+        """Start printing summaries on a thread of its own.
+
+        Parameters
+        ----------
+        module : BaseModule
+            The module to summarize.
+        interval : float
+            The time (in seconds) between summary lines.
+        label : str or None
+            Printed at the start of every line, such as the worker's number.
+
+        """
+        self._module = module
+        self._interval = interval
+        self._label = label or module.name
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._report, name="summary", daemon=True
+        )
+        self._thread.start()
+
+    def _report(self):
+        """Print a summary line every interval, until stopped."""
+        previous = self._module.snapshot_stats()
+        last = time.monotonic()
+        while not self._stop.wait(self._interval):
+            stats = self._module.snapshot_stats()
+            now = time.monotonic()
+            print(
+                "[{}] {}".format(
+                    self._label,
+                    format_summary(
+                        stats, self._module.histograms, previous, now - last
+                    ),
+                ),
+                flush=True,
+            )
+            (previous, last) = (stats, now)
+
+    def close(self):
+        """Stop printing summaries."""
+        self._stop.set()
+        self._thread.join()
@@ -0,0 +1,313 @@
+"""Run a data source module across several processes at once.
+
+Parsing pages is CPU-bound, so threads alone can't make use of more than one
+core. This module spawns a number of worker processes, each running its own
+instance of a data source module with its own sessions and its own disjoint
+shard of the keyspace. Results and counters are sent back to the parent
+process, which displays them and stops the workers once a match has been found.
+"""
+
+import collections
+import multiprocessing
+import os
+import queue
+import random
+import threading
+import time
+
+from fileroulette.libs.profiling import DEF_PROFILE_DIR, PROFILERS
+from fileroulette.libs.proxies import DEF_CHECK_URL
+
+# How long (in seconds) the parent waits for each worker to report its final
+# counters after being told to stop.
+STOP_TIMEOUT = 5
+# How often (in seconds) a worker checks whether it's been told to stop.
+POLL_INTERVAL = 0.1
+
+
+class _ParentSink:
+    """A result sink which sends every hit back to the parent process."""
+
+    def __init__(self, index, results):
+        """Send hits through the `results` queue, as worker `index`."""
+        self._index = index
+        self._results = results
+
+    def write(self, module_name, url, result, key=None):
+        """Send a hit to the parent, which displays and writes it."""
+        self._results.put(("hit", self._index, (url, result, key)))
+
+
+def _scan_worker(
+    index,
+    count,
+    seed,
+    module_name,
+    agent,
+    proxies,
+    proxy_check_url,
+    coverage_dir,
+    profile,
+    profile_dir,
+    options,
+    results,
+    stop,
+):
+    """Run a module inside a worker process until told to stop.
+
+    Parameters
+    ----------
+    index : int
+        The number of this worker, which is also its keyspace shard.
+    count : int
+        The total number of workers (and shards).
+    seed : int
+        The seed of the keyspace walk shared by every worker.
+    module_name : str
+        The name of the module to run, as listed in MODULE_DICT.
+    agent : bool
+        Whether to enable random user agents.
+    proxies : list or None
+        The ProxyCheck of every live proxy found by the parent, or None to
+        disable proxies.
+    proxy_check_url : str
+        The URL requested through failing proxies to check whether they've
+        recovered.
+    coverage_dir : str or None
+        The folder holding the shared coverage map, if coverage is enabled.
+    profile : str or None
+        The name of the profiler to run the scan under, if any.
+    profile_dir : str
+        The folder the worker's profile report is written to.
+    options : dict
+        The keyword arguments passed on to `fileroulette.run_engine`.
+    results : multiprocessing.Queue
+        The queue used to send hits, errors and counters to the parent.
+    stop : multiprocessing.Event
+        Set by the parent when every worker should shut down.
+
+    """
+    # This is imported here to avoid a circular import, as the fileroulette
+    # package imports this module.
+    from fileroulette import MODULE_DICT, run_engine
+
+    # Forked workers inherit the parent's random state. Reseed so that the
+    # workers don't all pick the same agents and proxies.
+    random.seed()
+    module = MODULE_DICT[module_name](agent=agent, proxy=False)
+    if proxies:
+        module.use_proxies(proxies, proxy_check_url)
+    if coverage_dir:
+        module.enable_coverage(coverage_dir)
+    # Only probe the keys in this worker's shard of the keyspace.
+    module.select_shard(index, count, seed)
+    # Send hits (with their keys) to the parent instead of printing them
+    # here.
+    module.use_sink(_ParentSink(index, results))
+    module.result_handler = lambda url, result: None
+    # Tell the workers' metrics apart. Every worker serves its own, on the
+    # ports after the first.
+    options = dict(options, metrics_label="worker {}".format(index))
+    if options.get("metrics_port"):
+        options["metrics_port"] += index
+    errors = list()
+    profiler = None
+    if profile:
+        # Profile from this thread, so that the profiler sees the scan
+        # thread (and its threads) start.
+        profiler = PROFILERS[profile](
+            "{} worker {}".format(module_name, index), profile_dir
+        )
+        profiler.start()
+
+    def scan():
+        try:
+            run_engine(module, **options)
+        except Exception as exception:
+            errors.append(exception)
+
+    # Run the engine on a separate thread so that this one can keep an eye
+    # on the stop event.
+    thread = threading.Thread(target=scan, daemon=True)
+    thread.start()
+    while thread.is_alive() and not stop.wait(POLL_INTERVAL):
+        pass
+    if errors:
+        results.put(("error", index, repr(errors[0])))
+    results.put(("stats", index, dict(module.stats)))
+    if module.coverage:
+        module.coverage.flush()
+    if profiler:
+        # Write the report now, as nothing runs after `os._exit`.
+        profiler.stop()
+    # Make sure everything has been sent, then exit without waiting on any
+    # probes that may still be in flight.
+    results.close()
+    results.join_thread()
+    os._exit(0)
+
+
+def format_stats(stats, elapsed):
+    """Format a summary line for a set of counters.
+
+    Parameters
+    ----------
+    stats : dict
+        The counters to summarize.
+    elapsed : float
+        The number of seconds the scan ran for.
+
+    Returns
+    -------
+    str
+        A line such as "1200 probes, 1 hits in 12.0s (100.0 probes/s)".
+
+    """
+    rate = stats.get("probes", 0) / elapsed if elapsed else 0.0
+    return "{} probes, {} hits in {:.1f}s ({:.1f} probes/s)".format(
+        stats.get("probes", 0), stats.get("hits", 0), elapsed, rate
+    )
+
+
+def run_processes(
+    module_name,
+    processes,
+    agent=False,
+    proxy=False,
+    coverage_dir=None,
+    proxy_check_url=DEF_CHECK_URL,
+    sink=None,
+    profile=None,
+    profile_dir=DEF_PROFILE_DIR,
+    **options
+):
+    """Run a module in several worker processes until one finds a match.
+
+    Parameters
+    ----------
+    module_name : str
+        The name of the module to run, as listed in MODULE_DICT.
+    processes : int
+        The number of worker processes to start.
+    agent : bool
+        Whether to enable random user agents.
+    proxy : bool
+        Whether to enable random proxies.
+    coverage_dir : str or None
+        If set, the workers share the coverage map in this folder, skipping
+        keys probed by earlier runs.
+    proxy_check_url : str
+        The URL requested through each proxy to check that it works. The
+        proxies are checked once, by the parent, and shared by every worker.
+    sink : ResultSink or None
+        If set, every hit the workers send back is written to this sink,
+        including any found after the first.
+    profile : str or None
+        If set, the name of the profiler every worker runs its scan under.
+        Each worker writes its own report.
+    profile_dir : str
+        The folder the profile reports are written to.
+    **options
+        The keyword arguments passed on to `fileroulette.run_engine` in every
+        worker, such as the engine and its concurrency.
+
+    Returns
+    -------
+    collections.Counter
+        The counters of every worker, added together.
+
+    """
+    # This is imported here to avoid a circular import, as the fileroulette
+    # package imports this module.
+    from fileroulette import MODULE_DICT
+
+    print(
+        "Running {} module in {} processes...".format(module_name, processes)
+    )
+    results = multiprocessing.Queue()
+    stop = multiprocessing.Event()
+    # This copy of the module is only used to check the proxies, and to
+    # display results and coverage.
+    module = MODULE_DICT[module_name](agent=False, proxy=proxy)
+    proxies = None
+    if proxy:
+        module.check_proxies(proxy_check_url)
+        proxies = [check for check in module.proxy_checks if check.alive]
+    if coverage_dir:
+        # Open (or create) the coverage map before starting the workers, so
+        # they all agree on the keyspace walk it records.
+        module.enable_coverage(coverage_dir)
+    # Every worker walks the same keyspace permutation, but each one only
+    # covers its own shard of it.
+    seed = module.keyspace.seed
+    workers = [
+        multiprocessing.Process(
+            target=_scan_worker,
+            args=(
+                index,
+                processes,
+                seed,
+                module_name,
+                agent,
+                proxies,
+                proxy_check_url,
+                coverage_dir,
+                profile,
+                profile_dir,
+                options,
+                results,
+                stop,
+            ),
+            daemon=True,
+        )
+        for index in range(processes)
+    ]
+    start = time.monotonic()
+    for worker in workers:
+        worker.start()
+    stats = collections.Counter()
+    reported = set()
+    hits = 0
+    try:
+        while len(reported) < processes:
+            try:
+                (kind, index, payload) = results.get(
+                    timeout=STOP_TIMEOUT if stop.is_set() else None
+                )
+            except queue.Empty:
+                # Some workers didn't report back in time.
+                break
+            if kind == "hit":
+                hits += 1
+                (url, result, key) = payload
+                if sink:
+                    # Keep every hit, even those that arrive while the
+                    # workers are stopping.
+                    sink.write(module_name, url, result, key)
+                # Display the first match, then stop every worker.
+                if not stop.is_set():
+                    module.result_handler(url, result)
+                    stop.set()
+            elif kind == "error":
+                print("Worker {} failed: {}".format(index, payload))
+                stop.set()
+            elif kind == "stats":
+                stats.update(payload)
+                reported.add(index)
+    except KeyboardInterrupt:
+        stop.set()
+        raise
+    finally:
+        for worker in workers:
+            worker.join(timeout=STOP_TIMEOUT)
+            if worker.is_alive():
+                worker.terminate()
+    # A worker sends its counters while its last probes may still be running,
+    # so its hit count can miss hits it sent afterwards. Count the hits that
+    # arrived instead.
+    stats["hits"] = hits
+    print(format_stats(stats, time.monotonic() - start))
+    module.stats.update(stats)
+    module.report_stats()
+    module.report_coverage()
+    return stats
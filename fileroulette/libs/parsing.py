@@ -0,0 +1,130 @@
+"""Check downloaded pages in a pool of separate processes.
+
+Parsing pages (especially with BeautifulSoup) is CPU-bound, so doing it on the
+same threads that make the HTTP requests slows the whole scan down. This module
+defines the ParserPool class, which hands the raw bytes of each page over to a
+pool of processes. Each process keeps its own instance of the data source
+module, and runs the module's `check_content` method on the pages it receives.
+Pages are handed over without waiting for them to be checked: each result is
+passed to a callback once it's back, so the scan carries on in the meantime.
+"""
+
+import functools
+import threading
+
+from concurrent.futures import ProcessPoolExecutor
+
+# The most pages waiting to be checked, for each parser process. Past that,
+# `submit` blocks, so that a slow parser holds the scan back instead of
+# letting downloaded pages pile up in memory.
+BACKLOG_PER_PROCESS = 8
+
+# The instance of the data source module used inside each parser process.
+_MODULE = None
+
+
+def _init_parser(module_name):
+    """Create the data source module used by a parser process.
+
+    Parameters
+    ----------
+    module_name : str
+        The name of the module, as listed in MODULE_DICT.
+
+    """
+    # This is imported here to avoid a circular import, as the modules import
+    # this library.
+    from fileroulette.libs.module_loader import MODULE_DICT
+
+    global _MODULE
+    _MODULE = MODULE_DICT[module_name](agent=False, proxy=False)
+
+
+def _parse_page(content):
+    """Check a page's raw content inside a parser process."""
+    return _MODULE.check_content(content)
+
+
+class ParserPool:
+    """A pool of processes running a module's `check_content` method.
+
+    Attributes
+    ----------
+    processes : int
+        The number of parser processes.
+
+    """
+
+    def __init__(self, module_name, processes):
+        """Start the parser processes.
+
+        Parameters
+        ----------
+        module_name : str
+            The name of the module, as listed in MODULE_DICT.
+        processes : int
+            The number of parser processes to start.
+
+        """
+        self.processes = processes
+        self._executor = ProcessPoolExecutor(
+            max_workers=processes,
+            initializer=_init_parser,
+            initargs=(module_name,),
+        )
+        self._slots = threading.Semaphore(processes * BACKLOG_PER_PROCESS)
+        # The number of pages whose callback hasn't returned yet.
+        self._pending = 0
+        self._condition = threading.Condition()
+
+    def _finish(self, callback, future):
+        """Run a page's callback, then give back the page's slot."""
+        try:
+            if callback:
+                callback(future)
+        finally:
+            self._slots.release()
+            with self._condition:
+                self._pending -= 1
+                self._condition.notify_all()
+
+    def close(self):
+        """Shut down the parser processes, dropping the waiting pages."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def submit(self, content, callback=None):
+        """Send a page off to be checked, without waiting for the result.
+
+        This only blocks if the parser processes are too far behind.
+
+        Parameters
+        ----------
+        content : bytes
+            The raw content of the page.
+        callback : callable or None
+            Called with the future once it's done (or cancelled by `close`),
+            on one of the pool's threads.
+
+        Returns
+        -------
+        concurrent.futures.Future
+            A future which will hold the data returned by `check_output`, or
+            False if there was none.
+
+        """
+        self._slots.acquire()
+        with self._condition:
+            self._pending += 1
+        try:
+            future = self._executor.submit(_parse_page, content)
+        except BaseException:
+            self._finish(None, None)
+            raise
+        future.add_done_callback(functools.partial(self._finish, callback))
+        return future
+
+    def wait(self):
+        """Wait until the callback of every page sent so far has returned."""
+        with self._condition:
+            while self._pending:
+                self._condition.wait()
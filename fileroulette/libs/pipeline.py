@@ -0,0 +1,183 @@
+"""A staged, threaded pipeline with bounded queues between the stages.
+
+This module defines the Stage and Pipeline classes. A pipeline is made up of a
+chain of stages, each with its own pool of worker threads. The stages are
+linked together by bounded queues, so a slow stage fills up the queue in front
+of it and stalls the stages before it (backpressure) rather than letting work
+pile up in memory. Watching the depth of each queue shows which stage is the
+bottleneck.
+"""
+
+import queue
+import threading
+import time
+
+# The default maximum number of items waiting between two stages.
+DEF_QUEUE_SIZE = 100
+# How long (in seconds) a worker blocks on a queue before checking whether the
+# pipeline has been stopped.
+POLL_INTERVAL = 0.1
+
+
+class Stage:
+    """Define a single stage of a pipeline.
+
+    Attributes
+    ----------
+    name : str
+        The name of the stage, used when reporting queue depths.
+    func : callable
+        The function executed for every item, called as `func(state, item)`.
+        It returns the item to hand to the next stage, or None to drop it.
+        The first stage of a pipeline is the source, and is always called
+        with an item of None.
+    workers : int
+        The number of worker threads running this stage.
+    setup : callable or None
+        An optional function called once by each worker thread before it
+        starts. Its return value is passed to `func` as the `state` argument,
+        which is useful for giving every worker its own session.
+
+    """
+
+    def __init__(self, name, func, workers=1, setup=None):
+        """Initialize the stage."""
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.setup = setup
+
+
+class Pipeline:
+    """Run a chain of stages linked by bounded queues.
+
+    Attributes
+    ----------
+    stages : list
+        The Stage instances, in the order that items flow through them.
+    queues : list
+        The bounded queues feeding each stage after the first.
+
+    """
+
+    def __init__(self, stages, queue_size=DEF_QUEUE_SIZE):
+        """Initialize the pipeline.
+
+        Parameters
+        ----------
+        stages : list
+            The Stage instances, in the order that items flow through them.
+        queue_size : int
+            The maximum number of items waiting in front of each stage.
+
+        """
+        self.stages = stages
+        self.queue_size = queue_size
+        self.queues = [queue.Queue(maxsize=queue_size) for _ in stages[1:]]
+        self._stop_event = threading.Event()
+        self._errors = list()
+
+    def depths(self):
+        """Return the number of items waiting in front of each stage.
+
+        Returns
+        -------
+        dict
+            A dict mapping each stage name (except the source) to the number
+            of items currently queued for it.
+
+        """
+        return {
+            stage.name: work_queue.qsize()
+            for stage, work_queue in zip(self.stages[1:], self.queues)
+        }
+
+    def report(self):
+        """Print the current depth of every queue in the pipeline."""
+        depths = self.depths()
+        print(
+            "Queue depths: {}".format(
+                ", ".join(
+                    "{}={}/{}".format(name, depth, self.queue_size)
+                    for name, depth in depths.items()
+                )
+            )
+        )
+
+    def run(self, report_interval=None):
+        """Start every stage and block until the pipeline is stopped.
+
+        Parameters
+        ----------
+        report_interval : float or None
+            If set, print the queue depths every `report_interval` seconds.
+
+        """
+        threads = list()
+        for index, stage in enumerate(self.stages):
+            for _ in range(stage.workers):
+                thread = threading.Thread(
+                    target=self._work, args=(index,), daemon=True
+                )
+                thread.start()
+                threads.append(thread)
+        last_report = time.monotonic()
+        while not self._stop_event.wait(POLL_INTERVAL):
+            if report_interval and (
+                time.monotonic() - last_report >= report_interval
+            ):
+                self.report()
+                last_report = time.monotonic()
+        for thread in threads:
+            thread.join()
+        # Re-raise the first exception raised by any of the workers.
+        if self._errors:
+            raise self._errors[0]
+
+    def stop(self):
+        """Signal every worker to stop once it finishes its current item."""
+        self._stop_event.set()
+
+    def stopped(self):
+        """Return True if the pipeline has been stopped."""
+        return self._stop_event.is_set()
+
+    def _work(self, index):
+        """Process items for a single stage until the pipeline stops.
+
+        Parameters
+        ----------
+        index : int
+            The position of the stage in the pipeline.
+
+        """
+        stage = self.stages[index]
+        # The source stage has no queue in front of it, and the final stage
+        # has no queue behind it.
+        in_queue = self.queues[index - 1] if index > 0 else None
+        out_queue = self.queues[index] if index < len(self.queues) else None
+        try:
+            state = stage.setup() if stage.setup else None
+            while not self.stopped():
+                if in_queue is None:
+                    item = None
+                else:
+                    try:
+                        item = in_queue.get(timeout=POLL_INTERVAL)
+                    except queue.Empty:
+                        continue
+                item = stage.func(state, item)
+                if item is None or out_queue is None:
+                    continue
+                # Block while the next stage is backed up, but keep checking
+                # whether we've been told to stop.
+                while not self.stopped():
+                    try:
+                        out_queue.put(item, timeout=POLL_INTERVAL)
+                        break
+                    except queue.Full:
+                        continue
+        except Exception as exception:
+            # Halt the whole pipeline and hand the exception to `run`.
+            self._errors.append(exception)
+            self.stop()
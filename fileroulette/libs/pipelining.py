@@ -0,0 +1,344 @@
+"""Send many requests over one keep-alive connection with HTTP/1.1 pipelining.
+
+When a status code is all it takes to reject most keys, the cost of a probe
+is mostly overhead: a full trip through requests and urllib3 for every HEAD
+request, and a round trip to the server (through the proxy, if there is one)
+before the next request can be sent. With HTTP/1.1 pipelining, a whole batch
+of requests is written to the connection at once, and the responses, which
+the server must send back in the same order, are read off the connection one
+after the other.
+
+This module defines the PipelinedConnection class, a deliberately small
+HTTP/1.1 client which does just that, directly or through a SOCKS5 proxy. It
+reads and parses responses incrementally, and gives up as soon as anything
+unusual happens (an informational response, a body it can't find the end of,
+a connection closed early, a malformed header): the responses read up to
+that point are returned, and the caller sends the rest of the requests the
+normal way.
+"""
+
+import datetime
+import socket
+import ssl
+import time
+
+from urllib.parse import urlsplit
+
+import socks
+
+from requests.structures import CaseInsensitiveDict
+
+# The default number of requests written to a connection at once.
+DEF_DEPTH = 16
+# The number of bytes read from the connection at a time.
+RECV_SIZE = 65536
+# The largest response header accepted, in bytes.
+MAX_HEADER_SIZE = 65536
+# Status codes which redirect to the URL in the Location header.
+REDIRECT_CODES = (301, 302, 303, 307, 308)
+
+
+class PipelineError(Exception):
+    """A response was too unusual to be read off a pipelined connection."""
+
+
+class PipelinedResponse:
+    """A response read off a pipelined connection.
+
+    This carries the parts of a requests.Response which are used to judge a
+    probe, so the two can be handled by the same code.
+
+    Attributes
+    ----------
+    url : str
+        The URL which was requested.
+    status_code : int
+        The HTTP status code of the response.
+    reason : str
+        The reason phrase which followed the status code.
+    headers : requests.structures.CaseInsensitiveDict
+        The response headers. Repeated headers are joined with commas.
+    cookies : dict
+        The value of every cookie set by the response, by cookie name.
+    content : bytes
+        The body of the response (empty for HEAD requests).
+    elapsed : datetime.timedelta
+        The time between sending the batch of requests and reading this
+        response's header.
+
+    """
+
+    def __init__(self, url, status_code, reason, headers, cookies, elapsed):
+        """Initialize the response, without a body."""
+        self.url = url
+        self.status_code = status_code
+        self.reason = reason
+        self.headers = headers
+        self.cookies = cookies
+        self.content = b""
+        self.elapsed = elapsed
+
+    @property
+    def is_redirect(self):
+        """True if the response redirects to another URL."""
+        return (
+            self.status_code in REDIRECT_CODES and "location" in self.headers
+        )
+
+    def close(self):
+        """Do nothing, as the body has already been read."""
+
+
+class PipelinedConnection:
+    """A keep-alive connection to one site, over which requests are pipelined.
+
+    Attributes
+    ----------
+    origin : tuple
+        The (scheme, host, port) of the site.
+    proxy : tuple or None
+        The (ip, port) of the SOCKS5 proxy the connection goes through, if
+        any.
+
+    """
+
+    def __init__(
+        self,
+        url,
+        proxy=None,
+        ssl_context=None,
+        connect_timeout=None,
+        read_timeout=None,
+    ):
+        """Prepare a connection to a URL's site. Nothing is sent yet.
+
+        Parameters
+        ----------
+        url : str
+            Any URL on the site.
+        proxy : tuple or None
+            The (ip, port) of a SOCKS5 proxy to connect through. Host names
+            are resolved by the proxy.
+        ssl_context : ssl.SSLContext or None
+            The TLS settings for HTTPS sites. If omitted, Python's defaults
+            are used.
+        connect_timeout : float or None
+            How long (in seconds) to wait for the connection to be made.
+        read_timeout : float or None
+            How long (in seconds) to wait for each read from the connection.
+
+        """
+        self.origin = self.origin_of(url)
+        self.proxy = proxy
+        self._ssl_context = ssl_context
+        self._connect_timeout = connect_timeout
+        self._read_timeout = read_timeout
+        self._sock = None
+        self._buffer = bytearray()
+
+    @staticmethod
+    def _cookies_of(lines):
+        """Return the cookies set by a list of Set-Cookie header values."""
+        cookies = dict()
+        for line in lines:
+            (pair, _, _) = line.partition(";")
+            (name, _, value) = pair.partition("=")
+            if name.strip():
+                cookies[name.strip()] = value.strip()
+        return cookies
+
+    def _connect(self):
+        """Open the connection, through the proxy if there is one."""
+        (scheme, host, port) = self.origin
+        if self.proxy:
+            sock = socks.create_connection(
+                (host, port),
+                timeout=self._connect_timeout,
+                proxy_type=socks.SOCKS5,
+                proxy_addr=self.proxy[0],
+                proxy_port=self.proxy[1],
+                proxy_rdns=True,
+            )
+        else:
+            sock = socket.create_connection(
+                (host, port), timeout=self._connect_timeout
+            )
+        # Requests are written in one go, so there's nothing to wait for.
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if scheme == "https":
+            context = self._ssl_context or ssl.create_default_context()
+            sock = context.wrap_socket(sock, server_hostname=host)
+        sock.settimeout(self._read_timeout)
+        self._sock = sock
+        self._buffer.clear()
+
+    def _fill(self):
+        """Read more of the connection into the buffer."""
+        data = self._sock.recv(RECV_SIZE)
+        if not data:
+            raise PipelineError("The connection was closed early.")
+        self._buffer += data
+
+    def _read_body(self, length):
+        """Take a body of the given length off the buffer."""
+        while len(self._buffer) < length:
+            self._fill()
+        body = bytes(self._buffer[:length])
+        del self._buffer[:length]
+        return body
+
+    def _read_response(self, method, url, started):
+        """Read the next response off the connection.
+
+        Returns
+        -------
+        response : PipelinedResponse
+            The response.
+        keep_alive : bool
+            False if the server will close the connection after this
+            response.
+
+        Raises
+        ------
+        PipelineError
+            If the response is unusual, or the connection was closed.
+
+        """
+        while True:
+            end = self._buffer.find(b"\r\n\r\n")
+            if end != -1:
+                break
+            if len(self._buffer) > MAX_HEADER_SIZE:
+                raise PipelineError("The response header is too large.")
+            self._fill()
+        elapsed = datetime.timedelta(seconds=time.monotonic() - started)
+        lines = self._buffer[:end].decode("latin-1").split("\r\n")
+        del self._buffer[: end + 4]
+        (version, _, rest) = lines[0].partition(" ")
+        (code, _, reason) = rest.partition(" ")
+        if version != "HTTP/1.1" or not code.isdigit():
+            raise PipelineError("Unexpected status line: {}".format(lines[0]))
+        status_code = int(code)
+        if status_code < 200:
+            raise PipelineError("Informational responses aren't supported.")
+        headers = CaseInsensitiveDict()
+        set_cookies = list()
+        for line in lines[1:]:
+            (name, colon, value) = line.partition(":")
+            if not colon or name != name.strip():
+                # Folded or malformed header lines.
+                raise PipelineError("Malformed header: {}".format(line))
+            value = value.strip()
+            if name.lower() == "set-cookie":
+                set_cookies.append(value)
+            if name in headers:
+                value = "{}, {}".format(headers[name], value)
+            headers[name] = value
+        response = PipelinedResponse(
+            url,
+            status_code,
+            reason,
+            headers,
+            self._cookies_of(set_cookies),
+            elapsed,
+        )
+        keep_alive = "close" not in headers.get("Connection", "").lower()
+        if method == "HEAD" or status_code in (204, 304):
+            return (response, keep_alive)
+        if "Transfer-Encoding" in headers:
+            raise PipelineError("Chunked bodies aren't supported.")
+        length = headers.get("Content-Length", "")
+        if not length.isdigit():
+            # The body runs until the connection closes.
+            raise PipelineError("The body has no length.")
+        response.content = self._read_body(int(length))
+        return (response, keep_alive)
+
+    def close(self):
+        """Close the connection, if it's open."""
+        if self._sock:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+            self._sock = None
+
+    @staticmethod
+    def origin_of(url):
+        """Return the (scheme, host, port) of a URL."""
+        parts = urlsplit(url)
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        return (parts.scheme, parts.hostname, port)
+
+    def request_many(self, method, urls, headers=None):
+        """Pipeline a request for every URL, and read back the responses.
+
+        Parameters
+        ----------
+        method : str
+            The HTTP method, "HEAD" or "GET".
+        urls : list
+            The URLs to request. They must all be on the connection's site.
+        headers : dict or None
+            Headers to send with every request. The Host header is added.
+
+        Returns
+        -------
+        list
+            The PipelinedResponse of every URL, in order. If something
+            unusual happened, the list stops short, and the URLs without a
+            response should be requested the normal way.
+
+        """
+        (scheme, host, port) = self.origin
+        default_port = 443 if scheme == "https" else 80
+        host_header = host if port == default_port else "{}:{}".format(
+            host, port
+        )
+        lines = "".join(
+            "{}: {}\r\n".format(name, value)
+            for name, value in (headers or dict()).items()
+            if name.lower() not in ("host", "connection")
+        )
+        messages = list()
+        for url in urls:
+            if self.origin_of(url) != self.origin:
+                raise ValueError("{} is on another site.".format(url))
+            parts = urlsplit(url)
+            target = parts.path or "/"
+            if parts.query:
+                target += "?" + parts.query
+            messages.append(
+                "{} {} HTTP/1.1\r\nHost: {}\r\n{}\r\n".format(
+                    method, target, host_header, lines
+                )
+            )
+        data = "".join(messages).encode("latin-1")
+        responses = list()
+        reused = False
+        # A kept-alive connection may have been closed by the server while
+        # it sat idle, so if nothing at all comes back over it, the batch is
+        # sent once more over a new connection.
+        for reconnect in (False, True):
+            if reconnect and (responses or not reused):
+                break
+            reused = self._sock is not None
+            try:
+                if not reused:
+                    self._connect()
+                started = time.monotonic()
+                self._sock.sendall(data)
+                for url in urls:
+                    (response, keep_alive) = self._read_response(
+                        method, url, started
+                    )
+                    responses.append(response)
+                    if not keep_alive:
+                        self.close()
+                        break
+                break
+            except (OSError, PipelineError):
+                # Whatever went wrong, the connection can't be trusted to
+                # line up requests and responses any more.
+                self.close()
+        return responses
@@ -0,0 +1,464 @@
+"""Profile a scan while it runs, and write reports at exit or on a signal.
+
+Three profilers are available, each with its own trade-off:
+
+CProfileProfiler ("cprofile")
+    Every function call on every scanning thread is timed with cProfile. The
+    most detailed, and the slowest: the scan runs several times slower while
+    it's profiled.
+SamplingProfiler ("sample")
+    A background thread looks at the stack of every other thread a hundred
+    times a second, and charges the CPU time each thread used since the last
+    look to the functions on its stack. Cheap enough to leave running on a
+    long scan.
+TracemallocProfiler ("tracemalloc")
+    Every memory allocation is traced with tracemalloc, to find the lines
+    which hold the most memory.
+
+The cProfile and sampling reports list the functions which used the most CPU
+time, and split the CPU time between the stages of a probe (generating keys,
+sending requests, reading pages and checking them), found by looking for the
+functions in STAGE_FUNCTIONS on the stack. A report is written when the
+profiler stops, and whenever the process receives REPORT_SIGNAL (SIGUSR1,
+where it exists), so a long scan can be looked at without stopping it.
+"""
+
+import collections
+import cProfile
+import datetime
+import io
+import os
+import pstats
+import signal
+import sys
+import threading
+import time
+import tracemalloc
+
+# The profilers, by name.
+PROFILE_CPROFILE = "cprofile"
+PROFILE_SAMPLE = "sample"
+PROFILE_TRACEMALLOC = "tracemalloc"
+# The default folder the reports are written to.
+DEF_PROFILE_DIR = "profiles"
+# The signal which makes a running profiler write a report.
+REPORT_SIGNAL = getattr(signal, "SIGUSR1", None)
+# The number of functions (or lines) listed in each part of a report.
+TOP_COUNT = 30
+# How often (in seconds) the sampling profiler looks at every stack.
+DEF_SAMPLE_INTERVAL = 0.01
+# The number of frames tracemalloc keeps for every allocation.
+TRACE_FRAMES = 10
+# The functions which mark each stage of a probe, by function name. A sample
+# (or call) is charged to the stage of the innermost of these on its stack.
+STAGE_FUNCTIONS = {
+    "_next_url_batch": "keygen",
+    "_send": "requests",
+    "request_many": "requests",
+    "_read_content": "download",
+    "check_content": "check_output",
+}
+# The stage charged with CPU time outside of every marked function.
+OTHER_STAGE = "other"
+# Before Python 3.12, cProfile only sees the thread it was enabled on, so
+# every thread needs a profiler of its own. From 3.12, a profiler sees every
+# thread, and only one can be enabled at a time.
+PER_THREAD_PROFILES = sys.version_info < (3, 12)
+
+
+def _format_stages(stages, total, title="CPU time by stage:"):
+    """Format the time of each stage, as lines of a report."""
+    lines = [title]
+    for stage, seconds in sorted(
+        stages.items(), key=lambda item: item[1], reverse=True
+    ):
+        share = seconds / total if total else 0.0
+        lines.append(
+            "  {:<14} {:>10.3f}s {:>7.1%}".format(stage, seconds, share)
+        )
+    return lines
+
+
+class Profiler:
+    """The base class of every profiler.
+
+    Attributes
+    ----------
+    label : str
+        What's being profiled, such as the module's name, used in the
+        report's file name.
+    directory : str
+        The folder the reports are written to.
+
+    """
+
+    # The profiler's name, used in the report's file name.
+    kind = str()
+
+    def __init__(self, label, directory=DEF_PROFILE_DIR):
+        """Initialize the profiler. Nothing is profiled until it's started."""
+        self.label = label
+        self.directory = directory
+        self._started = None
+        self._cpu_started = None
+        self._previous_handler = None
+
+    def _body(self):
+        """Return the profiler's own part of a report, as a list of lines."""
+        raise NotImplementedError
+
+    def _on_signal(self, signum, frame):
+        """Write a report when REPORT_SIGNAL arrives."""
+        self.write_report()
+
+    def _start(self):
+        """Start profiling. Subclasses override this."""
+
+    def _stop(self):
+        """Stop profiling. Subclasses override this."""
+
+    def report(self):
+        """Return a report of everything profiled so far, as text.
+
+        This can be called while the profiler is running.
+        """
+        wall = time.monotonic() - self._started
+        cpu = time.process_time() - self._cpu_started
+        lines = [
+            "Profile of {} ({})".format(self.label, self.kind),
+            "Written {} after {:.1f}s, using {:.1f}s of CPU time.".format(
+                datetime.datetime.now().isoformat(timespec="seconds"),
+                wall,
+                cpu,
+            ),
+            "",
+        ]
+        lines += self._body()
+        return "\n".join(lines) + "\n"
+
+    def start(self):
+        """Start profiling, and write a report whenever REPORT_SIGNAL comes.
+
+        The signal handler can only be installed from the main thread, so
+        from other threads, reports are only written when profiling stops.
+        """
+        self._started = time.monotonic()
+        self._cpu_started = time.process_time()
+        self._start()
+        if (
+            REPORT_SIGNAL is not None
+            and threading.current_thread() is threading.main_thread()
+        ):
+            self._previous_handler = signal.signal(
+                REPORT_SIGNAL, self._on_signal
+            )
+
+    def stop(self):
+        """Write a final report, then stop profiling.
+
+        Returns
+        -------
+        str
+            The file the report was written to.
+
+        """
+        path = self.write_report()
+        self._stop()
+        if self._previous_handler is not None:
+            signal.signal(REPORT_SIGNAL, self._previous_handler)
+            self._previous_handler = None
+        return path
+
+    def write_report(self):
+        """Write a report of everything profiled so far to a new file.
+
+        Returns
+        -------
+        str
+            The file the report was written to.
+
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(
+            self.directory,
+            "{}-{}-{}.txt".format(
+                self.label.replace(" ", "-"),
+                self.kind,
+                datetime.datetime.now().strftime("%Y%m%d-%H%M%S-%f"),
+            ),
+        )
+        with open(path, "w") as report_file:
+            report_file.write(self.report())
+        print("Profile written to {}".format(path), flush=True)
+        return path
+
+
+class CProfileProfiler(Profiler):
+    """Profile every call on every thread with cProfile.
+
+    Before Python 3.12, cProfile only sees the thread it was enabled on, so
+    every thread started while profiling is given a profiler of its own, and
+    their results are added together in the report. Calls are timed with
+    each thread's CPU clock, so time spent waiting on the network isn't
+    counted.
+
+    From Python 3.12, a single profiler sees every thread (and a second one
+    can't be enabled while it runs). There's only one clock for all of the
+    threads, so calls are timed with the wall clock, and the times of calls
+    which overlap on several threads are only approximate.
+    """
+
+    kind = PROFILE_CPROFILE
+
+    def _body(self):
+        """List the stages, and the functions which took the most time."""
+        with self._lock:
+            profiles = list(self._profiles)
+        stats = self._snapshot(profiles[0])
+        stats.add(*(self._snapshot(profile) for profile in profiles[1:]))
+        stages = collections.Counter()
+        for (_, _, name), entry in stats.stats.items():
+            if name in STAGE_FUNCTIONS:
+                # The cumulative time of the function, in all of its calls.
+                stages[STAGE_FUNCTIONS[name]] += entry[3]
+        lines = _format_stages(
+            stages,
+            stats.total_tt,
+            "CPU time by stage:" if PER_THREAD_PROFILES else "Time by stage:",
+        )
+        for sort in ("tottime", "cumulative"):
+            stats.stream = io.StringIO()
+            stats.sort_stats(sort).print_stats(TOP_COUNT)
+            lines += ["", "Top functions by {}:".format(sort)]
+            lines += stats.stream.getvalue().strip("\n").split("\n")
+        return lines
+
+    def _enable(self):
+        """Start a new profiler on the calling thread."""
+        if PER_THREAD_PROFILES:
+            profile = cProfile.Profile(time.thread_time)
+        else:
+            profile = cProfile.Profile()
+        with self._lock:
+            self._profiles.append(profile)
+        profile.enable()
+
+    @staticmethod
+    def _snapshot(profile):
+        """Return a profiler's stats so far, without stopping it."""
+        # Unlike `create_stats`, this doesn't disable the profiler.
+        profile.snapshot_stats()
+        stats = pstats.Stats(stream=io.StringIO())
+        stats.stats = profile.stats
+        stats.get_top_level_stats()
+        return stats
+
+    def _start(self):
+        """Profile this thread, and every thread started from now on."""
+        self._profiles = list()
+        self._lock = threading.Lock()
+        if PER_THREAD_PROFILES:
+            threading.setprofile(self._thread_started)
+        self._enable()
+        self._own = self._profiles[0]
+
+    def _stop(self):
+        """Stop profiling this thread, and any new threads."""
+        if PER_THREAD_PROFILES:
+            threading.setprofile(None)
+        self._own.disable()
+
+    def _thread_started(self, frame, event, arg):
+        """Give a newly started thread its own profiler.
+
+        This is called for the first event of every new thread, and replaces
+        itself with the thread's profiler.
+        """
+        sys.setprofile(None)
+        self._enable()
+
+
+class SamplingProfiler(Profiler):
+    """Sample the stack of every thread, and charge it the CPU time used.
+
+    Every `interval` seconds, each thread's CPU clock is read, and the CPU
+    time it used since the last sample is charged to the functions on its
+    stack. Threads which are waiting (on the network, for example) use no
+    CPU time, so they aren't charged. Where threads' CPU clocks can't be
+    read, every sample counts for `interval` seconds of wall time instead.
+    """
+
+    kind = PROFILE_SAMPLE
+
+    def __init__(
+        self, label, directory=DEF_PROFILE_DIR, interval=DEF_SAMPLE_INTERVAL
+    ):
+        """Initialize the profiler.
+
+        Parameters
+        ----------
+        label : str
+            What's being profiled, used in the report's file name.
+        directory : str
+            The folder the reports are written to.
+        interval : float
+            The time (in seconds) between samples.
+
+        """
+        super(SamplingProfiler, self).__init__(label, directory)
+        self.interval = interval
+        self._cpu_clocks = hasattr(time, "pthread_getcpuclockid")
+
+    def _body(self):
+        """List the stages, and the functions which used the most CPU."""
+        with self._lock:
+            own = collections.Counter(self._own)
+            total = collections.Counter(self._total)
+            stages = collections.Counter(self._stages)
+            samples = self._samples
+        charged = sum(stages.values())
+        unit = "CPU time" if self._cpu_clocks else "wall time (sampled)"
+        lines = [
+            "{} samples, {:.3f}s of {} charged.".format(
+                samples, charged, unit
+            ),
+            "",
+        ]
+        lines += _format_stages(stages, charged)
+        for title, counts in (
+            ("Top functions by own time:", own),
+            ("Top functions by cumulative time:", total),
+        ):
+            lines += ["", title]
+            for (filename, line, name), seconds in counts.most_common(
+                TOP_COUNT
+            ):
+                lines.append(
+                    "  {:>10.3f}s {:>7.1%}  {} ({}:{})".format(
+                        seconds,
+                        seconds / charged if charged else 0.0,
+                        name,
+                        filename,
+                        line,
+                    )
+                )
+        return lines
+
+    def _charge(self, ident, clocks):
+        """Return the CPU time a thread used since it was last sampled."""
+        if not self._cpu_clocks:
+            return self.interval
+        try:
+            if ident not in clocks:
+                clock = time.pthread_getcpuclockid(ident)
+                # A thread's first sample only sets its starting point, so
+                # time used before profiling started isn't charged.
+                clocks[ident] = [clock, time.clock_gettime(clock)]
+                return 0.0
+            (clock, last) = clocks[ident]
+            now = time.clock_gettime(clock)
+        except (OSError, OverflowError):
+            # The thread has finished.
+            clocks.pop(ident, None)
+            return 0.0
+        clocks[ident][1] = now
+        return now - last
+
+    def _sample(self):
+        """Sample every thread's stack until the profiler is stopped."""
+        own_ident = threading.get_ident()
+        clocks = dict()
+        while not self._stopped.wait(self.interval):
+            frames = sys._current_frames()
+            charges = list()
+            for ident, frame in frames.items():
+                if ident == own_ident:
+                    continue
+                seconds = self._charge(ident, clocks)
+                if seconds <= 0:
+                    continue
+                stack = list()
+                stage = None
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(
+                        (code.co_filename, code.co_firstlineno, code.co_name)
+                    )
+                    if stage is None and code.co_name in STAGE_FUNCTIONS:
+                        stage = STAGE_FUNCTIONS[code.co_name]
+                    frame = frame.f_back
+                charges.append((seconds, stack, stage or OTHER_STAGE))
+            del frames
+            with self._lock:
+                self._samples += 1
+                for seconds, stack, stage in charges:
+                    self._own[stack[0]] += seconds
+                    for function in set(stack):
+                        self._total[function] += seconds
+                    self._stages[stage] += seconds
+
+    def _start(self):
+        """Start the sampling thread."""
+        self._own = collections.Counter()
+        self._total = collections.Counter()
+        self._stages = collections.Counter()
+        self._samples = 0
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(
+            target=self._sample, name="profiler", daemon=True
+        )
+        self._thread.start()
+
+    def _stop(self):
+        """Stop the sampling thread."""
+        self._stopped.set()
+        self._thread.join()
+
+
+class TracemallocProfiler(Profiler):
+    """Trace every memory allocation, and list where the memory is held."""
+
+    kind = PROFILE_TRACEMALLOC
+
+    def _body(self):
+        """List the lines and call stacks which hold the most memory."""
+        (current, peak) = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            [
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+            ]
+        )
+        lines = [
+            "Traced memory: {:.1f} KB now, {:.1f} KB at the peak.".format(
+                current / 1024, peak / 1024
+            ),
+            "",
+            "Top lines by memory held:",
+        ]
+        for stat in snapshot.statistics("lineno")[:TOP_COUNT]:
+            lines.append("  {}".format(stat))
+        lines += ["", "Top call stacks by memory held:"]
+        for stat in snapshot.statistics("traceback")[:5]:
+            lines.append(
+                "  {} blocks, {:.1f} KB".format(stat.count, stat.size / 1024)
+            )
+            lines += ["    " + line for line in stat.traceback.format()]
+        return lines
+
+    def _start(self):
+        """Start tracing allocations."""
+        tracemalloc.start(TRACE_FRAMES)
+
+    def _stop(self):
+        """Stop tracing allocations."""
+        tracemalloc.stop()
+
+
+# Every profiler, by name.
+PROFILERS = {
+    PROFILE_CPROFILE: CProfileProfiler,
+    PROFILE_SAMPLE: SamplingProfiler,
+    PROFILE_TRACEMALLOC: TracemallocProfiler,
+}
@@ -0,0 +1,338 @@
+"""Check, rank and share a list of proxies.
+
+Testing proxies one at a time, each with its own timeout, can take minutes on
+a long proxy list. This module checks every proxy concurrently, so that the
+whole list is sorted out within a couple of timeouts. Each check sends a
+request to a target URL through the proxy and records whether it succeeded,
+and how long it took for the response to start arriving. The target can be
+changed, so that a local stand-in can be used in place of a real website.
+
+The live proxies are then shared through a ProxyPool, which spreads requests
+across them according to how well each one has been performing, and takes
+failing proxies out of rotation until they've been checked again.
+"""
+
+import collections
+import random
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+# The URL requested through each proxy to check that it works.
+DEF_CHECK_URL = "https://google.com/"
+# How long (in seconds) a proxy has to answer before it's counted as dead.
+DEF_CHECK_TIMEOUT = 2
+# The maximum number of proxies checked at the same time.
+DEF_CHECK_THREADS = 256
+# A proxy's circuit breaker trips after this many failures in a row.
+FAILURE_THRESHOLD = 3
+# How often (in seconds) tripped proxies are checked to see if they recovered.
+RETEST_INTERVAL = 30
+# How long (in seconds) to wait for a proxy to recover when every breaker is
+# open. This leaves time for two rounds of checks.
+DEF_WAIT_TIMEOUT = 60
+# How much each new latency measurement moves a proxy's smoothed latency.
+LATENCY_SMOOTHING = 0.2
+# The latency (in seconds) assumed for a proxy that was never measured, and
+# the lowest latency used to weight a proxy.
+DEF_LATENCY = 1.0
+MIN_LATENCY = 0.01
+
+# The outcome of checking a single proxy. The latency is in seconds, and is
+# None if the proxy is dead.
+ProxyCheck = collections.namedtuple(
+    "ProxyCheck", ["proxy", "alive", "latency"]
+)
+
+
+class NoHealthyProxies(Exception):
+    """Raised when no proxy in a ProxyPool recovered in time to be used."""
+
+
+def check_proxy(proxy, url=DEF_CHECK_URL, timeout=DEF_CHECK_TIMEOUT):
+    """Check whether a SOCKS5 proxy works, and how fast it is.
+
+    Parameters
+    ----------
+    proxy : tuple
+        The (ip, port) of the proxy.
+    url : str
+        The URL to request through the proxy.
+    timeout : float
+        How long (in seconds) to wait for the proxy.
+
+    Returns
+    -------
+    ProxyCheck
+        Whether the proxy worked, and how long it took for the response
+        headers to arrive through it.
+
+    """
+    address = "socks5h://{}:{}".format(*proxy)
+    start = time.monotonic()
+    try:
+        # Only the headers are needed, so don't download the page itself.
+        with requests.get(
+            url,
+            proxies={"http": address, "https": address},
+            timeout=timeout,
+            stream=True,
+        ):
+            latency = time.monotonic() - start
+    except (requests.exceptions.RequestException, ValueError):
+        return ProxyCheck(proxy, False, None)
+    return ProxyCheck(proxy, True, latency)
+
+
+def validate_proxies(
+    proxies,
+    url=DEF_CHECK_URL,
+    timeout=DEF_CHECK_TIMEOUT,
+    threads=DEF_CHECK_THREADS,
+):
+    """Check a list of proxies concurrently, and rank them.
+
+    Parameters
+    ----------
+    proxies : iterable
+        The (ip, port) of every proxy.
+    url : str
+        The URL to request through each proxy.
+    timeout : float
+        How long (in seconds) to wait for each proxy.
+    threads : int
+        The maximum number of proxies to check at the same time.
+
+    Returns
+    -------
+    list
+        A ProxyCheck for every proxy. The live proxies come first, fastest
+        first, followed by the dead ones.
+
+    """
+    proxies = list(proxies)
+    if not proxies:
+        return list()
+    with ThreadPoolExecutor(max_workers=min(threads, len(proxies))) as pool:
+        checks = list(
+            pool.map(lambda proxy: check_proxy(proxy, url, timeout), proxies)
+        )
+    return sorted(
+        checks, key=lambda check: (not check.alive, check.latency or 0)
+    )
+
+
+class _ProxyState:
+    """The running record of a single proxy in a ProxyPool."""
+
+    def __init__(self, latency):
+        """Start the record from the latency measured by the first check."""
+        self.latency = latency or DEF_LATENCY
+        self.successes = 0
+        self.failures = 0
+        # The number of failures in a row, since the last success.
+        self.streak = 0
+        # True while the proxy's circuit breaker is open.
+        self.tripped = False
+
+    def weight(self):
+        """Return how often the proxy should be chosen, relative to others."""
+        # Smooth the success rate, so that a new proxy isn't judged on its
+        # first request.
+        rate = (self.successes + 1) / (self.successes + self.failures + 2)
+        return rate / max(self.latency, MIN_LATENCY)
+
+
+class ProxyPool:
+    """Share a set of proxies, favouring the fast and reliable ones.
+
+    Every request is sent through a proxy chosen at random, weighted by the
+    proxy's success rate and (smoothed) latency. A proxy that fails too many
+    times in a row, or which is caught serving a ban or challenge page, has
+    its circuit breaker tripped, and isn't chosen again until a background
+    thread has checked that it works again. If every breaker is open, `choose`
+    waits for a proxy to recover, for up to `wait_timeout` seconds.
+
+    Attributes
+    ----------
+    check_url : str
+        The URL requested through tripped proxies to check whether they've
+        recovered.
+    check_timeout : float
+        How long (in seconds) to wait for each tripped proxy when checking it.
+    wait_timeout : float
+        How long (in seconds) `choose` waits for a proxy to recover.
+
+    """
+
+    def __init__(
+        self,
+        checks,
+        check_url=DEF_CHECK_URL,
+        check_timeout=DEF_CHECK_TIMEOUT,
+        retest_interval=RETEST_INTERVAL,
+        wait_timeout=DEF_WAIT_TIMEOUT,
+    ):
+        """Fill the pool, and start checking tripped proxies in the background.
+
+        Parameters
+        ----------
+        checks : iterable
+            The ProxyCheck of every live proxy.
+        check_url : str
+            The URL requested through tripped proxies to check them.
+        check_timeout : float
+            How long (in seconds) to wait for each tripped proxy.
+        retest_interval : float
+            How often (in seconds) the tripped proxies are checked.
+        wait_timeout : float
+            How long (in seconds) `choose` waits for a proxy to recover.
+
+        """
+        self.check_url = check_url
+        self.check_timeout = check_timeout
+        self.wait_timeout = wait_timeout
+        self._states = {
+            check.proxy: _ProxyState(check.latency) for check in checks
+        }
+        self._condition = threading.Condition()
+        self._closed = threading.Event()
+        self._retest_interval = retest_interval
+        threading.Thread(target=self._retest_loop, daemon=True).start()
+
+    def _retest_loop(self):
+        """Check the tripped proxies every so often, until the pool closes."""
+        while not self._closed.wait(self._retest_interval):
+            self.retest()
+
+    @staticmethod
+    def _trip(state):
+        """Open a proxy's circuit breaker. The caller must hold the lock."""
+        state.tripped = True
+        state.streak = 0
+
+    def choose(self, preferred=None):
+        """Choose a proxy to send a request through.
+
+        Parameters
+        ----------
+        preferred : tuple or None
+            A proxy to keep using, as long as its breaker is still closed.
+
+        Returns
+        -------
+        tuple
+            The (ip, port) of the chosen proxy.
+
+        Raises
+        ------
+        NoHealthyProxies
+            If every breaker is open, and no proxy recovered within
+            `wait_timeout` seconds (or the pool was closed while waiting).
+
+        """
+        deadline = time.monotonic() + self.wait_timeout
+        with self._condition:
+            if preferred in self._states:
+                if not self._states[preferred].tripped:
+                    return preferred
+            while True:
+                healthy = [
+                    (proxy, state)
+                    for proxy, state in self._states.items()
+                    if not state.tripped
+                ]
+                if healthy:
+                    break
+                if self._closed.is_set():
+                    raise NoHealthyProxies("The proxy pool was closed.")
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise NoHealthyProxies(
+                        "No proxy recovered within {:g} seconds.".format(
+                            self.wait_timeout
+                        )
+                    )
+                # Wait for the background checks to revive a proxy.
+                self._condition.wait(remaining)
+            weights = [state.weight() for _, state in healthy]
+            return random.choices(healthy, weights=weights)[0][0]
+
+    def close(self):
+        """Stop checking tripped proxies, and wake any waiting `choose`."""
+        self._closed.set()
+        with self._condition:
+            self._condition.notify_all()
+
+    def failure(self, proxy):
+        """Record that a request through a proxy failed.
+
+        Returns
+        -------
+        bool
+            True if this failure tripped the proxy's circuit breaker.
+
+        """
+        with self._condition:
+            state = self._states[proxy]
+            state.failures += 1
+            state.streak += 1
+            if not state.tripped and state.streak >= FAILURE_THRESHOLD:
+                self._trip(state)
+                return True
+        return False
+
+    def healthy(self):
+        """Return the number of proxies whose circuit breaker is closed."""
+        with self._condition:
+            return sum(
+                1 for state in self._states.values() if not state.tripped
+            )
+
+    def retest(self):
+        """Check every tripped proxy, and close the breakers of live ones."""
+        with self._condition:
+            tripped = [
+                proxy
+                for proxy, state in self._states.items()
+                if state.tripped
+            ]
+        checks = validate_proxies(
+            tripped, self.check_url, self.check_timeout
+        )
+        with self._condition:
+            for check in checks:
+                if check.alive:
+                    state = self._states[check.proxy]
+                    state.tripped = False
+                    state.latency = check.latency
+            self._condition.notify_all()
+
+    def success(self, proxy, latency):
+        """Record that a request through a proxy succeeded.
+
+        Parameters
+        ----------
+        proxy : tuple
+            The (ip, port) of the proxy.
+        latency : float
+            How long (in seconds) the response took to start arriving.
+
+        """
+        with self._condition:
+            state = self._states[proxy]
+            state.successes += 1
+            state.streak = 0
+            state.latency += LATENCY_SMOOTHING * (latency - state.latency)
+
+    def trip(self, proxy):
+        """Open a proxy's circuit breaker straight away.
+
+        This is used when a proxy is caught serving a ban or challenge page,
+        which means it won't be any use until it's been checked again.
+        """
+        with self._condition:
+            self._trip(self._states[proxy])
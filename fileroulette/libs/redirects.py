@@ -0,0 +1,113 @@
+"""Learn how a site redirects its URLs, and skip the redirect next time.
+
+When a site moves to a new address (such as uploadfiles.io moving to ufile.io),
+every probe is answered with a redirect, which costs a whole extra round-trip.
+The rewrite is almost always the same for every key, though. This module
+defines the RedirectCache class, which learns those rewrites as prefix rules
+(for example, "https://uploadfiles.io/" becomes "https://ufile.io/"), so that
+later probes can be sent straight to the final URL.
+"""
+
+import threading
+
+# A rule must be seen this many times before it is used for predictions.
+CONFIRMATIONS = 2
+
+
+def _rewrite_rule(url, target):
+    """Describe a redirect as a prefix rewrite, if possible.
+
+    Parameters
+    ----------
+    url : str
+        The URL that was requested.
+    target : str
+        The absolute URL it redirected to.
+
+    Returns
+    -------
+    tuple or None
+        An (old prefix, new prefix) pair, or None if the redirect doesn't keep
+        the last segment of the URL intact (such as a redirect to a fixed
+        error page), and so can't be predicted for other URLs.
+
+    """
+    # Find the longest ending that both URLs share.
+    shared = 0
+    limit = min(len(url), len(target))
+    while shared < limit and url[-1 - shared] == target[-1 - shared]:
+        shared += 1
+    old_prefix = url[:len(url) - shared]
+    new_prefix = target[:len(target) - shared]
+    # The shared ending must include the whole last segment of the URL, which
+    # is normally where the key is.
+    if len(old_prefix) > url.rfind("/") + 1:
+        return None
+    return (old_prefix, new_prefix)
+
+
+class RedirectCache:
+    """Learn and predict the redirects of a single site."""
+
+    def __init__(self):
+        """Initialize the redirect cache."""
+        # Candidate rules, with the number of times each has been seen.
+        self._seen = dict()
+        # Confirmed rules, mapping an old prefix onto its new prefix.
+        self._rules = dict()
+        self._lock = threading.Lock()
+
+    def invalidate(self, url):
+        """Forget the rule used to predict the target of a URL.
+
+        Parameters
+        ----------
+        url : str
+            A URL whose predicted target turned out to be wrong.
+
+        """
+        with self._lock:
+            for old_prefix in list(self._rules):
+                if url.startswith(old_prefix):
+                    new_prefix = self._rules.pop(old_prefix)
+                    self._seen.pop((old_prefix, new_prefix), None)
+
+    def learn(self, url, target):
+        """Record that a URL redirected to another one.
+
+        Parameters
+        ----------
+        url : str
+            The URL that was requested.
+        target : str
+            The absolute URL it redirected to.
+
+        """
+        rule = _rewrite_rule(url, target)
+        if rule is None:
+            return
+        with self._lock:
+            self._seen[rule] = self._seen.get(rule, 0) + 1
+            if self._seen[rule] >= CONFIRMATIONS:
+                (old_prefix, new_prefix) = rule
+                self._rules[old_prefix] = new_prefix
+
+    def predict(self, url):
+        """Predict where a URL will redirect to.
+
+        Parameters
+        ----------
+        url : str
+            The URL about to be requested.
+
+        Returns
+        -------
+        str or None
+            The predicted target URL, or None if there's no matching rule.
+
+        """
+        with self._lock:
+            for old_prefix, new_prefix in self._rules.items():
+                if url.startswith(old_prefix):
+                    return new_prefix + url[len(old_prefix):]
+        return None
@@ -0,0 +1,159 @@
+"""Give keys that failed for a passing reason another chance.
+
+A probe can fail without telling us anything about its key: the connection
+drops, the request times out, or the server answers with a 5xx error. This
+module defines the RetryQueue class, which holds such keys until they're due
+to be tried again. Each key waits longer after every failure (with some random
+jitter, so that a burst of failures doesn't come back as a burst of retries),
+and is given up on after a set number of attempts. Retries are mixed in with
+fresh keys rather than served ahead of them, so a flaky host can't stall the
+scan.
+"""
+
+import heapq
+import itertools
+import random
+import threading
+import time
+
+# The number of times a key is tried before it's given up on.
+DEF_MAX_ATTEMPTS = 4
+# How long (in seconds) a key waits before its first retry. The wait doubles
+# with every attempt, up to MAX_DELAY.
+DEF_BASE_DELAY = 1.0
+MAX_DELAY = 60.0
+# While fresh keys are still available, no more than this share of the URLs
+# handed out may be retries.
+DEF_RETRY_SHARE = 0.25
+
+
+class RetryQueue:
+    """Schedule failed URLs to be tried again, with exponential backoff.
+
+    Attributes
+    ----------
+    max_attempts : int
+        The number of times a URL is tried before it's given up on.
+    base_delay : float
+        How long (in seconds) a URL waits before its first retry.
+    share : float
+        The largest share of the URLs handed out which may be retries, while
+        fresh URLs are available.
+
+    """
+
+    def __init__(
+        self,
+        max_attempts=DEF_MAX_ATTEMPTS,
+        base_delay=DEF_BASE_DELAY,
+        share=DEF_RETRY_SHARE,
+    ):
+        """Initialize the retry queue."""
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.share = share
+        # A heap of (due time, tie breaker, URL) entries.
+        self._heap = list()
+        self._counter = itertools.count()
+        # The number of failed attempts of every URL that has failed, and the
+        # URLs currently waiting in the heap.
+        self._attempts = dict()
+        self._queued = set()
+        # The number of URLs handed out, and how many of those were retries.
+        self._turns = 0
+        self._retry_turns = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        """Return the number of URLs waiting to be retried."""
+        with self._lock:
+            return len(self._heap)
+
+    def finish(self, url):
+        """Forget a URL once it has been dealt with.
+
+        This should be called when a URL's scan is over. If the scan just
+        scheduled the URL for another attempt, the URL is kept.
+
+        Parameters
+        ----------
+        url : str
+            The URL which was scanned.
+
+        Returns
+        -------
+        bool
+            True if the URL had failed before, and has now been dealt with.
+
+        """
+        with self._lock:
+            if url in self._queued:
+                return False
+            return self._attempts.pop(url, 0) > 0
+
+    def next_due(self):
+        """Return how long (in seconds) until the next retry is due, if any."""
+        with self._lock:
+            if not self._heap:
+                return None
+            return max(0.0, self._heap[0][0] - time.monotonic())
+
+    def pop(self, fresh=True):
+        """Take the next URL that is due to be retried.
+
+        Parameters
+        ----------
+        fresh : bool
+            Whether fresh URLs are still available. If so, retries are only
+            handed out while they make up less than `share` of the URLs
+            handed out so far.
+
+        Returns
+        -------
+        str or None
+            The URL to retry, or None if no retry should be made right now.
+
+        """
+        with self._lock:
+            self._turns += 1
+            if not self._heap or self._heap[0][0] > time.monotonic():
+                return None
+            if fresh and self._retry_turns >= self.share * self._turns:
+                return None
+            self._retry_turns += 1
+            url = heapq.heappop(self._heap)[2]
+            self._queued.discard(url)
+            return url
+
+    def push(self, url):
+        """Schedule a URL to be tried again.
+
+        Parameters
+        ----------
+        url : str
+            The URL which failed.
+
+        Returns
+        -------
+        bool
+            True if the URL was scheduled, or False if it has used up all of
+            its attempts.
+
+        """
+        with self._lock:
+            if url in self._queued:
+                return True
+            attempt = self._attempts.get(url, 0) + 1
+            if attempt >= self.max_attempts:
+                self._attempts.pop(url, None)
+                return False
+            self._attempts[url] = attempt
+            # Wait somewhere between half and all of the backoff delay.
+            delay = min(MAX_DELAY, self.base_delay * 2 ** (attempt - 1))
+            delay = delay / 2 + random.uniform(0, delay / 2)
+            heapq.heappush(
+                self._heap,
+                (time.monotonic() + delay, next(self._counter), url),
+            )
+            self._queued.add(url)
+            return True
@@ -0,0 +1,508 @@
+"""Record results to disk on a dedicated writer thread.
+
+Writing each result to disk as soon as it's found would put a file open, a
+write and possibly an fsync on the probe path, right where the scan can least
+afford to wait. This module defines the ResultSink class, which takes results
+from any number of threads through a queue, and leaves the writing to a
+single writer thread. The writer takes results off the queue in batches,
+writes each batch in one go, and flushes it to the operating system, then
+syncs the file to disk according to the sink's fsync policy:
+
+FSYNC_NEVER ("never")
+    Leave it to the operating system. A crash of the program loses nothing,
+    but a crash of the whole machine may lose the last few seconds.
+FSYNC_INTERVAL ("interval")
+    The default. Sync at most once every `fsync_interval` seconds.
+FSYNC_BATCH ("batch")
+    Sync after every batch.
+
+Three formats are available: JSONLSink (one JSON object per line), CSVSink,
+and SQLiteSink, a database which keeps one row for every key found, however
+many times it's found, and can be searched with `query_results`. Files are
+always opened for appending, so results from earlier runs are kept.
+"""
+
+import csv
+import datetime
+import json
+import os
+import pathlib
+import queue
+import sqlite3
+import threading
+import time
+
+# The sink formats.
+FORMAT_JSONL = "jsonl"
+FORMAT_CSV = "csv"
+FORMAT_SQLITE = "sqlite"
+# The format of files with these extensions, if it isn't given.
+EXTENSIONS = {
+    ".jsonl": FORMAT_JSONL,
+    ".csv": FORMAT_CSV,
+    ".db": FORMAT_SQLITE,
+    ".sqlite": FORMAT_SQLITE,
+    ".sqlite3": FORMAT_SQLITE,
+}
+# The fsync policies.
+FSYNC_NEVER = "never"
+FSYNC_INTERVAL = "interval"
+FSYNC_BATCH = "batch"
+FSYNC_POLICIES = [FSYNC_NEVER, FSYNC_INTERVAL, FSYNC_BATCH]
+# The default fsync policy, and the time (in seconds) between syncs with the
+# FSYNC_INTERVAL policy.
+DEF_FSYNC = FSYNC_INTERVAL
+DEF_FSYNC_INTERVAL = 1.0
+# The most results written in one batch.
+DEF_BATCH_SIZE = 256
+# The most results waiting to be written. Once the queue is full, `write`
+# waits for room rather than dropping results.
+DEF_QUEUE_SIZE = 65536
+# How long (in seconds) the writer waits for more results before writing a
+# partial batch.
+FLUSH_INTERVAL = 0.25
+# The result fields holding a file's name and size, as the modules name them.
+NAME_FIELD = "File Name"
+SIZE_FIELD = "File Size"
+# Put on the queue to tell the writer to finish.
+_CLOSE = object()
+
+
+class SinkError(Exception):
+    """The writer thread of a ResultSink failed."""
+
+
+class ResultSink:
+    """Write results to a file in batches, from a dedicated writer thread.
+
+    This is the base class of every sink. Subclasses open the file and say
+    how a batch of records is written to it.
+
+    Attributes
+    ----------
+    path : str
+        The file the results are written to.
+    fsync : str
+        The fsync policy: FSYNC_NEVER, FSYNC_INTERVAL or FSYNC_BATCH.
+    written : int
+        The number of results written so far.
+
+    """
+
+    def __init__(
+        self,
+        path,
+        fsync=DEF_FSYNC,
+        fsync_interval=DEF_FSYNC_INTERVAL,
+        batch_size=DEF_BATCH_SIZE,
+        queue_size=DEF_QUEUE_SIZE,
+    ):
+        """Open the file and start the writer thread.
+
+        Parameters
+        ----------
+        path : str
+            The file to append the results to. It's created if need be.
+        fsync : str
+            The fsync policy: FSYNC_NEVER, FSYNC_INTERVAL or FSYNC_BATCH.
+        fsync_interval : float
+            The time (in seconds) between syncs, with FSYNC_INTERVAL.
+        batch_size : int
+            The most results written in one batch.
+        queue_size : int
+            The most results waiting to be written.
+
+        """
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError("Unknown fsync policy: {}".format(fsync))
+        self.path = path
+        self.fsync = fsync
+        self.written = 0
+        self._fsync_interval = fsync_interval
+        self._batch_size = batch_size
+        self._queue = queue.Queue(queue_size)
+        self._error = None
+        self._closed = False
+        self._open()
+        self._thread = threading.Thread(
+            target=self._writer, name="sink", daemon=True
+        )
+        self._thread.start()
+
+    def _close_file(self):
+        """Close the file. Subclasses override this."""
+
+    def _open(self):
+        """Open the file. Subclasses override this."""
+
+    def _sync(self):
+        """Sync everything written so far to disk. Subclasses override this."""
+
+    def _write_batch(self, records):
+        """Write a batch of records. Subclasses override this."""
+        raise NotImplementedError
+
+    def _writer(self):
+        """Write batches of results until the sink is closed."""
+        synced = time.monotonic()
+        # True while some of what was written hasn't been synced yet.
+        unsynced = False
+        closing = False
+        try:
+            while not closing:
+                batch = list()
+                try:
+                    record = self._queue.get(timeout=FLUSH_INTERVAL)
+                except queue.Empty:
+                    record = None
+                # Take whatever else is already waiting, up to a batch.
+                while record is not None:
+                    if record is _CLOSE:
+                        closing = True
+                        break
+                    batch.append(record)
+                    if len(batch) >= self._batch_size:
+                        break
+                    try:
+                        record = self._queue.get_nowait()
+                    except queue.Empty:
+                        record = None
+                if batch:
+                    self._write_batch(batch)
+                    self.written += len(batch)
+                    unsynced = True
+                now = time.monotonic()
+                if unsynced and (
+                    self.fsync == FSYNC_BATCH
+                    or (closing and self.fsync != FSYNC_NEVER)
+                    or (
+                        self.fsync == FSYNC_INTERVAL
+                        and now - synced >= self._fsync_interval
+                    )
+                ):
+                    self._sync()
+                    synced = now
+                    unsynced = False
+        except Exception as error:
+            self._error = error
+            # Keep draining the queue, so that nobody waits on it forever.
+            while not closing:
+                closing = self._queue.get() is _CLOSE
+        finally:
+            self._close_file()
+
+    def close(self):
+        """Write every waiting result, then close the file.
+
+        Raises
+        ------
+        SinkError
+            If the writer thread failed.
+
+        """
+        if not self._closed:
+            self._closed = True
+            self._queue.put(_CLOSE)
+            self._thread.join()
+        if self._error:
+            raise SinkError(
+                "Writing to {} failed: {}".format(self.path, self._error)
+            )
+
+    def write(self, module_name, url, result, key=None):
+        """Queue a result to be written. This never touches the disk.
+
+        Parameters
+        ----------
+        module_name : str
+            The name of the module which found the result.
+        url : str
+            The URL where the result was found.
+        result : dict
+            The data returned by the module's `check_output` method.
+        key : str or None
+            The key the result was found under. If omitted, the URL is used
+            to tell results apart.
+
+        Raises
+        ------
+        SinkError
+            If the writer thread has failed, or the sink has been closed.
+
+        """
+        if self._error or self._closed:
+            raise SinkError("The sink for {} is closed.".format(self.path))
+        found = datetime.datetime.now(datetime.timezone.utc)
+        self._queue.put(
+            {
+                "found": found.isoformat(timespec="seconds"),
+                "module": module_name,
+                "key": key or url,
+                "url": url,
+                "data": result,
+            }
+        )
+
+
+class _FileSink(ResultSink):
+    """A sink which appends text to a file."""
+
+    def _close_file(self):
+        """Close the file."""
+        self._file.close()
+
+    def _open(self):
+        """Open the file for appending."""
+        self._file = open(self.path, "a", encoding="utf-8", newline="")
+
+    def _sync(self):
+        """Sync the file to disk."""
+        os.fsync(self._file.fileno())
+
+
+class JSONLSink(_FileSink):
+    """Write each result as a JSON object on a line of its own.
+
+    Every object has the keys "found" (the time the result was found, in
+    UTC), "module", "key", "url" and "data" (the result itself).
+    """
+
+    def _write_batch(self, records):
+        """Write a batch of records as JSON lines."""
+        self._file.write(
+            "".join(
+                json.dumps(record, ensure_ascii=False, default=str) + "\n"
+                for record in records
+            )
+        )
+        self._file.flush()
+
+
+class CSVSink(_FileSink):
+    """Write each result as a row of a CSV file.
+
+    The columns are "found", "module", "key", "url" and "data". As every module
+    returns different fields, the data is written to its column as a JSON
+    object. The header row is written when the file is created.
+    """
+
+    # The columns of the file.
+    columns = ["found", "module", "key", "url", "data"]
+
+    def _open(self):
+        """Open the file for appending, and write the header if it's new."""
+        super(CSVSink, self)._open()
+        self._csv = csv.writer(self._file)
+        if self._file.tell() == 0:
+            self._csv.writerow(self.columns)
+
+    def _write_batch(self, records):
+        """Write a batch of records as CSV rows."""
+        self._csv.writerows(
+            [
+                record["found"],
+                record["module"],
+                record["key"],
+                record["url"],
+                json.dumps(record["data"], ensure_ascii=False, default=str),
+            ]
+            for record in records
+        )
+        self._file.flush()
+
+
+class SQLiteSink(ResultSink):
+    """Keep results in an SQLite database, one row for every key found.
+
+    The database is kept in WAL mode, so it can be queried while a scan is
+    writing to it, and each batch is inserted in a single transaction. A key
+    which is found again (by a later run, for example) keeps its row: the
+    row's data and last_seen time are brought up to date, and its count of
+    sightings goes up.
+
+    The results table has the columns module, key, url, file_name,
+    file_size, data (the whole result, as JSON), first_seen, last_seen and
+    sightings. Every module and key pair is unique.
+    """
+
+    # The schema of the database.
+    schema = """
+        CREATE TABLE IF NOT EXISTS results (
+            id INTEGER PRIMARY KEY,
+            module TEXT NOT NULL,
+            key TEXT NOT NULL,
+            url TEXT NOT NULL,
+            file_name TEXT,
+            file_size TEXT,
+            data TEXT NOT NULL,
+            first_seen TEXT NOT NULL,
+            last_seen TEXT NOT NULL,
+            sightings INTEGER NOT NULL DEFAULT 1
+        );
+        CREATE UNIQUE INDEX IF NOT EXISTS results_module_key
+            ON results (module, key);
+        CREATE INDEX IF NOT EXISTS results_last_seen
+            ON results (last_seen);
+    """
+    # Insert a result, or bring its row up to date if its key was seen before.
+    upsert = """
+        INSERT INTO results (
+            module, key, url, file_name, file_size, data, first_seen,
+            last_seen
+        )
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (module, key) DO UPDATE SET
+            url = excluded.url,
+            file_name = excluded.file_name,
+            file_size = excluded.file_size,
+            data = excluded.data,
+            last_seen = excluded.last_seen,
+            sightings = sightings + 1
+    """
+
+    def _close_file(self):
+        """Close the database."""
+        self._db.close()
+
+    def _open(self):
+        """Open (or create) the database, in WAL mode."""
+        # Only the writer thread uses the connection once it's open.
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        # In WAL mode, commits are only synced at checkpoints, which `_sync`
+        # makes according to the fsync policy.
+        self._db.execute(
+            "PRAGMA synchronous={}".format(
+                "OFF" if self.fsync == FSYNC_NEVER else "NORMAL"
+            )
+        )
+        self._db.executescript(self.schema)
+
+    def _sync(self):
+        """Sync the database to disk, with a checkpoint."""
+        self._db.execute("PRAGMA wal_checkpoint(PASSIVE)")
+
+    def _write_batch(self, records):
+        """Insert a batch of records in a single transaction."""
+        with self._db:
+            self._db.executemany(
+                self.upsert,
+                [
+                    (
+                        record["module"],
+                        record["key"],
+                        record["url"],
+                        _text(record["data"].get(NAME_FIELD)),
+                        _text(record["data"].get(SIZE_FIELD)),
+                        json.dumps(
+                            record["data"], ensure_ascii=False, default=str
+                        ),
+                        record["found"],
+                        record["found"],
+                    )
+                    for record in records
+                ],
+            )
+
+
+def _text(value):
+    """Return a value as text, or None if there's no value."""
+    return None if value is None else str(value)
+
+
+# Every sink, by format.
+SINKS = {
+    FORMAT_JSONL: JSONLSink,
+    FORMAT_CSV: CSVSink,
+    FORMAT_SQLITE: SQLiteSink,
+}
+
+
+def open_sink(path, fmt=None, **kwargs):
+    """Open a sink of the right format for a file.
+
+    Parameters
+    ----------
+    path : str
+        The file to append the results to.
+    fmt : str or None
+        The format of the file, as listed in SINKS. If omitted, it's chosen
+        by the file's extension (see EXTENSIONS), and defaults to
+        FORMAT_JSONL.
+    **kwargs
+        Passed on to the sink, such as the fsync policy.
+
+    Returns
+    -------
+    ResultSink
+        The open sink.
+
+    """
+    if fmt is None:
+        extension = os.path.splitext(path)[1].lower()
+        fmt = EXTENSIONS.get(extension, FORMAT_JSONL)
+    return SINKS[fmt](path, **kwargs)
+
+
+def query_results(path, module=None, since=None, search=None, limit=None):
+    """Read results back out of an SQLiteSink's database.
+
+    Parameters
+    ----------
+    path : str
+        The database file.
+    module : str or None
+        If set, only return results found by this module.
+    since : str or None
+        If set, only return results last seen at or after this time, given
+        as an ISO 8601 date or time in UTC (such as "2024-05-01").
+    search : str or None
+        If set, only return results whose URL or file name contain this
+        text.
+    limit : int or None
+        If set, return no more than this many results.
+
+    Returns
+    -------
+    list
+        A dict for every result, most recently seen first, with the columns
+        of the results table as keys. The data is decoded from JSON.
+
+    Raises
+    ------
+    FileNotFoundError
+        If the database doesn't exist.
+
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError("No results database at {}.".format(path))
+    clauses = list()
+    parameters = list()
+    if module:
+        clauses.append("module = ?")
+        parameters.append(module)
+    if since:
+        clauses.append("last_seen >= ?")
+        parameters.append(since)
+    if search:
+        clauses.append("(url LIKE ? OR file_name LIKE ?)")
+        parameters += ["%{}%".format(search)] * 2
+    query = "SELECT * FROM results"
+    if clauses:
+        query += " WHERE " + " AND ".join(clauses)
+    query += " ORDER BY last_seen DESC, id DESC"
+    if limit:
+        query += " LIMIT ?"
+        parameters.append(limit)
+    # Open the database read-only, so a running scan can keep writing to it.
+    # The path is quoted, as "#", "?" and "%" mean something else in a URI.
+    uri = pathlib.Path(path).resolve().as_uri() + "?mode=ro"
+    db = sqlite3.connect(uri, uri=True)
+    db.row_factory = sqlite3.Row
+    try:
+        rows = [dict(row) for row in db.execute(query, parameters)]
+    finally:
+        db.close()
+    for row in rows:
+        row["data"] = json.loads(row["data"])
+    return rows
@@ -0,0 +1,98 @@
+"""Inspect a page while it downloads, and stop as soon as we know enough.
+
+This module defines the StreamMatcher class. A stream matcher is fed the raw
+chunks of a page as they arrive, and watches them for two kinds of byte
+patterns. A reject pattern (such as "Sorry it's gone...") means the page is
+worthless, so the download can be abandoned. A sequence of complete patterns
+(such as the opening of a details block followed by the end of the paragraph
+holding the file size) means everything useful has arrived, so the rest of the
+page doesn't need to be downloaded either.
+"""
+
+# The verdicts a StreamMatcher can reach.
+REJECT = "reject"
+COMPLETE = "complete"
+
+
+class StreamMatcher:
+    """Match byte patterns incrementally over the chunks of a download.
+
+    Attributes
+    ----------
+    reject : tuple
+        Byte patterns which, if found anywhere, mean the page is worthless.
+    complete : tuple
+        Byte patterns which, once all found in order, mean every useful part
+        of the page has arrived.
+    verdict : str or None
+        REJECT or COMPLETE once a verdict has been reached, otherwise None.
+
+    """
+
+    def __init__(self, reject=(), complete=()):
+        """Initialize the matcher.
+
+        Parameters
+        ----------
+        reject : tuple
+            Byte patterns which mean the page is worthless.
+        complete : tuple
+            Byte patterns which, found in order, mean the page is complete.
+
+        """
+        self.reject = tuple(reject)
+        self.complete = tuple(complete)
+        self.verdict = None
+        self._buffer = bytearray()
+        # A pattern may be split across two chunks, so every search starts a
+        # little before the end of the data that has already been searched.
+        patterns = self.reject + self.complete
+        self._overlap = max((len(p) for p in patterns), default=1) - 1
+        self._searched = 0
+        # The index of the next complete pattern, and where to look for it.
+        self._next_pattern = 0
+        self._next_offset = 0
+
+    @property
+    def content(self):
+        """Return all of the bytes received so far."""
+        return bytes(self._buffer)
+
+    def feed(self, chunk):
+        """Add the next chunk of the download and look for a verdict.
+
+        Parameters
+        ----------
+        chunk : bytes
+            The next chunk of the page.
+
+        Returns
+        -------
+        str or None
+            REJECT or COMPLETE if a verdict has been reached, otherwise None.
+
+        """
+        if self.verdict:
+            return self.verdict
+        self._buffer.extend(chunk)
+        start = max(0, self._searched - self._overlap)
+        for pattern in self.reject:
+            if self._buffer.find(pattern, start) != -1:
+                self.verdict = REJECT
+                return self.verdict
+        self._searched = len(self._buffer)
+        while self._next_pattern < len(self.complete):
+            pattern = self.complete[self._next_pattern]
+            index = self._buffer.find(pattern, self._next_offset)
+            if index == -1:
+                # Don't search the same bytes again on the next chunk.
+                self._next_offset = max(
+                    self._next_offset, len(self._buffer) - len(pattern) + 1
+                )
+                break
+            self._next_pattern += 1
+            self._next_offset = index + len(pattern)
+        else:
+            if self.complete:
+                self.verdict = COMPLETE
+        return self.verdict
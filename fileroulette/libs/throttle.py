@@ -0,0 +1,202 @@
+"""Keep the number of requests in flight to each host just under its limit.
+
+Hosts signal that they're being asked too much with status codes such as
+"429 Too Many Requests", "503 Service Unavailable" and Cloudflare's 52x errors,
+sometimes with a Retry-After header saying how long to back off for. This
+module defines the HostLimiter class, which controls how many requests may be
+in flight to a single host with an AIMD (additive increase, multiplicative
+decrease) scheme: the limit grows steadily while responses are clean, and is
+cut in half as soon as the host starts throttling. The Throttle class keeps a
+HostLimiter for every host.
+"""
+
+import email.utils
+import threading
+import time
+
+from urllib.parse import urlsplit
+
+# The number of requests a new host may have in flight at first, unless the
+# engine sets it to the number of requests it keeps in flight.
+DEF_INITIAL_LIMIT = 2
+# The most requests any host may have in flight.
+DEF_MAX_LIMIT = 1000
+# The fewest requests a host may have in flight.
+MIN_LIMIT = 1
+# The limit is multiplied by this much when the host throttles us.
+DECREASE_FACTOR = 0.5
+# The longest (in seconds) a Retry-After header can pause a host for.
+MAX_RETRY_AFTER = 300
+
+
+def parse_retry_after(value):
+    """Convert the value of a Retry-After header into a number of seconds.
+
+    Parameters
+    ----------
+    value : str or None
+        Either a number of seconds, or an HTTP date.
+
+    Returns
+    -------
+    float or None
+        The number of seconds to wait, or None if the value is missing or
+        can't be understood.
+
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, date.timestamp() - time.time())
+
+
+class HostLimiter:
+    """Limit the requests in flight to a single host, with AIMD control.
+
+    Until the host throttles us for the first time, the limit grows by one
+    for every clean response (doubling every round trip, as with TCP's slow
+    start). After that, it grows by one for every `limit` clean responses.
+    The limit only grows while it's actually holding requests back, so it
+    can't drift far above the number of workers.
+
+    Attributes
+    ----------
+    limit : float
+        The number of requests allowed in flight (rounded down).
+    maximum : int
+        The highest the limit can grow.
+    in_flight : int
+        The number of requests currently in flight.
+
+    """
+
+    def __init__(self, initial=DEF_INITIAL_LIMIT, maximum=DEF_MAX_LIMIT):
+        """Initialize the limiter.
+
+        Parameters
+        ----------
+        initial : int
+            The number of requests allowed in flight at first.
+        maximum : int
+            The highest the limit can grow.
+
+        """
+        self.limit = float(initial)
+        self.maximum = maximum
+        self.in_flight = 0
+        self._condition = threading.Condition()
+        self._slow_start = True
+        self._last_decrease = 0.0
+        self._paused_until = 0.0
+
+    def acquire(self):
+        """Wait for room to send a request to the host.
+
+        Returns
+        -------
+        float
+            The time the request was let through, to be passed back to
+            `release` or `cancel`.
+
+        """
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    # The host asked us to back off for a while.
+                    self._condition.wait(self._paused_until - now)
+                elif self.in_flight < int(self.limit):
+                    break
+                else:
+                    self._condition.wait()
+            self.in_flight += 1
+        return now
+
+    def cancel(self, started):
+        """Give back the room taken by a request which got no response.
+
+        Parameters
+        ----------
+        started : float
+            The time returned by `acquire`.
+
+        """
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify()
+
+    def release(self, started, throttled, retry_after=None):
+        """Give back the room taken by a request, and adjust the limit.
+
+        Parameters
+        ----------
+        started : float
+            The time returned by `acquire`.
+        throttled : bool
+            True if the host's response asked us to slow down.
+        retry_after : float or None
+            How long (in seconds) the host asked us to wait, if it did.
+
+        """
+        with self._condition:
+            saturated = self.in_flight >= int(self.limit)
+            self.in_flight -= 1
+            if throttled:
+                # Requests sent before the last cut saw the old limit, so they
+                # mustn't cut it again.
+                if started >= self._last_decrease:
+                    self.limit = max(MIN_LIMIT, self.limit * DECREASE_FACTOR)
+                    self._last_decrease = time.monotonic()
+                    self._slow_start = False
+                if retry_after:
+                    self._paused_until = max(
+                        self._paused_until,
+                        time.monotonic() + min(retry_after, MAX_RETRY_AFTER),
+                    )
+            elif saturated:
+                increase = 1 if self._slow_start else 1 / self.limit
+                self.limit = min(self.maximum, self.limit + increase)
+            self._condition.notify_all()
+
+
+class Throttle:
+    """Keep a HostLimiter for every host."""
+
+    def __init__(self, initial=DEF_INITIAL_LIMIT, maximum=DEF_MAX_LIMIT):
+        """Initialize the throttle.
+
+        Parameters
+        ----------
+        initial : int
+            The number of requests each new host may have in flight at first.
+        maximum : int
+            The highest each host's limit can grow.
+
+        """
+        self.initial = initial
+        self.maximum = maximum
+        self._hosts = dict()
+        self._lock = threading.Lock()
+
+    def for_url(self, url):
+        """Return the limiter for the host of a URL."""
+        host = urlsplit(url).netloc
+        with self._lock:
+            if host not in self._hosts:
+                self._hosts[host] = HostLimiter(self.initial, self.maximum)
+            return self._hosts[host]
+
+    def limits(self):
+        """Return the current limit of every host, by host name."""
+        with self._lock:
+            return {
+                host: int(limiter.limit)
+                for host, limiter in self._hosts.items()
+            }
@@ -0,0 +1,293 @@
+"""Pluggable transports, which carry a module's requests to the site.
+
+Every request a module sends passes through its transport, which turns it
+into a requests.Response, so the rest of the module never needs to know how
+the request was carried. Two transports are available:
+
+RequestsTransport ("http1")
+    The default. Requests are sent by the requests session itself, over
+    HTTP/1.1, with one request in flight per connection.
+HTTP2Transport ("http2")
+    Requests are sent with httpx over HTTP/2, which multiplexes hundreds of
+    requests in flight over a handful of connections to each proxy (or to the
+    site, without proxies). Sites which don't offer HTTP/2 are spoken to over
+    HTTP/1.1 instead, still within the same handful of connections. This
+    needs the optional httpx package, with its HTTP/2 and SOCKS extras:
+
+        pip install "httpx[http2,socks]"
+"""
+
+import datetime
+import importlib.util
+import threading
+import time
+
+from urllib.parse import urlsplit
+
+import requests
+
+from requests.cookies import cookiejar_from_dict
+from requests.structures import CaseInsensitiveDict
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+# The names of the transports.
+TRANSPORT_HTTP1 = "http1"
+TRANSPORT_HTTP2 = "http2"
+# The default number of connections an HTTP2Transport keeps to each proxy.
+DEF_HTTP2_CONNECTIONS = 4
+
+
+def http2_available():
+    """Return True if the packages needed by HTTP2Transport are installed."""
+    # httpx only imports h2 once an HTTP/2 connection is made.
+    return httpx is not None and importlib.util.find_spec("h2") is not None
+
+
+class RequestsTransport:
+    """Send requests with the requests session itself."""
+
+    # The session's adapters carry the requests, so their pools are used.
+    multiplexed = False
+
+    def close(self):
+        """Do nothing, as the sessions own their connections."""
+
+    def send(self, session, method, url, **kwargs):
+        """Send a request.
+
+        Parameters
+        ----------
+        session : requests.Session
+            The session to send the request with.
+        method : str
+            The HTTP method, such as "GET" or "HEAD".
+        url : str
+            The URL to request.
+        **kwargs
+            Passed on to `session.request`.
+
+        Returns
+        -------
+        requests.Response
+            The response to the request.
+
+        """
+        return session.request(method, url, **kwargs)
+
+
+class _RawStream:
+    """Let requests read the body of an httpx response, as if from urllib3."""
+
+    def __init__(self, response):
+        """Wrap an httpx response whose body hasn't been read yet."""
+        self._response = response
+
+    def close(self):
+        """Abandon the rest of the body. Over HTTP/2, only the stream ends."""
+        self._response.close()
+
+    def stream(self, chunk_size, decode_content=True):
+        """Yield the (decoded) body in chunks, as `iter_content` expects."""
+        try:
+            yield from self._response.iter_bytes(chunk_size)
+        except httpx.TimeoutException as error:
+            # requests reports a read timeout in the body this way, too.
+            raise requests.exceptions.ConnectionError(error)
+        except httpx.TransportError as error:
+            raise requests.exceptions.ChunkedEncodingError(error)
+
+
+class HTTP2Transport:
+    """Send requests with httpx, multiplexed over HTTP/2.
+
+    A separate httpx client, with its own few connections, is kept for every
+    proxy. The clients are shared by every session and thread, so all of the
+    requests in flight through a proxy share its connections.
+
+    Attributes
+    ----------
+    connections : int
+        The most connections kept to each proxy (or to the site, without
+        proxies). A site which only speaks HTTP/1.1 can have no more than
+        this many requests in flight through each proxy.
+
+    """
+
+    # Requests are carried over the transport's own connections.
+    multiplexed = True
+
+    def __init__(
+        self, connections=DEF_HTTP2_CONNECTIONS, ssl_context=None, count=None
+    ):
+        """Initialize the transport. No connection is made yet.
+
+        Parameters
+        ----------
+        connections : int
+            The most connections kept to each proxy.
+        ssl_context : ssl.SSLContext or None
+            The TLS settings for HTTPS sites. This must not be shared with
+            HTTP/1.1 clients, as HTTP/2 is negotiated by changing it.
+        count : callable or None
+            Called with the name of a counter ("connections_opened")
+            whenever a connection is opened.
+
+        Raises
+        ------
+        ImportError
+            If httpx, or its HTTP/2 support, isn't installed.
+
+        """
+        if not http2_available():
+            raise ImportError(
+                "The http2 transport needs httpx with HTTP/2 support: "
+                'pip install "httpx[http2,socks]"'
+            )
+        self.connections = connections
+        self._ssl_context = ssl_context
+        self._counter = count
+        self._clients = dict()
+        self._lock = threading.Lock()
+
+    def _client(self, proxy):
+        """Return the client for a proxy URL (or None), creating it if new."""
+        with self._lock:
+            if proxy not in self._clients:
+                address = proxy
+                if proxy and proxy.startswith("socks5h://"):
+                    # httpx always lets SOCKS5 proxies resolve host names.
+                    address = "socks5://" + proxy[len("socks5h://"):]
+                self._clients[proxy] = httpx.Client(
+                    http2=True,
+                    proxy=address,
+                    verify=self._ssl_context or True,
+                    limits=httpx.Limits(
+                        max_connections=self.connections,
+                        max_keepalive_connections=self.connections,
+                    ),
+                )
+            return self._clients[proxy]
+
+    @staticmethod
+    def _convert(response, started, history=()):
+        """Turn an httpx response into a requests.Response.
+
+        The body is left unread, and is read through the response's `raw`
+        attribute, just as requests reads a body from urllib3.
+        """
+        converted = requests.Response()
+        converted.status_code = response.status_code
+        converted.reason = response.reason_phrase
+        converted.url = str(response.url)
+        converted.headers = CaseInsensitiveDict()
+        for name, value in response.headers.multi_items():
+            if name in converted.headers:
+                value = "{}, {}".format(converted.headers[name], value)
+            converted.headers[name] = value
+        converted.encoding = requests.utils.get_encoding_from_headers(
+            converted.headers
+        )
+        converted.cookies = cookiejar_from_dict(dict(response.cookies))
+        converted.elapsed = datetime.timedelta(
+            seconds=time.monotonic() - started
+        )
+        converted.history = list(history)
+        converted.raw = _RawStream(response)
+        return converted
+
+    def _trace(self, event, info):
+        """Count the connections httpx opens, from its trace events."""
+        if event.endswith("connect_tcp.complete") and self._counter:
+            self._counter("connections_opened")
+
+    @staticmethod
+    def _timeout(timeout):
+        """Turn a requests timeout into an httpx.Timeout."""
+        if isinstance(timeout, tuple):
+            (connect, read) = timeout
+        else:
+            connect = read = timeout
+        return httpx.Timeout(connect=connect, read=read, write=read, pool=read)
+
+    def close(self):
+        """Close every client, and its connections."""
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+        for client in clients:
+            client.close()
+
+    def send(
+        self,
+        session,
+        method,
+        url,
+        proxies=None,
+        timeout=None,
+        headers=None,
+        stream=False,
+        allow_redirects=True,
+    ):
+        """Send a request over HTTP/2 (where the site offers it).
+
+        The arguments are those of `RequestsTransport.send`, limited to the
+        ones the modules use. The session's headers and cookies are sent with
+        the request, and any cookies it sets are kept in the session.
+
+        Returns
+        -------
+        requests.Response
+            The response to the request.
+
+        Raises
+        ------
+        requests.exceptions.RequestException
+            If the request fails. httpx errors are translated into the
+            requests errors the modules already handle.
+
+        """
+        proxy = (proxies or dict()).get(urlsplit(url).scheme)
+        client = self._client(proxy)
+        merged = dict(session.headers)
+        merged.update(headers or dict())
+        started = time.monotonic()
+        try:
+            request = client.build_request(
+                method,
+                url,
+                headers=merged,
+                cookies=session.cookies,
+                timeout=self._timeout(timeout),
+                extensions={"trace": self._trace},
+            )
+            response = client.send(
+                request, stream=True, follow_redirects=allow_redirects
+            )
+        except httpx.ConnectTimeout as error:
+            raise requests.exceptions.ConnectTimeout(error)
+        except httpx.TimeoutException as error:
+            raise requests.exceptions.ReadTimeout(error)
+        except httpx.TransportError as error:
+            raise requests.exceptions.ConnectionError(error)
+        except httpx.HTTPError as error:
+            raise requests.exceptions.RequestException(error)
+        history = [
+            self._convert(earlier, started) for earlier in response.history
+        ]
+        converted = self._convert(response, started, history)
+        session.cookies.update(converted.cookies)
+        if not stream:
+            # Read the whole body now, as requests would.
+            converted.content
+        return converted
+
+
+# Every transport, by name.
+TRANSPORTS = {
+    TRANSPORT_HTTP1: RequestsTransport,
+    TRANSPORT_HTTP2: HTTP2Transport,
+}
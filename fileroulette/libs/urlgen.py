@@ -1,41 +1,34 @@
 """Generate a random URL with the specified ruleset.
 
 This module defines the urlgen function. This function can generate random URLs
-for all kinds of services.
+for all kinds of services. It also defines build_pool, which turns a charset
+specification into the pool of characters a key can be made from.
 """
 
+import functools
 import random
 import string
 
 
-def urlgen(template: str, charset: str, length: int) -> str:
-    """Generate a random URL with the specified rules.
+@functools.lru_cache(maxsize=None)
+def build_pool(charset: str) -> str:
+    """Build the pool of characters described by a charset specification.
 
     Parameters
     ----------
-    template : str
-        A URL template with {} in the place where the generated key goes.
     charset : str
         A string specifying the types of characters to be included in the key.
-        The string can be any combination of the following:
-            - a lowercase letter (a-z)
-            - an uppercase letter (A-Z)
-            - a digit (0-9)
-        If the charset contains a lowercase letter, it specifies that the key
-        can contain lowercase letters. If it contains an uppercase letter, the
-        key can contain uppercase letters. If it contains a digit, the key can
-        contain digits.
-    length : int
-        The length of the key.
+        See `urlgen` for the details.
 
     Returns
     -------
-    new_url : str
-        A randomly-generated URL that matches the definition.
+    pool : str
+        Every character allowed by the specification, in sorted order. The
+        order is stable, so a key can be converted to and from a number. The
+        result is cached, so each specification is only parsed once.
 
     """
-    # Generate the random pool based on the specified charset. First, we need
-    # to initialize the character pool.
+    # First, we need to initialize the character pool.
     pool = set()
     # Next, parse each character in the specified charset.
     for character in list(charset):
@@ -53,10 +46,40 @@ def urlgen(template: str, charset: str, length: int) -> str:
     # Check to ensure that we've generated a valid character pool.
     if not pool:
         raise ValueError("Invalid charset specification.")
-    # Convert the pool set into a string.
-    pool = "".join(pool)
+    # Convert the pool set into a sorted string.
+    return "".join(sorted(pool))
+
+
+def urlgen(template: str, charset: str, length: int) -> str:
+    """Generate a random URL with the specified rules.
+
+    Parameters
+    ----------
+    template : str
+        A URL template with {} in the place where the generated key goes.
+    charset : str
+        A string specifying the types of characters to be included in the key.
+        The string can be any combination of the following:
+            - a lowercase letter (a-z)
+            - an uppercase letter (A-Z)
+            - a digit (0-9)
+        If the charset contains a lowercase letter, it specifies that the key
+        can contain lowercase letters. If it contains an uppercase letter, the
+        key can contain uppercase letters. If it contains a digit, the key can
+        contain digits.
+    length : int
+        The length of the key.
+
+    Returns
+    -------
+    new_url : str
+        A randomly-generated URL that matches the definition.
+
+    """
+    # Generate the random pool based on the specified charset.
+    pool = build_pool(charset)
     # Now we need to generate the random key from the pool set.
-    key = "".join([random.choice(pool) for _ in range(length)])
+    key = "".join(random.choices(pool, k=length))
     # Finally, insert the new key into the template URL.
     new_url = template.format(key)
     if new_url == template:
@@ -5,14 +5,44 @@ modules can be derived. To learn more about making a new data source module,
 see the demo.py module.
 """
 
-# TODO: Enable multithreading and proxies, and allow for users to choose
-#       whether they want to use random user agents or not.
-
+import collections
+import os
 import random
 import requests
 import sys
+import threading
+import time
+
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urljoin
 
-from fileroulette.libs import urlgen
+from fileroulette.libs.connections import PooledAdapter, ResumingContext
+from fileroulette.libs.coverage import CoverageMap
+from fileroulette.libs.extraction import ExtractionRules
+from fileroulette.libs.fingerprint import FingerprintCache, fingerprint_of
+from fileroulette.libs.hedging import LatencyTracker, hedged_call
+from fileroulette.libs.keygen import KeyGenerator
+from fileroulette.libs.keyspace import Keyspace, KeyspaceExhausted
+from fileroulette.libs.metrics import STAGE_HELP, Histogram
+from fileroulette.libs.parsing import ParserPool
+from fileroulette.libs.pipeline import DEF_QUEUE_SIZE, Pipeline, Stage
+from fileroulette.libs.pipelining import PipelinedConnection
+from fileroulette.libs.proxies import (
+    DEF_CHECK_TIMEOUT,
+    DEF_CHECK_URL,
+    NoHealthyProxies,
+    ProxyPool,
+    validate_proxies,
+)
+from fileroulette.libs.redirects import RedirectCache
+from fileroulette.libs.retry import RetryQueue
+from fileroulette.libs.streaming import COMPLETE, REJECT, StreamMatcher
+from fileroulette.libs.throttle import Throttle, parse_retry_after
+from fileroulette.libs.transports import (
+    TRANSPORT_HTTP1,
+    TRANSPORT_HTTP2,
+    TRANSPORTS,
+)
 
 # Just to prevent some SSL errors. This may not be necessary.
 # requests.packages.urllib3.util.ssl_.DEFAULT_CIPHERS += (
@@ -57,6 +87,52 @@ AGENTS = [
 # Default to the Tor Browser user agent.
 DEF_AGENT = "Mozilla/5.0 (Windows NT 6.1; rv:52.0) Gecko/20100101 Firefox/52.0"
 
+# The default number of probes kept in flight by the threads engine.
+DEF_CONCURRENCY = 10
+# The default number of worker threads for each stage of the pipeline engine.
+DEF_STAGE_WORKERS = {"probe": 10, "fetch": 5, "parse": 2}
+# How often (in seconds) the pipeline engine reports its queue depths.
+REPORT_INTERVAL = 10
+# The default folder where each module's coverage map is kept.
+DEF_COVERAGE_DIR = "coverage"
+# The number of URLs generated at a time by `_new_url`.
+URL_BATCH_SIZE = 256
+# The size (in bytes) of each chunk read while streaming a page.
+STREAM_CHUNK_SIZE = 4096
+# How often (in seconds) to check for due retries, once every fresh key has
+# been used.
+RETRY_POLL_INTERVAL = 0.5
+# How long (in seconds) to wait for a connection to be made, and for each
+# read from it, before a request is counted as failing.
+DEF_CONNECT_TIMEOUT = 5
+DEF_READ_TIMEOUT = 15
+# How long (in seconds) a whole probe may take, including any redirects and
+# attempts through other proxies.
+DEF_PROBE_DEADLINE = 30
+# With hedging, a duplicate of a request is sent once it has taken longer
+# than this percentile of recent requests.
+HEDGE_PERCENTILE = 0.95
+# The number of threads which send hedged requests.
+HEDGE_THREADS = 256
+# The number of proxies a request is tried through before giving up.
+PROXY_ATTEMPTS = 3
+
+# How proxies are assigned. With ROTATE_REQUEST, every request is sent through
+# a newly chosen proxy. With ROTATE_WORKER, each session keeps the same proxy
+# until it fails.
+ROTATE_REQUEST = "request"
+ROTATE_WORKER = "worker"
+
+# The ways a module can probe a URL. With PROBE_HEAD_GET, a HEAD request checks
+# the status code, and the page is only downloaded (with a GET) if it exists.
+# With PROBE_GET, the page is downloaded with a single GET. PROBE_API is the
+# same, but asks for a JSON response, for modules that talk to an API.
+PROBE_HEAD_GET = "head-get"
+PROBE_GET = "get"
+PROBE_API = "api"
+# Extra request headers sent by each probe strategy.
+PROBE_HEADERS = {PROBE_API: {"Accept": "application/json"}}
+
 # The following dictionary contains dicts of HTTP status codes that would
 # signal some kind of problem with our request. If any of these codes should
 # warrant a rejection of the URL without user notification, move them to the
@@ -94,6 +170,36 @@ STATUS_CODES = {
         530: "Origin DNS Error (Cloudflare)",
     },
 }
+# The status code category counted for successful responses, and for codes
+# which aren't listed in STATUS_CODES.
+STATUS_OK = "ok"
+STATUS_UNKNOWN = "unknown"
+# The status codes which mean a host wants us to slow down.
+THROTTLE_CODES = {429, 503, *STATUS_CODES["cloudflare"]}
+# The status codes which say nothing about the key itself, so it's worth
+# trying the key again later.
+RETRY_CODES = {*STATUS_CODES["error"], *STATUS_CODES["cloudflare"]}
+# The exceptions which mean a request failed for a passing reason, so it's
+# worth trying the key again later.
+TRANSIENT_ERRORS = (
+    requests.exceptions.ChunkedEncodingError,
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+)
+
+
+def status_category(status_code):
+    """Return the STATUS_CODES category of a status code.
+
+    Successful responses (200 and 206) are STATUS_OK, and codes which aren't
+    listed anywhere are STATUS_UNKNOWN.
+    """
+    if status_code in (200, 206):
+        return STATUS_OK
+    for category, codes in STATUS_CODES.items():
+        if status_code in codes:
+            return category
+    return STATUS_UNKNOWN
 
 
 # ---[ BASE MODULE DEFINITION ]--- #
@@ -104,6 +210,10 @@ class BaseModule:
 
     Attributes
     ----------
+    adapter : PooledAdapter
+        The transport adapter mounted by every session, so that they all
+        share the same pools of keep-alive connections and the same TLS
+        settings. It's sized for the engine by `prepare_connections`.
     allowed_chars : str
         This defines what kind of characters can be used in the
         randomly-generated key. This string only needs up to three characters,
@@ -115,26 +225,154 @@ class BaseModule:
         The template URL which will be modified with the randomly-generated key
         as defined by the allowed_chars and key_length variables. The key will
         be inserted wherever the open and closed brackets {} appear.
+    connect_timeout : float
+        How long (in seconds) to wait for a connection to be made.
+    coverage : CoverageMap or None
+        If enabled, the on-disk record of every key this module has probed,
+        across all of its runs.
+    extract_fields : dict
+        The extractor (Regex, JSONPath or Selector, from
+        fileroulette.libs.extraction) for every field of useful data, by
+        field name. If set, the default `check_output` returns the value of
+        every field, or False if any of them is missing.
+    redirects : RedirectCache
+        The redirect rules learned for this module's site, used to send
+        probes straight to their final URL.
+    fingerprints : FingerprintCache or None
+        If learn_fingerprints is enabled, the header fingerprints of pages
+        that returned "200 OK" but turned out to be dead.
+    histograms : dict
+        The latency Histogram (from fileroulette.libs.metrics) of every
+        stage of a probe, by stage name: "keygen" (generating a batch of
+        URLs), "head" and "get" (requests), and "check_output".
+    hedge_requests : bool
+        If enabled, a request which has taken longer than HEDGE_PERCENTILE of
+        recent requests is duplicated (through another proxy, if proxies are
+        enabled), and whichever copy answers first is used.
     key_length : int
         An integer which defines the length of the randomly-generated key.
+    latency : LatencyTracker
+        The latencies of recent requests, used to decide when to hedge.
+    parser_pool : ParserPool or None
+        If started with `start_parser_pool`, the pool of processes in which
+        downloaded pages are checked, instead of on the scanning threads.
+    learn_fingerprints : bool
+        With the PROBE_HEAD_GET strategy, learn the headers of pages which
+        return "200 OK" but turn out to be dead, and skip downloading later
+        pages whose headers match them.
+    pipeline_depth : int
+        If set, the sync and threads engines send the HEAD requests of the
+        PROBE_HEAD_GET strategy in batches of this many, pipelined over a
+        single keep-alive connection for each session (see
+        fileroulette.libs.pipelining). Any probe the batch couldn't answer is
+        sent the normal way. Off (0) by default.
+    probe_deadline : float or None
+        How long (in seconds) a whole probe may take, including redirects and
+        attempts through other proxies. A probe that runs out of time fails
+        with a timeout, and its key is retried later.
+    probe_strategy : str
+        How each URL is probed: PROBE_HEAD_GET (the default) checks the
+        header before downloading the page, PROBE_GET downloads the page in a
+        single request, and PROBE_API does the same for a JSON API.
+    keygen : KeyGenerator
+        The key generator compiled from base_url, allowed_chars and
+        key_length, used to turn keys into URLs and back again.
+    keyspace : Keyspace
+        The random walk through every possible key. New URLs are drawn from
+        it in order, so no key is ever probed twice.
+    blocked_status_codes : tuple
+        When proxies are enabled, responses with these status codes are taken
+        as a sign that the site has banned the proxy, and the proxy's circuit
+        breaker is tripped. Responses carrying a "cf-mitigated" header (a
+        Cloudflare challenge) are treated the same way.
     proxies : list
         If random_proxy is enabled, this list will be populated with (ip, port)
         tuples pulled from the `proxies.txt` file in the app's root directory.
+    proxy_checks : list or None
+        The ProxyCheck of every proxy, once `check_proxies` has been called.
+    proxy_pool : ProxyPool or None
+        The live proxies, shared by every session. Proxies are chosen for
+        each request according to their latency and success rate.
+    proxy_rotation : str
+        ROTATE_REQUEST (the default) sends every request through a newly
+        chosen proxy. ROTATE_WORKER keeps each session on the same proxy until
+        it fails, for sites which tie a visitor to their IP address.
+    read_timeout : float
+        How long (in seconds) to wait for each read from a connection.
     random_agent : bool
         This will determine whether each newly-generated requests session will
         use a random user agent. If not, it will use a Tor Browser user agent.
     random_proxy : bool
         This will determine whether random proxies should be assigned to each
         new session as it's created.
+    reject_markers : tuple
+        Strings which, if found anywhere in a page, mean it's worthless. The
+        default `check_output` rejects such pages before extracting anything.
+    rules : ExtractionRules
+        The reject_markers and extract_fields, compiled once when the module
+        is initialized.
+    stream_complete : tuple
+        Byte patterns which, once all of them have been downloaded in this
+        order, mean the page holds everything `check_output` needs. The rest
+        of the page is then skipped, and never seen by `check_output`, so
+        none of the stream_reject patterns (or reject_markers) may turn up
+        after these.
+    stream_range : int or None
+        If set, ask the server for only the first `stream_range` bytes of
+        each page, using a Range header.
+    stream_reject : tuple
+        Byte patterns which mean the page is worthless. As soon as one of
+        them is downloaded, the download is abandoned and the page rejected
+        without calling `check_output`.
+    retries : RetryQueue
+        The URLs whose probes failed for a passing reason (such as a timeout
+        or a 5xx error), waiting to be tried again.
+    result_handler : callable
+        The function called as `result_handler(url, result)` whenever useful
+        data is found. By default, the data is printed to the screen.
+    sink : ResultSink or None
+        If set with `use_sink`, every useful result is also written to this
+        sink (from fileroulette.libs.sinks), on its own writer thread.
+    stats : collections.Counter
+        Running counters for this module, such as the number of URLs probed
+        ("probes") and the number of useful results found ("hits").
+    throttle : Throttle
+        The number of requests allowed in flight to each host. Every host's
+        limit rises while its responses are clean, and is cut in half when it
+        answers with one of the THROTTLE_CODES, so the module settles just
+        under each host's rate limit.
+    transport : RequestsTransport or HTTP2Transport
+        The transport (from fileroulette.libs.transports) which carries
+        every request to the site. It's chosen by name with `use_transport`,
+        starting with the module's transport_name.
+    transport_name : str
+        The transport the module starts with: TRANSPORT_HTTP1 (the default)
+        sends requests over HTTP/1.1 with the requests library, and
+        TRANSPORT_HTTP2 multiplexes them over HTTP/2 with httpx (which must
+        be installed).
 
     """
 
     allowed_chars = str()
     base_url = str()
+    blocked_status_codes = (403, 407)
+    connect_timeout = DEF_CONNECT_TIMEOUT
+    extract_fields = dict()
+    hedge_requests = False
     key_length = int()
-    proxies = list()
+    learn_fingerprints = True
+    pipeline_depth = 0
+    probe_deadline = DEF_PROBE_DEADLINE
+    probe_strategy = PROBE_HEAD_GET
+    proxy_rotation = ROTATE_REQUEST
     random_agent = False
     random_proxy = False
+    read_timeout = DEF_READ_TIMEOUT
+    reject_markers = tuple()
+    stream_complete = tuple()
+    stream_range = None
+    stream_reject = tuple()
+    transport_name = TRANSPORT_HTTP1
 
     def __init__(self, module_name, agent, proxy):
         """Initialize the module.
@@ -151,11 +389,138 @@ class BaseModule:
         self.random_agent = agent
         # Enable or disable random proxies.
         self.random_proxy = proxy
+        # Display results on the screen unless told otherwise.
+        self.result_handler = self._print_result
+        # Results are only written to disk once a sink is set.
+        self.sink = None
+        # Keep running counters. The engines update these from several
+        # threads at once, so access is guarded by a lock.
+        self.stats = collections.Counter()
+        self._stats_lock = threading.Lock()
+        # Only the first of several hits found at once is displayed.
+        self._hit_lock = threading.Lock()
+        # Time every stage of a probe.
+        self.histograms = {stage: Histogram() for stage in STAGE_HELP}
+        # Walk the whole keyspace in a random order. The engines draw URLs
+        # from several threads at once, so the position is guarded by a lock.
+        self.keygen = KeyGenerator(
+            self.base_url, self.allowed_chars, self.key_length
+        )
+        self.keyspace = Keyspace(self.allowed_chars, self.key_length)
+        self._position = 0
+        self._stop = self.keyspace.size
+        self._position_lock = threading.Lock()
+        # URLs are generated in batches, then handed out one at a time.
+        self._url_batch = collections.deque()
+        # Coverage tracking is off until `enable_coverage` is called.
+        self.coverage = None
+        # Try keys again if their probes fail for a passing reason.
+        self.retries = RetryQueue()
+        # Share keep-alive connections and TLS sessions between sessions.
+        self.adapter = PooledAdapter(count=self._count)
+        # Carry requests with the module's chosen transport.
+        self.transport = None
+        self.use_transport(self.transport_name)
+        # Track how long requests take, and hedge the slowest ones if asked.
+        self.latency = LatencyTracker()
+        self._hedge_executor = None
+        self._hedge_lock = threading.Lock()
+        # Adapt the number of requests in flight to each host's rate limit.
+        self.throttle = Throttle()
+        # Learn how the site redirects its URLs.
+        self.redirects = RedirectCache()
+        # Learn which "200 OK" headers belong to dead pages.
+        self.fingerprints = (
+            FingerprintCache() if self.learn_fingerprints else None
+        )
+        # Compile the module's extraction rules.
+        self.rules = ExtractionRules(self.reject_markers, self.extract_fields)
+        # Pages are parsed on the scanning threads until a parser pool is
+        # started.
+        self.parser_pool = None
+
+        # Proxies are checked the first time a request needs one, unless
+        # `check_proxies` is called first.
+        self.proxies = list()
+        self.proxy_checks = None
+        self.proxy_pool = None
+        self._proxy_lock = threading.Lock()
 
         if self.random_proxy:
             # If proxies are enabled, load them from the `proxies.txt` file.
             self._load_proxies()
 
+    @staticmethod
+    def _check_status(status_code, url):
+        """Decide what to do with a URL based on its HTTP status code.
+
+        Parameters
+        ----------
+        status_code : int
+            The HTTP status code returned for the URL.
+        url : str
+            The URL that returned the status code.
+
+        Returns
+        -------
+        bool or None
+            True if the page was found, or False if the URL is invalid or
+            unavailable. If the status code signals some other problem, it is
+            printed (unless it's one of the RETRY_CODES) and None is
+            returned, as the key hasn't really been tested.
+
+        """
+        if status_code in (200, 206):
+            # The request was a success. A 206 means the server honored a
+            # request for only part of the page.
+            return True
+        # Check for alternate status codes.
+        if status_code in STATUS_CODES["rejected"]:
+            # The URL is invalid or unavailable.
+            return False
+        if status_code in RETRY_CODES:
+            # The key will be tried again, so there's no need to report it.
+            return None
+        for _, codes in STATUS_CODES.items():
+            # There's an unexpected status code.
+            if status_code in codes.keys():
+                # Print out the status code information.
+                print(
+                    "{}: {} ({})".format(status_code, codes[status_code], url)
+                )
+                return None
+        # We've encountered an unknown status code.
+        print("{}: Unknown ({})".format(status_code, url))
+        return None
+
+    def _confirm_fingerprint(self, url, live):
+        """Tell the fingerprint cache what a downloaded page turned out to be.
+
+        Parameters
+        ----------
+        url : str
+            The URL of the downloaded page.
+        live : bool
+            True if the page held useful data, otherwise False.
+
+        """
+        if self.fingerprints:
+            self.fingerprints.confirm(url, live)
+
+    def _count(self, name, amount=1):
+        """Increase one of the module's running counters.
+
+        Parameters
+        ----------
+        name : str
+            The name of the counter in `self.stats`.
+        amount : int
+            How much to increase the counter by.
+
+        """
+        with self._stats_lock:
+            self.stats[name] += amount
+
     def _create_new_session(self):
         """Create a new requests session.
 
@@ -175,78 +540,141 @@ class BaseModule:
         else:
             # Default to the Tor Browser user agent.
             session.headers.update({"User-Agent": DEF_AGENT})
-        # Check whether to enable a random proxy.
-        if self.random_proxy:
-            # Let the user know we're searching.
-            print("Searching for a working proxy", end="", flush=True)
-        while self.random_proxy:
-            try:
-                # Choose a proxy from the list.
-                (ip, port) = self.proxies.pop(0)
-            except IndexError:
-                # We are out of live proxies. Halt the program.
-                print("No more proxies available!")
-                sys.exit(0)
-            # Format and assign the chosen proxy.
-            proxy = "socks5h://{}:{}".format(ip, port)
-            session.proxies = {"http": proxy, "https": proxy}
-            # Test the proxy to see if it's working. To test the proxy, try to
-            # establish a connection to a website that should always be online,
-            # such as google.com.
-            print(".", end="", flush=True)
-            try:
-                # Retrieve google.com.
-                result = session.get("https://google.com/", timeout=1)
-                # If successful, re-add the proxy to the list to be used again.
-                self.proxies.append((ip, port))
-                print("Success!")
-                break
-            except (
-                requests.exceptions.ConnectionError,
-                requests.exceptions.InvalidSchema,
-                requests.exceptions.Timeout,
-            ):
-                # If unsuccessful, loop back and try another proxy.
-                continue
+        # Share the module's connection pools.
+        session.mount("http://", self.adapter)
+        session.mount("https://", self.adapter)
+        # Proxies are chosen for each request, by `_request`. With
+        # ROTATE_WORKER, this holds the proxy the session is sticking to.
+        session.proxy = None
+        # With pipelining, the session's pipelined connection, the URLs it
+        # has probed ahead, and their responses (by the URL requested).
+        session.prober = None
+        session.pipelined = collections.deque()
+        session.prefetched = dict()
         return session
 
-    def _execute_scan(self, session):
+    def _download(self, session, url, target):
+        """Download a page which passed its probe, retrying it if that fails.
+
+        Parameters
+        ----------
+        session
+            The session with which we will retrieve the page.
+        url : str
+            The URL generated for the key.
+        target : str
+            The URL to download, which may differ from `url` if the probe was
+            redirected.
+
+        Returns
+        -------
+        bytes or False
+            The raw content of the page, or False if it couldn't be
+            downloaded or streaming found a reject pattern.
+
+        """
+        try:
+            content = self._fetch_content(session, target)
+        except TRANSIENT_ERRORS as error:
+            self._count("transient_errors")
+            self._count("exception_" + type(error).__name__)
+            self._retry(url)
+            return False
+        # The key has now been dealt with for good.
+        self._mark_probed(url)
+        return content
+
+    def _ensure_proxy_pool(self):
+        """Check the proxies, if they're enabled and haven't been checked."""
+        if self.random_proxy and not self.proxy_pool:
+            with self._proxy_lock:
+                if not self.proxy_pool:
+                    self.check_proxies()
+
+    def _execute_scan(self, session, found=None):
         """Execute a single scan using the specified session.
 
         Parameters
         ----------
         session
             The requests session used to execute the scan.
+        found : threading.Event or None
+            Shared by scans running at the same time, and set by the first
+            one to find useful data. Once it's set, no new probe is started,
+            and any other useful data found by probes already in flight is
+            written to the sink, but not displayed.
 
         Returns
         -------
         bool
-            Return True if we found useful data, otherwise False.
+            Return True if we found useful data, otherwise False. With a
+            parser pool, this is always False, as the page is checked after
+            the scan returns, and any useful data is then reported (and
+            `found` set) from the pool's thread.
 
         """
-        # Generate a new URL.
-        url = self._new_url()
+        if found is not None and found.is_set():
+            # Another scan has already found a match.
+            return False
+        # Generate a new URL (or take one that is due to be retried).
+        key_url = self._next_url(session)
         # Retrieve the content of that URL.
-        content = self._get_page_content(session, url)
+        page = self._get_page_content(session, key_url)
+        recovered = self.retries.finish(key_url)
         # Check to see if the content was retrieved successfully.
-        if content:
-            # The content was retrieved. Check to see if it's valuable.
-            result = self.check_output(content)
-            # Check if the result was a success.
-            if isinstance(result, dict):
-                # We got valid data!
-                print("Found one!")
-                print("Live URL: {}".format(url))
-                # Get the keys from the result, then sort them.
-                keys = list(result.keys())
-                keys.sort()
-                # Display the data collected.
-                for key in keys:
-                    print(" * {}: {}".format(key, result[key]))
-                # Return True to indicate our success.
-                return True
-        # The content couldn't be retrieved, or the data was invalid.
-        return False
+        if not page:
+            return False
+        (url, content) = page
+        if self.parser_pool:
+            # Move on to the next probe while another process checks the
+            # page.
+            self._parse_later(
+                url,
+                content,
+                lambda result: self._report_hit(
+                    url, result, key_url, recovered, found
+                ),
+            )
+            return False
+        # The content was retrieved. Check to see if it's valuable.
+        result = self._parse_content(url, content)
+        if not result:
+            # The data was invalid.
+            return False
+        # We got valid data!
+        self._report_hit(url, result, key_url, recovered, found)
+        # Return True to indicate our success.
+        return True
+
+    def _fetch_content(self, session, url):
+        """Download the content of a URL that has already passed the probe.
+
+        Parameters
+        ----------
+        session
+            The session with which we will retrieve the URL.
+        url
+            The URL we will be retrieving.
+
+        Returns
+        -------
+        bytes or False
+            The raw content of the retrieved page, or False if streaming
+            found a reject pattern.
+
+        """
+        response = self._request(
+            session,
+            "GET",
+            url,
+            headers=self._stream_headers(),
+            stream=self._streaming(),
+        )
+        content = self._read_content(response)
+        if content is False:
+            # The page is dead, even though its header said otherwise.
+            self._confirm_fingerprint(url, False)
+        return content
 
     def _get_page_content(self, session, url):
         """Retrieve the HTML content for the specified URL.
@@ -260,46 +688,37 @@ class BaseModule:
 
         Returns
         -------
-        content or False
+        (url, content) or False
             This function returns False if the content could not be loaded,
-            otherwise it will return the text content of the retrieved page.
+            otherwise it will return the URL of the page (which may differ
+            from the original if we were redirected) and its raw content.
 
         """
-        # Retrieve the page's header.
-        (header, url) = self._get_page_header(session, url)
-        # DEBUG: We're just checking what status code we get.
-        # print("Status code: {}".format(header.status_code))
-        if header.status_code == 200:
-            # The request was a success. Return the text of the site.
-            return session.get(url).content.decode()
-        # Check for alternate status codes.
-        if header.status_code in STATUS_CODES["rejected"]:
-            # The URL is invalid or unavailable.
+        # Probe the URL before downloading anything.
+        probe = self._probe_url(session, url)
+        if not probe:
             return False
-        for _, codes in STATUS_CODES.items():
-            # There's an unexpected status code.
-            if header.status_code in codes.keys():
-                # Print out the status code information.
-                print(
-                    "{}: {} ({})".format(
-                        header.status_code, codes[header.status_code], url
-                    )
-                )
-                return False
-        # We've encountered an unknown status code.
-        print("{}: Unknown ({})".format(header.status_code, url))
-        return False
+        (target, content) = probe
+        if content is None:
+            # The request was a success. Retrieve the text of the site.
+            content = self._download(session, url, target)
+        return (target, content) if content else False
 
-    @staticmethod
-    def _get_page_header(session, url):
+    def _get_page_header(self, session, url, deadline=None):
         """Retrieve the HTTP header for the specified URL.
 
+        If the site has been seen redirecting URLs like this one, the request
+        is sent straight to the predicted target instead.
+
         Parameters
         ----------
         session
             The session with which we will retrieve the URL.
         url
             The URL we will be retrieving.
+        deadline : float or None
+            The time (from `time.monotonic`) by which every request must be
+            done.
 
         Returns
         -------
@@ -310,13 +729,47 @@ class BaseModule:
             will return the target URL. Otherwise, it will return the original.
 
         """
-        header = session.head(url)
+        predicted = self.redirects.predict(url)
+        if predicted:
+            header = self._head(session, predicted, deadline)
+            if not header.is_redirect:
+                self._count("redirects_skipped")
+                return (header, predicted)
+            # The prediction was wrong. Forget it, and start over.
+            self.redirects.invalidate(url)
+        header = self._head(session, url, deadline)
         if header.is_redirect:
             # If we're being redirected, grab the headers for the target URL.
-            url = header.headers["Location"]
-            header = session.head(url)
+            target = urljoin(url, header.headers["Location"])
+            self.redirects.learn(url, target)
+            url = target
+            header = self._head(session, url, deadline)
         return (header, url)
 
+    def _head(self, session, url, deadline=None):
+        """Send a HEAD request, unless its response was already pipelined.
+
+        Parameters
+        ----------
+        session
+            The session with which we will send the request.
+        url : str
+            The URL to request.
+        deadline : float or None
+            The time (from `time.monotonic`) by which the request must be
+            done.
+
+        Returns
+        -------
+        requests.Response or PipelinedResponse
+            The response to the request.
+
+        """
+        response = session.prefetched.pop(url, None)
+        if response is not None:
+            return response
+        return self._request(session, "HEAD", url, deadline)
+
     def _load_proxies(self):
         """Load the `proxies.txt` file and store it in `self.proxies`."""
         try:
@@ -327,6 +780,7 @@ class BaseModule:
             # The file doesn't exist.
             print("The file 'proxies.txt' could not be found.")
             sys.exit(0)
+        proxies = list()
         for line in lines:
             # Parse the list. Check each line for the ":" separator to ensure
             # that the line contains an IP:port pairing.
@@ -334,15 +788,30 @@ class BaseModule:
                 try:
                     # Extract the IP and port from the line.
                     ip, port = line.split(":")
-                    # Append them to the self.proxies list.
-                    self.proxies.append((ip, int(port)))
+                    # Append them to the proxy list.
+                    proxies.append((ip, int(port)))
                 except ValueError:
                     # If there's a problem assigning the IP and port, there is
                     # something wrong with how the proxy file is formatted.
                     print("Proxy file contains improper formatting.")
                     sys.exit(0)
         # Now that we've loaded the proxies into the file... Shuffle 'em up.
-        random.shuffle(self.proxies)
+        random.shuffle(proxies)
+        self.proxies = proxies
+
+    def _mark_probed(self, url):
+        """Record in the coverage map that a URL's key has been probed.
+
+        Parameters
+        ----------
+        url : str
+            A URL generated by `_new_url`.
+
+        """
+        if not self.coverage:
+            return
+        index = self.keygen.decode(self.keygen.key_from_url(url))
+        self.coverage.mark(self.keyspace.position(index))
 
     def _new_url(self):
         """Generate a new random URL.
@@ -351,9 +820,706 @@ class BaseModule:
         -------
         str
             A randomly-generated URL which follows the specified constraints.
+            No URL is returned twice, except for URLs being retried.
+
+        Raises
+        ------
+        KeyspaceExhausted
+            If every key in the module's keyspace (or shard) has been used,
+            and no URLs are waiting to be retried.
+
+        """
+        # Mix in the URLs that are due to be retried.
+        url = self.retries.pop()
+        if url:
+            return url
+        try:
+            with self._position_lock:
+                if not self._url_batch:
+                    started = time.perf_counter()
+                    self._url_batch.extend(self._next_url_batch())
+                    self._observe("keygen", time.perf_counter() - started)
+                return self._url_batch.popleft()
+        except KeyspaceExhausted:
+            # Only the retries are left. Wait for each of them to be due.
+            while True:
+                url = self.retries.pop(fresh=False)
+                if url:
+                    return url
+                wait = self.retries.next_due()
+                if wait is None:
+                    raise
+                time.sleep(min(wait, RETRY_POLL_INTERVAL))
+
+    def _next_url(self, session):
+        """Take the next URL for a session to scan.
+
+        With pipelining, the HEAD requests of a whole batch of URLs are sent
+        at once, and the URLs are then handed out one at a time.
+
+        Parameters
+        ----------
+        session
+            The session which will scan the URL.
+
+        Returns
+        -------
+        str
+            The URL, as returned by `_new_url`.
+
+        """
+        if not (self.pipeline_depth and self.probe_strategy == PROBE_HEAD_GET):
+            return self._new_url()
+        if not session.pipelined:
+            self._pipeline_probes(session)
+        return session.pipelined.popleft()
+
+    def _next_url_batch(self):
+        """Generate the next batch of URLs from the keyspace walk.
+
+        This must only be called while holding `self._position_lock`.
+
+        Returns
+        -------
+        list
+            Up to URL_BATCH_SIZE URLs, in the order of the walk.
+
+        Raises
+        ------
+        KeyspaceExhausted
+            If every key in the module's keyspace (or shard) has been used.
+
+        """
+        if self.coverage:
+            positions = list()
+            while len(positions) < URL_BATCH_SIZE:
+                # Skip every key that has already been probed.
+                self._position = self.coverage.next_unprobed(
+                    self._position, self._stop
+                )
+                if self._position >= self._stop:
+                    break
+                positions.append(self._position)
+                self._position += 1
+        else:
+            positions = range(
+                self._position,
+                min(self._position + URL_BATCH_SIZE, self._stop),
+            )
+            self._position += len(positions)
+        if not positions:
+            raise KeyspaceExhausted("Every key has been probed.")
+        return self.keygen.urls(self.keyspace.permute_many(positions))
+
+    def _observe(self, stage, seconds):
+        """Count the latency (in seconds) of a stage in its histogram."""
+        self.histograms[stage].observe(seconds)
+
+    def _parse_content(self, url, content):
+        """Check a downloaded page for useful data, on the calling thread.
+
+        Parameters
+        ----------
+        url : str
+            The URL of the page.
+        content : bytes
+            The raw content of the page.
+
+        Returns
+        -------
+        dict or False
+            The data returned by `check_output`, or False if there was none.
+
+        """
+        started = time.perf_counter()
+        result = self.check_content(content)
+        self._observe("check_output", time.perf_counter() - started)
+        self._confirm_fingerprint(url, bool(result))
+        return result
+
+    def _parse_later(self, url, content, report):
+        """Check a downloaded page in the parser pool, without waiting.
+
+        Parameters
+        ----------
+        url : str
+            The URL of the page.
+        content : bytes
+            The raw content of the page.
+        report : callable
+            Called with the data returned by `check_output`, if there was
+            any. It's called on one of the parser pool's threads, once the
+            page has been checked.
+
+        """
+        started = time.perf_counter()
+
+        def parsed(future):
+            self._observe("check_output", time.perf_counter() - started)
+            if future.cancelled():
+                # The pool was closed before the page was checked.
+                return
+            error = future.exception()
+            if error:
+                self._count("parse_errors")
+                self._count("exception_" + type(error).__name__)
+                return
+            result = future.result()
+            self._confirm_fingerprint(url, bool(result))
+            if result:
+                report(result)
+
+        self.parser_pool.submit(content, parsed)
+
+    def _pipeline_probes(self, session):
+        """Draw a batch of URLs, and pipeline their HEAD requests.
+
+        The responses are kept in `session.prefetched` for `_head` to pick
+        up. Responses which couldn't be read, or which show that the site has
+        banned the proxy, are left out, so those URLs are probed the normal
+        way. The pipelined connection sticks to its proxy for as long as the
+        proxy stays healthy.
+
+        Parameters
+        ----------
+        session
+            The session whose pipelined connection the requests are sent
+            over.
+
+        Raises
+        ------
+        KeyspaceExhausted
+            If no URL at all could be drawn.
+
+        """
+        urls = list()
+        try:
+            while len(urls) < self.pipeline_depth:
+                urls.append(self._new_url())
+        except KeyspaceExhausted:
+            if not urls:
+                raise
+        session.pipelined.extend(urls)
+        session.prefetched.clear()
+        # Send each request straight to its predicted redirect target, just
+        # as `_get_page_header` would.
+        targets = [self.redirects.predict(url) or url for url in urls]
+        origin = PipelinedConnection.origin_of(targets[0])
+        targets = [
+            target
+            for target in targets
+            if PipelinedConnection.origin_of(target) == origin
+        ]
+        proxy = None
+        if self.random_proxy:
+            self._ensure_proxy_pool()
+            current = session.prober.proxy if session.prober else None
+            proxy = self.proxy_pool.choose(current)
+        prober = session.prober
+        if not prober or prober.origin != origin or prober.proxy != proxy:
+            if prober:
+                prober.close()
+            prober = session.prober = PipelinedConnection(
+                targets[0],
+                proxy,
+                self.adapter.ssl_context,
+                self.connect_timeout,
+                self.read_timeout,
+            )
+        limiter = self.throttle.for_url(targets[0])
+        started = limiter.acquire()
+        try:
+            responses = prober.request_many(
+                "HEAD", targets, session.headers
+            )
+        except BaseException:
+            limiter.cancel(started)
+            raise
+        throttled = [
+            response
+            for response in responses
+            if response.status_code in THROTTLE_CODES
+        ]
+        if throttled:
+            self._count("throttled")
+            header = throttled[-1].headers.get("Retry-After")
+            limiter.release(started, True, parse_retry_after(header))
+        else:
+            limiter.release(started, False)
+        if proxy:
+            blocked = [
+                response
+                for response in responses
+                if response.status_code in self.blocked_status_codes
+                or "cf-mitigated" in response.headers
+            ]
+            if blocked:
+                # Leave the blocked URLs to be probed through another proxy.
+                self._count("proxy_blocks")
+                self.proxy_pool.trip(proxy)
+                prober.close()
+                responses = [
+                    response
+                    for response in responses
+                    if response not in blocked
+                ]
+            elif responses:
+                self.proxy_pool.success(
+                    proxy, responses[0].elapsed.total_seconds()
+                )
+            else:
+                self._count("proxy_failures")
+                if self.proxy_pool.failure(proxy):
+                    self._count("proxy_trips")
+        self._count("pipelined", len(responses))
+        for response in responses:
+            # Each response waited on the whole batch being sent.
+            self._observe("head", response.elapsed.total_seconds())
+        self._count("pipeline_fallbacks", len(urls) - len(responses))
+        session.prefetched.update(
+            (response.url, response) for response in responses
+        )
+
+    @staticmethod
+    def _print_result(url, result):
+        """Display the useful data found at a URL.
+
+        Parameters
+        ----------
+        url : str
+            The URL where the data was found.
+        result : dict
+            The data returned by `check_output`.
+
+        """
+        print("Found one!")
+        print("Live URL: {}".format(url))
+        # Get the keys from the result, then sort them.
+        keys = list(result.keys())
+        keys.sort()
+        # Display the data collected.
+        for key in keys:
+            print(" * {}: {}".format(key, result[key]))
+
+    def _probe_url(self, session, url):
+        """Probe a URL to see if it's worth downloading.
+
+        How the URL is probed depends on the module's probe strategy. With
+        PROBE_HEAD_GET, only the HTTP header is requested, and the page is
+        downloaded later. With PROBE_GET and PROBE_API, the page is downloaded
+        straight away, so the probe is the only request made for the key.
+
+        Parameters
+        ----------
+        session
+            The session with which we will retrieve the URL.
+        url
+            The URL we will be probing.
+
+        Returns
+        -------
+        (url, content) or False
+            The URL to download (which may differ from the original if we were
+            redirected) and the raw content of the page, if the probe already
+            downloaded it (otherwise None). If the URL is invalid or
+            unavailable, this returns False instead. If the probe failed for
+            a passing reason, the URL is also scheduled to be tried again.
+
+        """
+        self._count("probes")
+        deadline = None
+        if self.probe_deadline:
+            deadline = time.monotonic() + self.probe_deadline
+        try:
+            (response, target) = self._send_probe(session, url, deadline)
+        except TRANSIENT_ERRORS as error:
+            self._count("transient_errors")
+            self._count("exception_" + type(error).__name__)
+            self._retry(url)
+            return False
+        self._count("status_" + status_category(response.status_code))
+        verdict = self._check_status(response.status_code, target)
+        if not verdict:
+            response.close()
+            if verdict is False:
+                # The key is dead, so it won't need probing again.
+                self._mark_probed(url)
+            elif response.status_code in RETRY_CODES:
+                self._retry(url)
+            return False
+        if self.probe_strategy == PROBE_HEAD_GET:
+            fingerprint = self.fingerprints and fingerprint_of(response)
+            if fingerprint:
+                if self.fingerprints.is_dead(fingerprint):
+                    # This header matches pages we already know to be dead.
+                    self._count("gets_avoided")
+                    self._mark_probed(url)
+                    return False
+                self.fingerprints.expect(target, fingerprint)
+            # The key is marked as probed once the page has been downloaded.
+            return (target, None)
+        try:
+            content = self._read_content(response)
+        except TRANSIENT_ERRORS as error:
+            self._count("transient_errors")
+            self._count("exception_" + type(error).__name__)
+            self._retry(url)
+            return False
+        self._mark_probed(url)
+        return (target, content) if content else False
+
+    def _read_content(self, response):
+        """Read the raw content of a response.
+
+        If the module declares stream patterns, the page is inspected as it
+        downloads, and the download stops as soon as a verdict is reached.
+
+        Parameters
+        ----------
+        response
+            The response to a GET request.
+
+        Returns
+        -------
+        bytes or False
+            The raw content of the page (which may be cut short once every
+            useful part has arrived), or False if a reject pattern was found.
+
+        """
+        if not self._streaming():
+            self._count("bytes_received", len(response.content))
+            return response.content
+        matcher = StreamMatcher(self.stream_reject, self.stream_complete)
+        try:
+            for chunk in response.iter_content(STREAM_CHUNK_SIZE):
+                self._count("bytes_received", len(chunk))
+                if matcher.feed(chunk):
+                    break
+        finally:
+            # Closing the response abandons the rest of the download.
+            response.close()
+        if matcher.verdict == REJECT:
+            self._count("streams_rejected")
+            return False
+        if matcher.verdict == COMPLETE:
+            self._count("streams_completed")
+        return matcher.content
+
+    def _report_hit(self, url, result, key_url, recovered, found=None):
+        """Report a hit, but only display it if it's the first one found.
+
+        Parameters
+        ----------
+        url : str
+            The URL where the data was found.
+        result : dict
+            The data returned by `check_output`.
+        key_url : str
+            The URL generated from the result's key, before any redirects.
+        recovered : bool
+            True if the key was only probed successfully after a retry.
+        found : threading.Event or None
+            Set by the first hit. Hits found once it's set are only written
+            to the sink.
+
+        """
+        if recovered:
+            # We only found this because the key was tried again.
+            self._count("recovered_hits")
+        first = True
+        if found is not None:
+            with self._hit_lock:
+                first = not found.is_set()
+                found.set()
+        self._report_result(url, result, key_url, display=first)
+
+    def _report_result(self, url, result, key_url, display=True):
+        """Count a useful result and hand it to the sink and result handler.
+
+        Parameters
+        ----------
+        url : str
+            The URL where the data was found.
+        result : dict
+            The data returned by `check_output`.
+        key_url : str
+            The URL generated from the result's key, before any redirects.
+        display : bool
+            Whether to hand the result to the result handler. Results found
+            after the scan was told to stop are only written to the sink.
 
         """
-        return urlgen(self.base_url, self.allowed_chars, self.key_length)
+        self._count("hits")
+        if self.sink:
+            # This only queues the result, so it never waits on the disk.
+            key = self.keygen.key_from_url(key_url)
+            self.sink.write(self.name, url, result, key)
+        if display:
+            self.result_handler(url, result)
+
+    def _request(self, session, method, url, deadline=None, **kwargs):
+        """Send a request, hedging it if it's taking too long.
+
+        Parameters
+        ----------
+        session
+            The session with which we will send the request.
+        method : str
+            The HTTP method, such as "GET" or "HEAD".
+        url : str
+            The URL to request.
+        deadline : float or None
+            The time (from `time.monotonic`) by which the request must be
+            done, including any attempts through other proxies.
+        **kwargs
+            Passed on to `session.request`.
+
+        Returns
+        -------
+        requests.Response
+            The response to the request. Redirects are only followed for GET
+            requests, just as with `session.get` and `session.head`.
+
+        """
+        kwargs.setdefault("allow_redirects", method != "HEAD")
+        self._ensure_proxy_pool()
+        delay = None
+        if self.hedge_requests:
+            delay = self.latency.percentile(HEDGE_PERCENTILE)
+        if not delay:
+            return self._request_once(session, method, url, deadline, **kwargs)
+
+        def primary():
+            return self._request_once(session, method, url, deadline, **kwargs)
+
+        def backup():
+            self._count("hedges")
+            return self._request_once(
+                session, method, url, deadline, hedge=True, **kwargs
+            )
+
+        with self._hedge_lock:
+            if not self._hedge_executor:
+                self._hedge_executor = ThreadPoolExecutor(
+                    max_workers=HEDGE_THREADS
+                )
+        (response, hedged) = hedged_call(
+            self._hedge_executor,
+            primary,
+            backup,
+            delay,
+            discard=lambda response: response.close(),
+        )
+        if hedged:
+            self._count("hedges_won")
+        return response
+
+    def _request_once(
+        self, session, method, url, deadline=None, hedge=False, **kwargs
+    ):
+        """Send a request, through a proxy from the pool if they're enabled.
+
+        If the request fails, or the response shows that the site has banned
+        the proxy, the request is tried again through another proxy, up to
+        PROXY_ATTEMPTS times in all.
+
+        Parameters
+        ----------
+        session
+            The session with which we will send the request.
+        method : str
+            The HTTP method, such as "GET" or "HEAD".
+        url : str
+            The URL to request.
+        deadline : float or None
+            The time (from `time.monotonic`) by which the request must be
+            done.
+        hedge : bool
+            True if this is the duplicate of a hedged request, in which case
+            it never sticks to the session's proxy.
+        **kwargs
+            Passed on to `session.request`.
+
+        Returns
+        -------
+        requests.Response
+            The response to the request.
+
+        Raises
+        ------
+        requests.exceptions.Timeout
+            If the deadline passes before the request can be sent.
+
+        """
+        if not self.random_proxy:
+            timeout = self._timeout(deadline)
+            return self._send(session, method, url, timeout=timeout, **kwargs)
+        for attempt in range(PROXY_ATTEMPTS):
+            timeout = self._timeout(deadline)
+            sticky = self.proxy_rotation == ROTATE_WORKER and not hedge
+            proxy = self.proxy_pool.choose(session.proxy if sticky else None)
+            if sticky:
+                session.proxy = proxy
+            # The session keeps a separate connection pool for every proxy.
+            address = "socks5h://{}:{}".format(*proxy)
+            try:
+                response = self._send(
+                    session,
+                    method,
+                    url,
+                    proxies={"http": address, "https": address},
+                    timeout=timeout,
+                    **kwargs
+                )
+            except (
+                requests.exceptions.ConnectionError,
+                requests.exceptions.Timeout,
+            ):
+                self._count("proxy_failures")
+                if self.proxy_pool.failure(proxy):
+                    self._count("proxy_trips")
+                if attempt + 1 == PROXY_ATTEMPTS:
+                    raise
+                continue
+            if (
+                response.status_code in self.blocked_status_codes
+                or "cf-mitigated" in response.headers
+            ):
+                # The site has banned this proxy, or wants it to solve a
+                # challenge. Either way, it's no use to us for now.
+                self._count("proxy_blocks")
+                self.proxy_pool.trip(proxy)
+                if attempt + 1 < PROXY_ATTEMPTS:
+                    response.close()
+                    continue
+                return response
+            self.proxy_pool.success(proxy, response.elapsed.total_seconds())
+            return response
+
+    def _retry(self, url):
+        """Schedule a URL to be probed again, unless it's out of attempts."""
+        if self.retries.push(url):
+            self._count("retries")
+        else:
+            self._count("retries_abandoned")
+
+    def _run_threads(self, concurrency):
+        """Run the worker threads until one of them finds a match.
+
+        Parameters
+        ----------
+        concurrency : int
+            The number of worker threads (and therefore probes in flight) to
+            start.
+
+        """
+        found = threading.Event()
+        executor = ThreadPoolExecutor(max_workers=concurrency)
+        workers = [
+            executor.submit(self._thread_worker, found)
+            for _ in range(concurrency)
+        ]
+        try:
+            # Wait for the first worker to either find a match or fail.
+            (done, _) = wait(workers, return_when=FIRST_COMPLETED)
+        finally:
+            # Keep new probes from starting, and wait for the probes already
+            # in flight, so that none of them reports a result after the
+            # engine has returned (and the sink has been closed).
+            found.set()
+            executor.shutdown(wait=True)
+        # Re-raise any exception from a failed worker, just as `run` would.
+        for worker in done:
+            worker.result()
+
+    def _send(self, session, method, url, **kwargs):
+        """Send a single request, once the host's throttle allows it.
+
+        Parameters
+        ----------
+        session
+            The session with which we will send the request.
+        method : str
+            The HTTP method, such as "GET" or "HEAD".
+        url : str
+            The URL to request.
+        **kwargs
+            Passed on to the transport's `send` method.
+
+        Returns
+        -------
+        requests.Response
+            The response to the request.
+
+        """
+        limiter = self.throttle.for_url(url)
+        started = limiter.acquire()
+        sent = time.perf_counter()
+        try:
+            response = self.transport.send(session, method, url, **kwargs)
+        except BaseException:
+            limiter.cancel(started)
+            raise
+        if method in ("HEAD", "GET"):
+            self._observe(method.lower(), time.perf_counter() - sent)
+        self._count("requests")
+        self.latency.record(response.elapsed.total_seconds())
+        throttled = response.status_code in THROTTLE_CODES
+        retry_after = None
+        if throttled:
+            self._count("throttled")
+            header = response.headers.get("Retry-After")
+            retry_after = parse_retry_after(header)
+        limiter.release(started, throttled, retry_after)
+        return response
+
+    def _send_probe(self, session, url, deadline=None):
+        """Send the request that probes a URL, following the probe strategy.
+
+        Parameters
+        ----------
+        session
+            The session with which we will retrieve the URL.
+        url
+            The URL we will be probing.
+        deadline : float or None
+            The time (from `time.monotonic`) by which every request must be
+            done.
+
+        Returns
+        -------
+        response
+            The response to a HEAD request (with PROBE_HEAD_GET) or a GET
+            request (with PROBE_GET and PROBE_API).
+        target
+            The URL of the page, which may differ from the original if we
+            were redirected.
+
+        """
+        if self.probe_strategy == PROBE_HEAD_GET:
+            # Retrieve the page's header.
+            return self._get_page_header(session, url, deadline)
+        # Retrieve the whole page in a single request.
+        headers = dict(PROBE_HEADERS.get(self.probe_strategy, dict()))
+        headers.update(self._stream_headers())
+        predicted = self.redirects.predict(url)
+        response = self._request(
+            session,
+            "GET",
+            predicted or url,
+            deadline,
+            headers=headers,
+            stream=self._streaming(),
+        )
+        target = response.url
+        if response.history:
+            # We were redirected. If we predicted a target, it was wrong.
+            if predicted:
+                self.redirects.invalidate(url)
+            self.redirects.learn(response.history[0].url, target)
+        elif predicted:
+            self._count("redirects_skipped")
+        return (response, target)
 
     @staticmethod
     def _split_after(source, target):
@@ -415,12 +1581,93 @@ class BaseModule:
         post = source[index:]
         return pre, post
 
+    def _stream_headers(self):
+        """Return the extra headers used when downloading a page."""
+        if self.stream_range:
+            return {"Range": "bytes=0-{}".format(self.stream_range - 1)}
+        return dict()
+
+    def _streaming(self):
+        """Return True if pages should be inspected while they download."""
+        return bool(self.stream_reject or self.stream_complete)
+
+    def _thread_worker(self, found):
+        """Scan with a single session until a match is found.
+
+        Parameters
+        ----------
+        found : threading.Event
+            Set once any worker has found a match, to stop the others.
+
+        """
+        session = self._create_new_session()
+        while not session:
+            # Skip sessions that fail.
+            session = self._create_new_session()
+        # Scan until any worker finds a match (or the parser pool does).
+        while not found.is_set():
+            self._execute_scan(session, found)
+
+    def _timeout(self, deadline=None):
+        """Return the (connect, read) timeout for the next request.
+
+        Parameters
+        ----------
+        deadline : float or None
+            The time (from `time.monotonic`) by which the request must be
+            done. Neither timeout will run past it.
+
+        Returns
+        -------
+        tuple
+            The connect and read timeouts (in seconds).
+
+        Raises
+        ------
+        requests.exceptions.Timeout
+            If the deadline has already passed.
+
+        """
+        (connect, read) = (self.connect_timeout, self.read_timeout)
+        if deadline is None:
+            return (connect, read)
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            self._count("deadlines_missed")
+            raise requests.exceptions.Timeout("The probe ran out of time.")
+        return (min(connect, remaining), min(read, remaining))
+
+    def _wait_for_parsers(self):
+        """Wait for the pages still being parsed to report their hits."""
+        if self.parser_pool:
+            self.parser_pool.wait()
+
+    def check_content(self, content):
+        """Decode a page's raw content, then check it with `check_output`.
+
+        Parameters
+        ----------
+        content : bytes
+            The raw content returned by the server.
+
+        Returns
+        -------
+        dict or False
+            The data returned by `check_output`, or False if there was none.
+
+        """
+        # Streamed pages may be cut off in the middle of a character.
+        result = self.check_output(content.decode(errors="replace"))
+        return result if isinstance(result, dict) else False
+
     def check_output(self, content):
         """Check the content of the page to extract useful information.
 
         This function needs to be defined in each individual module, as this is
         the method which determines if the page contains data we wish to save,
-        such as a live file or useful text.
+        such as a live file or useful text. Modules which declare their
+        reject_markers and extract_fields don't need to define it, as the
+        compiled rules are used instead.
 
         Parameters
         ----------
@@ -437,8 +1684,175 @@ class BaseModule:
             scanning.
 
         """
+        if self.extract_fields:
+            return self.rules.match(content)
         return False
 
+    def check_proxies(self, url=DEF_CHECK_URL, timeout=DEF_CHECK_TIMEOUT):
+        """Check every loaded proxy at once, and pool the live ones.
+
+        Parameters
+        ----------
+        url : str
+            The URL to request through each proxy.
+        timeout : float
+            How long (in seconds) to wait for each proxy.
+
+        Returns
+        -------
+        list
+            The ProxyCheck of every proxy, live proxies first, fastest first.
+
+        """
+        print(
+            "Checking {} proxies against {}...".format(len(self.proxies), url)
+        )
+        checks = validate_proxies(self.proxies, url, timeout)
+        live = [check for check in checks if check.alive]
+        if not live:
+            # We are out of live proxies. Halt the program.
+            print("No live proxies available!")
+            sys.exit(0)
+        print(
+            "{} of {} proxies are live (fastest {:.0f} ms, slowest "
+            "{:.0f} ms).".format(
+                len(live),
+                len(checks),
+                live[0].latency * 1000,
+                live[-1].latency * 1000,
+            )
+        )
+        self.proxy_checks = checks
+        self.use_proxies(live, url, timeout)
+        return checks
+
+    def enable_coverage(self, directory=DEF_COVERAGE_DIR):
+        """Track probed keys on disk, and skip keys probed in earlier runs.
+
+        The coverage map is stored as `<directory>/<module name>.bitmap`. If
+        it already exists, the module resumes the keyspace walk it recorded,
+        so no key probed by an earlier run is probed again.
+
+        Parameters
+        ----------
+        directory : str
+            The folder where the coverage map is kept.
+
+        """
+        path = os.path.join(directory, "{}.bitmap".format(self.name))
+        self.coverage = CoverageMap(
+            path, self.keyspace.size, self.keyspace.seed
+        )
+        # Follow the same walk as the runs recorded in the coverage map.
+        self.keyspace = Keyspace(
+            self.allowed_chars, self.key_length, self.coverage.seed
+        )
+        self._url_batch.clear()
+
+    def prepare_connections(self, size, warm=True):
+        """Size the shared connection pools, and open connections early.
+
+        Parameters
+        ----------
+        size : int
+            The number of requests the engine keeps in flight at once. With
+            hedging, room is made for twice as many.
+        warm : bool
+            If enabled, `size` connections to the module's host are opened
+            (and, for HTTPS, handshaked) before the scan starts, spread
+            across the proxies if they're enabled.
+
+        Returns
+        -------
+        int
+            The number of connections opened ahead of time.
+
+        """
+        if self.hedge_requests:
+            size *= 2
+        self.adapter.close()
+        self.adapter = PooledAdapter(size, count=self._count)
+        if not warm or self.transport.multiplexed:
+            # A multiplexing transport needs only a few connections, which
+            # it opens itself.
+            return 0
+        url = urljoin(self.base_url, "/")
+        if not self.random_proxy:
+            opened = self.adapter.warm(url, None, size, self.connect_timeout)
+        else:
+            self._ensure_proxy_pool()
+            # Warm the proxies in proportion to how often they'll be used.
+            counts = collections.Counter(
+                self.proxy_pool.choose() for _ in range(size)
+            )
+
+            def warm_proxy(item):
+                (proxy, count) = item
+                address = "socks5h://{}:{}".format(*proxy)
+                return self.adapter.warm(
+                    url,
+                    {"http": address, "https": address},
+                    count,
+                    self.connect_timeout,
+                )
+
+            with ThreadPoolExecutor(max_workers=len(counts)) as executor:
+                opened = sum(executor.map(warm_proxy, counts.items()))
+        print(
+            "Opened {} of {} connections to {} ahead of time.".format(
+                opened, size, url
+            )
+        )
+        return opened
+
+    def report_coverage(self):
+        """Display how much of the keyspace has been probed across all runs."""
+        if not self.coverage:
+            return
+        self.coverage.flush()
+        print(
+            "Coverage: {} of {} keys probed ({:.4f}%)".format(
+                self.coverage.count(),
+                self.coverage.size,
+                self.coverage.percentage(),
+            )
+        )
+
+    def report_stats(self):
+        """Display the module's counters, connection reuse and host limits."""
+        print(
+            "Counters: {}".format(
+                ", ".join(
+                    "{}={}".format(name, self.stats[name])
+                    for name in sorted(self.stats)
+                )
+            )
+        )
+        if self.stats["requests"]:
+            # Every request that didn't need a new connection reused one.
+            reused = max(
+                0, self.stats["requests"] - self.stats["connections_opened"]
+            )
+            print(
+                "Connections: {} opened for {} requests ({:.1%} reused), "
+                "{} TLS sessions resumed".format(
+                    self.stats["connections_opened"],
+                    self.stats["requests"],
+                    reused / self.stats["requests"],
+                    self.stats["tls_resumed"],
+                )
+            )
+        limits = self.throttle.limits()
+        if self.stats["throttled"] and limits:
+            print(
+                "Requests in flight per host: {}".format(
+                    ", ".join(
+                        "{}={}".format(host, limit)
+                        for host, limit in sorted(limits.items())
+                    )
+                )
+            )
+
     def run(self):
         """Start the module's main loop."""
         print("Running {} module...".format(self.name))
@@ -446,6 +1860,269 @@ class BaseModule:
         while not session:
             # Skip sessions that fail.
             session = self._create_new_session()
-        # Scan until we find a match.
-        while not self._execute_scan(session):
-            pass
+        found = threading.Event()
+        try:
+            # Scan until we find a match.
+            while not found.is_set():
+                self._execute_scan(session, found)
+        except KeyspaceExhausted:
+            print("Every key has been probed.")
+        except NoHealthyProxies as error:
+            print("No live proxies available! {}".format(error))
+        finally:
+            self._wait_for_parsers()
+
+    def run_pipeline(self, workers=None, queue_size=DEF_QUEUE_SIZE):
+        """Start the module's main loop on the staged pipeline engine.
+
+        The scan is split into five stages (keygen, probe, fetch, parse and
+        sink) linked by bounded queues. Every stage has its own pool of worker
+        threads, so a slow parser never stalls the network stages, and a
+        backed-up stage stalls the stages before it instead of letting work
+        pile up in memory.
+
+        Parameters
+        ----------
+        workers : dict or None
+            The number of worker threads for the probe, fetch and parse
+            stages. Any stage left out uses the count in DEF_STAGE_WORKERS.
+        queue_size : int
+            The maximum number of items waiting in front of each stage.
+
+        """
+        counts = dict(DEF_STAGE_WORKERS)
+        counts.update(workers or dict())
+        print(
+            "Running {} module on the pipeline engine ({})...".format(
+                self.name,
+                ", ".join(
+                    "{}={}".format(stage, count)
+                    for stage, count in counts.items()
+                ),
+            )
+        )
+
+        def new_session():
+            session = self._create_new_session()
+            while not session:
+                # Skip sessions that fail.
+                session = self._create_new_session()
+            return session
+
+        def keygen(state, item):
+            return self._new_url()
+
+        def probe(session, url):
+            page = self._probe_url(session, url)
+            if not page:
+                self.retries.finish(url)
+                return None
+            return (url,) + page
+
+        def fetch(session, page):
+            (url, target, content) = page
+            if content is None:
+                content = self._download(session, url, target)
+            if not content:
+                self.retries.finish(url)
+                return None
+            return (url, target, content)
+
+        def parse(state, page):
+            (url, target, content) = page
+            recovered = self.retries.finish(url)
+            if self.parser_pool:
+                # Hand the page to another process and move on. Its hit, if
+                # there is one, is reported as soon as it's back.
+                self._parse_later(
+                    target,
+                    content,
+                    lambda result: report((url, target, result, recovered)),
+                )
+                return None
+            result = self._parse_content(target, content)
+            return (url, target, result, recovered) if result else None
+
+        def report(hit):
+            (url, target, result, recovered) = hit
+            self._report_hit(target, result, url, recovered, found)
+            # Stop scanning once we've found a match.
+            pipeline.stop()
+
+        def sink(state, hit):
+            report(hit)
+
+        found = threading.Event()
+
+        pipeline = Pipeline(
+            [
+                Stage("keygen", keygen),
+                Stage("probe", probe, counts["probe"], setup=new_session),
+                Stage("fetch", fetch, counts["fetch"], setup=new_session),
+                Stage("parse", parse, counts["parse"]),
+                Stage("sink", sink),
+            ],
+            queue_size=queue_size,
+        )
+        try:
+            pipeline.run(report_interval=REPORT_INTERVAL)
+        except KeyspaceExhausted:
+            print("Every key has been probed.")
+        except NoHealthyProxies as error:
+            print("No live proxies available! {}".format(error))
+        finally:
+            self._wait_for_parsers()
+
+    def run_threads(self, concurrency=DEF_CONCURRENCY):
+        """Start the module's main loop on the thread pool engine.
+
+        Rather than waiting for each probe to finish before starting the next,
+        this keeps up to `concurrency` probes in flight at once, each on a
+        worker thread of its own. Each probe still runs through
+        `_execute_scan`, so the module's `check_output` method is used exactly
+        as it is by `run`.
+
+        Only the first match is displayed, just as with `run`. Probes still
+        in flight when it's found are allowed to finish before this returns,
+        and any other matches they find are written to the sink.
+
+        Parameters
+        ----------
+        concurrency : int
+            The number of worker threads, and so of probes kept in flight at
+            the same time.
+
+        """
+        print(
+            "Running {} module with {} worker threads...".format(
+                self.name, concurrency
+            )
+        )
+        try:
+            self._run_threads(concurrency)
+        except KeyspaceExhausted:
+            print("Every key has been probed.")
+        except NoHealthyProxies as error:
+            print("No live proxies available! {}".format(error))
+        finally:
+            self._wait_for_parsers()
+
+    def select_shard(self, index, count, seed=None):
+        """Restrict the module to one shard of a shared keyspace walk.
+
+        Modules given the same seed and count, but different shard indexes,
+        will never probe the same key.
+
+        Parameters
+        ----------
+        index : int
+            The number of this module's shard, between 0 and `count` - 1.
+        count : int
+            The total number of shards.
+        seed : int or None
+            The seed of the keyspace walk shared by every shard. If omitted,
+            the module keeps its current walk.
+
+        """
+        if seed is not None:
+            self.keyspace = Keyspace(self.allowed_chars, self.key_length, seed)
+        # Shards start on a byte boundary, so that processes sharing a
+        # coverage map never write to the same byte.
+        (self._position, self._stop) = self.keyspace.shard(
+            index, count, align=8
+        )
+        self._url_batch.clear()
+
+    def snapshot_stats(self):
+        """Return a copy of the module's counters, safe to read while it runs.
+
+        Returns
+        -------
+        dict
+            Every counter in `self.stats`, by name.
+
+        """
+        with self._stats_lock:
+            return dict(self.stats)
+
+    def start_parser_pool(self, processes):
+        """Check downloaded pages in a pool of separate processes.
+
+        Parsing is CPU-bound, so on the scanning threads it competes with the
+        network code for the interpreter lock. With a parser pool, the raw
+        bytes of each page are sent to another process to be checked, while
+        the scanning threads go back to waiting on the network.
+
+        Parameters
+        ----------
+        processes : int
+            The number of parser processes to start.
+
+        """
+        self.stop_parser_pool()
+        self.parser_pool = ParserPool(self.name, processes)
+
+    def stop_parser_pool(self):
+        """Shut down the parser pool, if one was started."""
+        if self.parser_pool:
+            self.parser_pool.close()
+            self.parser_pool = None
+
+    def use_proxies(
+        self, checks, check_url=DEF_CHECK_URL, check_timeout=DEF_CHECK_TIMEOUT
+    ):
+        """Send requests through a pool of proxies which are known to work.
+
+        Parameters
+        ----------
+        checks : list
+            The ProxyCheck of every live proxy.
+        check_url : str
+            The URL requested through proxies that start failing, to check
+            whether they've recovered.
+        check_timeout : float
+            How long (in seconds) to wait for each of those proxies.
+
+        """
+        if self.proxy_pool:
+            self.proxy_pool.close()
+        self.random_proxy = True
+        self.proxy_pool = ProxyPool(checks, check_url, check_timeout)
+
+    def use_sink(self, sink):
+        """Write every useful result to a sink, as well as handling it.
+
+        Parameters
+        ----------
+        sink : ResultSink or None
+            The sink, from fileroulette.libs.sinks, or None to stop writing
+            results. The sink isn't closed by the module.
+
+        """
+        self.sink = sink
+
+    def use_transport(self, name):
+        """Carry the module's requests with another transport.
+
+        Parameters
+        ----------
+        name : str
+            TRANSPORT_HTTP1 or TRANSPORT_HTTP2.
+
+        Raises
+        ------
+        ImportError
+            If the packages the transport needs aren't installed.
+
+        """
+        if self.transport:
+            self.transport.close()
+        if name == TRANSPORT_HTTP2:
+            # HTTP/2 is negotiated by changing the TLS settings, so they
+            # can't be shared with the HTTP/1.1 connections.
+            self.transport = TRANSPORTS[name](
+                ssl_context=ResumingContext(self.adapter.ca_bundle),
+                count=self._count,
+            )
+        else:
+            self.transport = TRANSPORTS[name]()
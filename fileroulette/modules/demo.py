@@ -49,6 +49,39 @@ class Module(BaseModule):
     allowed_chars = "aA1"
     # Set the randomly-generated key length.
     key_length = 5
+    # Choose how each URL is probed. The default, PROBE_HEAD_GET, checks the
+    # page's header before downloading it. If the site answers every request
+    # with the same status code (such as an API), use PROBE_GET or PROBE_API
+    # from fileroulette.modules instead to download the page in one request.
+    # probe_strategy = PROBE_GET
+    # Optionally, let the page be inspected while it downloads. If any of the
+    # stream_reject patterns turns up, the download is abandoned and the page
+    # rejected. Once all of the stream_complete patterns have turned up (in
+    # order), the rest of the page is skipped and check_output is called with
+    # what has arrived so far, so only use patterns which come after every
+    # place a stream_reject pattern can turn up. Setting stream_range asks
+    # the server for only the first few bytes of each page.
+    stream_reject = (b"file not found",)
+    stream_complete = (b"download this file",)
+    # stream_range = 16384
+    # When proxies are enabled, every request goes through a newly chosen
+    # proxy. If the site ties a visitor to their IP address (for example, by
+    # handing out a download token), keep each session on the same proxy with
+    # ROTATE_WORKER from fileroulette.modules instead. Responses with any of
+    # the blocked_status_codes are taken as a sign that the proxy was banned.
+    # proxy_rotation = ROTATE_WORKER
+    # blocked_status_codes = (403, 407)
+    # Instead of defining check_output (below), a module can declare the
+    # strings that mark a worthless page, and an extractor for every field of
+    # useful data, using Regex, JSONPath or Selector from
+    # fileroulette.libs.extraction. These rules are compiled once, when the
+    # module is initialized, and the page is only useful if every field is
+    # found:
+    # reject_markers = ("file not found",)
+    # extract_fields = {
+    #     "File Name": Selector("div.file h1"),
+    #     "File Size": Regex(r"Size: ([\d.]+ [KMG]B)"),
+    # }
 
     def __init__(self, agent, proxy):
         """Initialize the demo data source module."""
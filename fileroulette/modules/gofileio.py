@@ -1,7 +1,7 @@
 """Gofile.io data source module."""
 
-import requests, json
-from fileroulette.modules import BaseModule
+from fileroulette.libs.extraction import JSONPath
+from fileroulette.modules import PROBE_API, BaseModule
 
 # Set the module name based on this file's name.
 MODULE_NAME = __name__.split(".")[-1]
@@ -17,24 +17,15 @@ class Module(BaseModule):
     allowed_chars = "a1"
     # Set the randomly-generated key length.
     key_length = 6
+    # The API answers in JSON, so a HEAD request tells us nothing.
+    probe_strategy = PROBE_API
+    # Error responses carry no upload data, so both fields will be missing.
+    extract_fields = {
+        "File Name": JSONPath("data.0.name"),
+        "File Size": JSONPath("data.0.size"),
+    }
 
     def __init__(self, agent, proxy):
         """Initialize the UploadFiles.io data source module."""
         # Initialize the BaseModule with the module name.
         super(Module, self).__init__(MODULE_NAME, agent, proxy)
-
-    def check_output(self, content):
-        """Check the json response from the gofile.io api request to extract useful information."""
-        try:
-            #Serialize the json string from the page
-            #Check against the status: ok is valid file, error is non valid
-            data = json.loads(content)
-            if data['status'] != "error":
-                return_dict = {"File Name": data['data'][0]['name'], "File Size": data['data'][0]['size']}
-                return return_dict
-            else:
-                return False
-        except Exception as exception:
-            # TODO: Handle this exception better.
-            print("Exception: {}".format(exception))
-            raise
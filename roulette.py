@@ -7,12 +7,164 @@ directly.
 """
 
 import argparse
+import csv
+import json
 import sys
 
-from fileroulette import DESCRIPTION, MODULE_DICT, run_module
+from fileroulette import (
+    DEF_CHECK_URL,
+    DEF_CONCURRENCY,
+    DEF_COVERAGE_DIR,
+    DEF_FSYNC,
+    DEF_PROFILE_DIR,
+    DEF_QUEUE_SIZE,
+    DEF_STAGE_WORKERS,
+    DESCRIPTION,
+    ENGINES,
+    MODULE_DICT,
+    PROFILERS,
+    run_module,
+)
+from fileroulette.libs.metrics import DEF_SUMMARY_INTERVAL
+from fileroulette.libs.sinks import FSYNC_POLICIES, SINKS, query_results
+from fileroulette.libs.transports import TRANSPORTS, http2_available
+from fileroulette.modules import (
+    DEF_CONNECT_TIMEOUT,
+    DEF_PROBE_DEADLINE,
+    DEF_READ_TIMEOUT,
+)
 from tools.build_proxy_list import get_fresh_proxies
 
+# The columns exported by `roulette.py query -f csv`.
+QUERY_COLUMNS = [
+    "module",
+    "key",
+    "url",
+    "file_name",
+    "file_size",
+    "first_seen",
+    "last_seen",
+    "sightings",
+    "data",
+]
+
+
+def parse_workers(spec):
+    """Parse a pipeline worker specification such as 'probe=20,parse=4'."""
+    workers = dict()
+    for part in spec.split(","):
+        try:
+            stage, count = part.split("=")
+            workers[stage.strip()] = int(count)
+        except ValueError:
+            raise argparse.ArgumentTypeError(
+                "invalid worker specification: '{}'".format(part)
+            )
+        if stage.strip() not in DEF_STAGE_WORKERS:
+            raise argparse.ArgumentTypeError(
+                "unknown pipeline stage: '{}'".format(stage.strip())
+            )
+        if workers[stage.strip()] < 1:
+            raise argparse.ArgumentTypeError(
+                "each stage needs at least 1 worker"
+            )
+    return workers
+
+
+def run_query(argv):
+    """Search a results database, and display or export what's found."""
+    argparser = argparse.ArgumentParser(
+        prog="{} query".format(sys.argv[0]),
+        description="Search the results kept in an SQLite database by -o.",
+    )
+    argparser.add_argument("database", help="the results database to search")
+    argparser.add_argument(
+        "-m",
+        dest="module",
+        help="only show results found by this module",
+    )
+    argparser.add_argument(
+        "--since",
+        dest="since",
+        help="only show results seen at or after this UTC date or time, "
+        "such as 2024-05-01",
+    )
+    argparser.add_argument(
+        "-s",
+        "--search",
+        dest="search",
+        help="only show results whose URL or file name contain this text",
+    )
+    argparser.add_argument(
+        "-n",
+        "--limit",
+        dest="limit",
+        type=int,
+        help="show at most this many results, most recently seen first",
+    )
+    argparser.add_argument(
+        "-f",
+        "--format",
+        dest="format",
+        choices=["table", "jsonl", "csv"],
+        default="table",
+        help="how to show the results (default: table)",
+    )
+    argparser.add_argument(
+        "-o",
+        "--output",
+        dest="output",
+        help="write the results to this file instead of the screen",
+    )
+    args = argparser.parse_args(argv)
+    try:
+        rows = query_results(
+            args.database,
+            module=args.module,
+            since=args.since,
+            search=args.search,
+            limit=args.limit,
+        )
+    except FileNotFoundError as error:
+        print("Error: {}".format(error))
+        sys.exit(0)
+    output = sys.stdout
+    if args.output:
+        output = open(args.output, "w", encoding="utf-8", newline="")
+    try:
+        if args.format == "jsonl":
+            for row in rows:
+                output.write(json.dumps(row, ensure_ascii=False) + "\n")
+        elif args.format == "csv":
+            writer = csv.writer(output)
+            writer.writerow(QUERY_COLUMNS)
+            for row in rows:
+                row["data"] = json.dumps(row["data"], ensure_ascii=False)
+                writer.writerow(row[column] for column in QUERY_COLUMNS)
+        else:
+            for row in rows:
+                output.write(
+                    "{}  {:<10} {:>3}x  {}  {} ({})\n".format(
+                        row["last_seen"],
+                        row["module"],
+                        row["sightings"],
+                        row["url"],
+                        row["file_name"] or "-",
+                        row["file_size"] or "?",
+                    )
+                )
+            output.write("{} results.\n".format(len(rows)))
+    finally:
+        if args.output:
+            output.close()
+
+
 if __name__ == "__main__":
+    # Searching a results database is a command of its own.
+    if sys.argv[1:2] == ["query"]:
+        run_query(sys.argv[2:])
+        sys.exit(0)
+
     # Parse the command-line arguments.
     argparser = argparse.ArgumentParser(description=DESCRIPTION)
     argparser.add_argument(
@@ -27,6 +179,13 @@ if __name__ == "__main__":
         action="store_true",
         help="enable proxies (requires a proxies.txt file)",
     )
+    argparser.add_argument(
+        "--proxy-check-url",
+        dest="proxy_check_url",
+        default=DEF_CHECK_URL,
+        help="URL requested through each proxy to check that it works "
+        "(default: {})".format(DEF_CHECK_URL),
+    )
     argparser.add_argument(
         "-d",
         dest="download",
@@ -39,8 +198,215 @@ if __name__ == "__main__":
         default="list",
         help="choose data source module (omit to list available modules)",
     )
+    argparser.add_argument(
+        "--engine",
+        dest="engine",
+        choices=ENGINES,
+        default="sync",
+        help="choose the scan engine (default: sync)",
+    )
+    argparser.add_argument(
+        "-c",
+        dest="concurrency",
+        type=int,
+        default=DEF_CONCURRENCY,
+        help="number of worker threads, and so of probes in flight, for the "
+        "threads engine (default: {})".format(DEF_CONCURRENCY),
+    )
+    argparser.add_argument(
+        "-w",
+        dest="workers",
+        type=parse_workers,
+        default=None,
+        help="worker threads per stage for the pipeline engine "
+        "(default: {})".format(
+            ",".join(
+                "{}={}".format(stage, count)
+                for stage, count in DEF_STAGE_WORKERS.items()
+            )
+        ),
+    )
+    argparser.add_argument(
+        "--queue-size",
+        dest="queue_size",
+        type=int,
+        default=DEF_QUEUE_SIZE,
+        help="maximum items queued between pipeline stages "
+        "(default: {})".format(DEF_QUEUE_SIZE),
+    )
+    argparser.add_argument(
+        "--connect-timeout",
+        dest="connect_timeout",
+        type=float,
+        help="seconds to wait for a connection (default: the module's "
+        "own, or {})".format(DEF_CONNECT_TIMEOUT),
+    )
+    argparser.add_argument(
+        "--read-timeout",
+        dest="read_timeout",
+        type=float,
+        help="seconds to wait for each read from a connection "
+        "(default: the module's own, or {})".format(DEF_READ_TIMEOUT),
+    )
+    argparser.add_argument(
+        "--deadline",
+        dest="deadline",
+        type=float,
+        help="seconds a whole probe may take, including redirects and "
+        "retries through other proxies (default: the module's own, or "
+        "{})".format(DEF_PROBE_DEADLINE),
+    )
+    argparser.add_argument(
+        "--hedge",
+        dest="hedge",
+        action="store_true",
+        help="duplicate requests slower than 95%% of recent ones, and use "
+        "whichever copy answers first",
+    )
+    argparser.add_argument(
+        "--transport",
+        dest="transport",
+        choices=sorted(TRANSPORTS),
+        help="carry requests over HTTP/1.1 or HTTP/2 (http2 needs httpx; "
+        "default: the module's own, usually http1)",
+    )
+    argparser.add_argument(
+        "--pipeline-depth",
+        dest="pipeline_depth",
+        type=int,
+        default=0,
+        help="pipeline HEAD probes over one connection per worker, this many "
+        "at a time (sync and threads engines only; default: 0, off)",
+    )
+    argparser.add_argument(
+        "--no-warm-up",
+        dest="warm",
+        action="store_false",
+        help="don't open connections to the module's host before scanning",
+    )
+    argparser.add_argument(
+        "--processes",
+        dest="processes",
+        type=int,
+        default=1,
+        help="number of worker processes to scan with (default: 1)",
+    )
+    argparser.add_argument(
+        "--parse-processes",
+        dest="parse_processes",
+        type=int,
+        default=0,
+        help="number of processes to parse pages in, off the scanning "
+        "threads (default: 0, parse on the scanning threads)",
+    )
+    argparser.add_argument(
+        "--coverage-dir",
+        dest="coverage_dir",
+        default=DEF_COVERAGE_DIR,
+        help="folder for the coverage maps used to resume scans "
+        "(default: {})".format(DEF_COVERAGE_DIR),
+    )
+    argparser.add_argument(
+        "--no-coverage",
+        dest="coverage",
+        action="store_false",
+        help="don't record probed keys, and don't skip previously probed keys",
+    )
+    argparser.add_argument(
+        "-o",
+        "--output",
+        dest="output",
+        help="append every result to this file (JSON lines, CSV, or an "
+        "SQLite database for .db files), written off the scanning threads",
+    )
+    argparser.add_argument(
+        "--output-format",
+        dest="output_format",
+        choices=sorted(SINKS),
+        help="format of the output file (default: by its extension, or "
+        "jsonl)",
+    )
+    argparser.add_argument(
+        "--fsync",
+        dest="fsync",
+        choices=FSYNC_POLICIES,
+        default=DEF_FSYNC,
+        help="when to sync the output file to disk: never, at most once a "
+        "second, or after every batch (default: {})".format(DEF_FSYNC),
+    )
+    argparser.add_argument(
+        "--metrics-port",
+        dest="metrics_port",
+        type=int,
+        help="serve live counters and latency histograms in the Prometheus "
+        "text format on this local port (with --processes, worker N uses "
+        "the port plus N)",
+    )
+    argparser.add_argument(
+        "--summary",
+        dest="summary_interval",
+        type=float,
+        nargs="?",
+        const=DEF_SUMMARY_INTERVAL,
+        help="print a summary of rates, latencies and status codes every "
+        "SUMMARY seconds (default: {})".format(DEF_SUMMARY_INTERVAL),
+    )
+    argparser.add_argument(
+        "--profile",
+        dest="profile",
+        choices=sorted(PROFILERS),
+        help="profile the scan with cProfile, a low-overhead sampling "
+        "profiler, or tracemalloc, and write a report when it ends (or on "
+        "SIGUSR1)",
+    )
+    argparser.add_argument(
+        "--profile-dir",
+        dest="profile_dir",
+        default=DEF_PROFILE_DIR,
+        help="folder to write profile reports to (default: {})".format(
+            DEF_PROFILE_DIR
+        ),
+    )
     args = argparser.parse_args()
 
+    # Ensure the concurrency level makes sense.
+    if args.concurrency < 1:
+        print("Error: The concurrency level must be at least 1.")
+        sys.exit(0)
+    if args.queue_size < 1:
+        print("Error: The queue size must be at least 1.")
+        sys.exit(0)
+    if any(
+        value is not None and value <= 0
+        for value in (args.connect_timeout, args.read_timeout, args.deadline)
+    ):
+        print("Error: Timeouts and deadlines must be positive.")
+        sys.exit(0)
+    if args.transport == "http2" and not http2_available():
+        print("Error: The http2 transport needs httpx with HTTP/2 support.")
+        print('Install it with: pip install "httpx[http2,socks]"')
+        sys.exit(0)
+    if args.metrics_port is not None and not 0 <= args.metrics_port < 65536:
+        print("Error: The metrics port must be between 0 and 65535.")
+        sys.exit(0)
+    if args.summary_interval is not None and args.summary_interval <= 0:
+        print("Error: The summary interval must be positive.")
+        sys.exit(0)
+    if args.pipeline_depth < 0:
+        print("Error: The pipeline depth can't be negative.")
+        sys.exit(0)
+    if args.processes < 1:
+        print("Error: The number of processes must be at least 1.")
+        sys.exit(0)
+    if args.parse_processes < 0:
+        print("Error: The number of parse processes can't be negative.")
+        sys.exit(0)
+    if args.parse_processes and args.processes > 1:
+        # Worker processes are daemons, which can't start processes of their
+        # own.
+        print("Error: --parse-processes can't be combined with --processes.")
+        sys.exit(0)
+
     # See if they defined a source module.
     if args.module == "list" and not args.download:
         # No module was defined, and they're not just trying to download a new
@@ -90,4 +456,30 @@ if __name__ == "__main__":
         sys.exit(0)
 
     # Run the specified module.
-    run_module(args.module, agent=args.agent, proxy=args.proxy)
+    run_module(
+        args.module,
+        agent=args.agent,
+        proxy=args.proxy,
+        processes=args.processes,
+        coverage_dir=args.coverage_dir if args.coverage else None,
+        parse_processes=args.parse_processes,
+        proxy_check_url=args.proxy_check_url,
+        engine=args.engine,
+        concurrency=args.concurrency,
+        workers=args.workers,
+        queue_size=args.queue_size,
+        connect_timeout=args.connect_timeout,
+        read_timeout=args.read_timeout,
+        deadline=args.deadline,
+        hedge=args.hedge,
+        warm=args.warm,
+        pipeline_depth=args.pipeline_depth,
+        transport=args.transport,
+        output=args.output,
+        output_format=args.output_format,
+        fsync=args.fsync,
+        metrics_port=args.metrics_port,
+        summary_interval=args.summary_interval,
+        profile=args.profile,
+        profile_dir=args.profile_dir,
+    )
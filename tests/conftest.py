@@ -0,0 +1,133 @@
+"""Fixtures shared by the tests."""
+
+import hashlib
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from fileroulette.modules import upfile
+
+# A page for a live UploadFiles.io file.
+LIVE_PAGE = (
+    '<html><body><div class="details"><h3>file_{}.zip</h3>'
+    "<p>Size: 1.2 MB</p></div></body></html>"
+)
+# The page UploadFiles.io serves for a file that has been deleted.
+DEAD_PAGE = "<html><body><h1>Sorry it's gone...</h1></body></html>"
+
+
+def is_live(key):
+    """Return True if the local site serves a live file for this key."""
+    return hashlib.md5(key.encode()).digest()[0] % 5 == 0
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Answer as UploadFiles.io would, with one live file in every five.
+
+    The last segment of the path is the key, and the segments before it
+    change how the site answers: with "old", every URL is moved to the same
+    path without "old", and with "soft", dead files are served as a page
+    saying so, rather than as a 404.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def _answer(self, head):
+        self.server.received.append(
+            (self.command, self.path, dict(self.headers))
+        )
+        # Take a little while, so that several probes are in flight at once.
+        time.sleep(self.server.delay)
+        segments = self.path.strip("/").split("/")
+        (flags, key) = (segments[:-1], segments[-1])
+        if "old" in flags:
+            self.send_response(301)
+            self.send_header(
+                "Location",
+                "/" + "/".join(part for part in segments if part != "old"),
+            )
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if is_live(key):
+            body = LIVE_PAGE.format(key).encode()
+            self.send_response(200)
+        elif "soft" in flags:
+            body = DEAD_PAGE.encode()
+            self.send_response(200)
+        else:
+            body = b"Not Found"
+            self.send_response(404)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if not head:
+            self.wfile.write(body)
+
+    def do_GET(self):
+        self._answer(head=False)
+
+    def do_HEAD(self):
+        self._answer(head=True)
+
+    def log_message(self, *args):
+        pass
+
+
+class LocalSite(upfile.Module):
+    """The UploadFiles.io module, pointed at the local server."""
+
+    def __init__(self, port, prefix="", received=None):
+        """Point the module at the local server.
+
+        Parameters
+        ----------
+        port : int
+            The port the local server listens on.
+        prefix : str
+            The path in front of every key, such as "soft" or "old".
+        received : list or None
+            The server's log of the requests it received.
+
+        """
+        self.prefix = "/" + prefix if prefix else ""
+        self.base_url = "http://127.0.0.1:{}{}/{{}}".format(port, self.prefix)
+        self._received = received
+        super(LocalSite, self).__init__(agent=False, proxy=False)
+
+    def received(self):
+        """Return the (method, path, headers) of every request under prefix."""
+        return [
+            request
+            for request in self._received
+            if request[1].startswith(self.prefix + "/")
+        ]
+
+
+class RecordingSink:
+    """A result sink which keeps every result written to it."""
+
+    def __init__(self):
+        self.written = list()
+
+    def write(self, module_name, url, result, key=None):
+        self.written.append((url, result, key))
+
+
+@pytest.fixture(scope="session")
+def local_site():
+    """Serve a fake file host, and return a function making modules for it."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    server.daemon_threads = True
+    server.delay = 0.02
+    server.received = list()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield lambda prefix="": LocalSite(
+        server.server_address[1], prefix, server.received
+    )
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,69 @@
+"""Tests for the benchmark suite."""
+
+import json
+import sys
+
+import pytest
+
+from benchmarks import suite
+
+
+def _run_suite(monkeypatch, *args):
+    monkeypatch.setattr(
+        sys,
+        "argv",
+        ["suite", "--repeat", "2", "--min-time", "0.001"] + list(args),
+    )
+    suite.main()
+
+
+def test_every_benchmark_runs():
+    names = list()
+    for name, build in suite.cases(proxies=10):
+        build()()
+        names.append(name)
+    assert len(names) == len(set(names))
+    assert "dispatch/upfile" in names
+    assert "load_proxies/10" in names
+
+
+def test_measure_is_repeatable():
+    calls = list()
+
+    def build():
+        # Every benchmark starts from the same seed.
+        calls.append(suite.random.random())
+        return lambda: None
+
+    results = [suite.measure(build, repeat=3, min_time=0.001) for _ in "ab"]
+    assert calls[0] == calls[1]
+    for result in results:
+        assert result["repeat"] == 3
+        assert result["number"] >= 1
+        assert 0 < result["best"] <= result["median"]
+
+
+def test_results_are_saved_and_compared(monkeypatch, tmp_path, capsys):
+    path = str(tmp_path / "baseline.json")
+    pattern = "^(session/default|split_after/hit)$"
+    _run_suite(monkeypatch, "-k", pattern, "--json", path)
+    with open(path) as json_file:
+        saved = json.load(json_file)
+    assert saved["seed"] == suite.SEED
+    assert sorted(saved["results"]) == ["session/default", "split_after/hit"]
+    capsys.readouterr()
+    _run_suite(monkeypatch, "-k", pattern, "--compare", path)
+    rows = capsys.readouterr().out.splitlines()[1:]
+    assert len(rows) == 2
+    # Every result shows its change against the saved run.
+    assert all(row.rstrip().endswith("%") for row in rows)
+
+
+@pytest.mark.parametrize("keygen, slower", [(0.5, []), (2.0, ["upfile"])])
+def test_slower_key_generators_are_listed(keygen, slower):
+    batch = suite.URL_BATCH_SIZE
+    results = {
+        "urlgen/upfile": {"best": 1.0},
+        "keygen/upfile": {"best": keygen * batch},
+    }
+    assert suite.check_keygen(results) == slower
@@ -0,0 +1,66 @@
+"""Tests for the coverage map, and resuming a scan from it."""
+
+import random
+
+import pytest
+
+from fileroulette.libs.coverage import CoverageMap
+from fileroulette.modules import upfile
+
+
+def test_marks_persist_across_reopen(tmp_path):
+    path = str(tmp_path / "nested" / "test.bitmap")
+    size = 100003
+    marked = set(random.sample(range(size), 5000)) | {0, size - 1}
+    coverage = CoverageMap(path, size, seed=42)
+    for position in marked:
+        coverage.mark(position)
+    coverage.close()
+    # The seed stored in the file wins over the one given on reopening.
+    coverage = CoverageMap(path, size, seed=7)
+    try:
+        assert coverage.seed == 42
+        assert coverage.count() == len(marked)
+        assert {p for p in range(size) if p in coverage} == marked
+    finally:
+        coverage.close()
+
+
+def test_rejects_other_keyspaces(tmp_path):
+    path = str(tmp_path / "test.bitmap")
+    CoverageMap(path, 1000, seed=1).close()
+    with pytest.raises(ValueError):
+        CoverageMap(path, 1001, seed=1)
+
+
+def test_next_unprobed_skips_probed_runs(tmp_path):
+    coverage = CoverageMap(str(tmp_path / "test.bitmap"), 10000, seed=1)
+    try:
+        for position in range(3, 9000):
+            coverage.mark(position)
+        assert coverage.next_unprobed(0, 10000) == 0
+        assert coverage.next_unprobed(3, 10000) == 9000
+        assert coverage.next_unprobed(3, 5000) == 5000
+    finally:
+        coverage.close()
+
+
+def test_module_resumes_walk(tmp_path):
+    module = upfile.Module(agent=False, proxy=False)
+    module.enable_coverage(str(tmp_path))
+    first = module._next_url_batch()
+    for url in first:
+        module._mark_probed(url)
+    module.coverage.close()
+    # A new run follows the same walk, past every key already probed.
+    module = upfile.Module(agent=False, proxy=False)
+    module.enable_coverage(str(tmp_path))
+    try:
+        second = module._next_url_batch()
+        assert not set(first) & set(second)
+        assert second[0] == module.keygen.url(
+            module.keyspace.key_at(len(first))
+        )
+        assert module.coverage.count() == len(first)
+    finally:
+        module.coverage.close()
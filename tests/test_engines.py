@@ -0,0 +1,43 @@
+"""Tests for the scan engines."""
+
+import time
+
+from fileroulette import run_engine
+
+from conftest import RecordingSink
+
+
+def test_threads_display_one_hit(local_site):
+    module = local_site()
+    displayed = list()
+    module.result_handler = lambda url, result: displayed.append(url)
+    sink = RecordingSink()
+    module.use_sink(sink)
+    module.run_threads(concurrency=20)
+    written = len(sink.written)
+    # Nothing is reported once the engine has returned.
+    time.sleep(0.5)
+    assert len(displayed) == 1
+    assert len(sink.written) == written
+    assert module.stats["hits"] == written >= 1
+    assert displayed[0] in [url for url, _, _ in sink.written]
+
+
+def test_sync_displays_one_hit(local_site):
+    module = local_site()
+    displayed = list()
+    module.result_handler = lambda url, result: displayed.append(url)
+    module.run()
+    assert len(displayed) == 1
+    assert module.stats["hits"] == 1
+
+
+def test_run_engine_keeps_module_timeouts(local_site):
+    module = local_site()
+    module.connect_timeout = 2
+    module.probe_deadline = 7
+    module.result_handler = lambda url, result: None
+    run_engine(module, read_timeout=3)
+    assert module.connect_timeout == 2
+    assert module.read_timeout == 3
+    assert module.probe_deadline == 7
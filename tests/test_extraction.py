@@ -0,0 +1,108 @@
+"""Tests for the declarative extraction rules."""
+
+import re
+
+import pytest
+
+from fileroulette.libs.extraction import (
+    ExtractionRules,
+    JSONPath,
+    Regex,
+    Selector,
+    _Page,
+)
+
+PAGE = (
+    '<html><body><div id="main" class="box details">'
+    "<h3>file_<b>abc</b>.zip</h3><p>Size: 1.2 MB</p>"
+    "<a class='download' href=\"/get?id=1&amp;t=2\">Get</a>"
+    "</div></body></html>"
+)
+DOCUMENT = '{"data": [{"name": "report.pdf", "size": 1024}], "ok": true}'
+
+
+def _extract(extractor, text):
+    return extractor.extract(_Page(text))
+
+
+@pytest.mark.parametrize(
+    "extractor, value",
+    [
+        (Regex(r"Size:\s*([\d.]+)"), "1.2"),
+        (Regex(r"Size:\s*(?P<size>[\d.]+) (\w+)", group="size"), "1.2"),
+        (Regex(r"SIZE: ([\d.]+)", flags=re.IGNORECASE), "1.2"),
+        (Selector("div.details h3"), "file_abc.zip"),
+        (Selector("#main p"), "Size: 1.2 MB"),
+        (Selector(".details.box h3 b"), "abc"),
+        (Selector("a.download", attribute="href"), "/get?id=1&t=2"),
+        (Selector("div p", then=Regex(r"Size:\s*(.+)")), "1.2 MB"),
+    ],
+)
+def test_extractors_find_values_in_html(extractor, value):
+    assert _extract(extractor, PAGE) == value
+
+
+@pytest.mark.parametrize(
+    "extractor, value",
+    [
+        (JSONPath("ok"), True),
+        (JSONPath("data.0.name"), "report.pdf"),
+        (JSONPath("data.0.size"), 1024),
+        (JSONPath("data.0.name", then=Regex(r"\.(\w+)$")), "pdf"),
+    ],
+)
+def test_extractors_find_values_in_json(extractor, value):
+    assert _extract(extractor, DOCUMENT) == value
+
+
+@pytest.mark.parametrize(
+    "extractor, text",
+    [
+        (Regex(r"Size: (\d+) GB"), PAGE),
+        (Selector("div.missing h3"), PAGE),
+        (Selector("#main span"), PAGE),
+        (Selector("a.download", attribute="title"), PAGE),
+        (Selector("div.details h3"), '<div class="details"><h3>unclosed'),
+        (Selector("h3", then=Regex(r"(\d+)")), PAGE),
+        (JSONPath("data.1.name"), DOCUMENT),
+        (JSONPath("data.0.owner"), DOCUMENT),
+        (JSONPath("ok.name"), DOCUMENT),
+        (JSONPath("data"), PAGE),
+    ],
+)
+def test_extractors_find_nothing_without_a_match(extractor, text):
+    assert _extract(extractor, text) is None
+
+
+def test_unsupported_selectors_are_refused():
+    with pytest.raises(ValueError):
+        Selector("div > p")
+
+
+def test_rules_extract_every_field():
+    rules = ExtractionRules(
+        reject_markers=("Sorry it's gone...",),
+        fields={
+            "File Name": Selector("div.details h3"),
+            "File Size": Selector(
+                "div.details p", then=Regex(r"Size:\s*(.+)")
+            ),
+        },
+    )
+    assert rules.match(PAGE) == {
+        "File Name": "file_abc.zip",
+        "File Size": "1.2 MB",
+    }
+    assert rules.match(PAGE + "<h1>Sorry it's gone...</h1>") is False
+
+
+def test_rules_fail_if_any_field_is_missing_or_empty():
+    rules = ExtractionRules(
+        fields={"Name": Selector("h3"), "Owner": Regex(r"Owner: (\w*)")}
+    )
+    assert rules.match(PAGE) is False
+    assert rules.match(PAGE + "Owner: ") is False
+    assert rules.match(PAGE + "Owner: bob") == {
+        "Name": "file_abc.zip",
+        "Owner": "bob",
+    }
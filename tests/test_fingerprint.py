@@ -0,0 +1,72 @@
+"""Tests for recognizing dead pages from their headers."""
+
+import types
+
+from fileroulette.libs.fingerprint import FingerprintCache, fingerprint_of
+
+from conftest import is_live
+
+
+def _response(cookies=(), **headers):
+    return types.SimpleNamespace(
+        headers=headers, cookies={name: "1" for name in cookies}
+    )
+
+
+def test_fingerprints_need_a_length_or_an_etag():
+    assert fingerprint_of(_response(**{"Content-Type": "text/html"})) is None
+    headers = {"Content-Length": "53", "Content-Type": "text/html"}
+    response = _response(("sid", "lang"), **headers)
+    assert fingerprint_of(response) == (
+        "53",
+        "text/html",
+        None,
+        ("lang", "sid"),
+    )
+    assert fingerprint_of(_response(ETag='"v1"'))[2] == '"v1"'
+
+
+def test_dead_fingerprints_are_learned(monkeypatch):
+    monkeypatch.setattr("random.randrange", lambda stop: 1)
+    cache = FingerprintCache(threshold=2)
+    for number in range(2):
+        assert not cache.is_dead("dead")
+        cache.expect("https://x/{}".format(number), "dead")
+        cache.confirm("https://x/{}".format(number), False)
+    assert cache.is_dead("dead")
+    # Pages that were never expected don't count.
+    cache.confirm("https://x/other", False)
+    assert not cache.is_dead("other")
+
+
+def test_some_dead_pages_are_downloaded_anyway(monkeypatch):
+    monkeypatch.setattr("random.randrange", lambda stop: 0)
+    cache = FingerprintCache(threshold=1)
+    cache.expect("https://x/1", "dead")
+    cache.confirm("https://x/1", False)
+    assert not cache.is_dead("dead")
+
+
+def test_live_pages_are_never_skipped(monkeypatch):
+    monkeypatch.setattr("random.randrange", lambda stop: 1)
+    cache = FingerprintCache(threshold=1)
+    for number, live in enumerate((False, True, False)):
+        cache.expect("https://x/{}".format(number), "same")
+        cache.confirm("https://x/{}".format(number), live)
+    assert not cache.is_dead("same")
+
+
+def test_dead_pages_served_as_200_skip_the_get(local_site):
+    module = local_site("fingerprints/soft")
+    session = module._create_new_session()
+    for _ in range(60):
+        module._execute_scan(session)
+    received = module.received()
+    heads = [path for method, path, _ in received if method == "HEAD"]
+    gets = [path for method, path, _ in received if method == "GET"]
+    assert module.stats["gets_avoided"] >= 1
+    assert len(gets) + module.stats["gets_avoided"] == len(heads)
+    # Every live page was still downloaded.
+    live = [path for path in heads if is_live(path.split("/")[-1])]
+    assert set(live) <= set(gets)
+    assert module.stats["hits"] == len(live) >= 1
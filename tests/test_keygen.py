@@ -0,0 +1,53 @@
+"""Tests for the key generator and its batches."""
+
+import itertools
+import random
+
+import pytest
+
+from fileroulette import MODULE_DICT
+from fileroulette.libs.keygen import KeyGenerator
+from fileroulette.libs.keyspace import Keyspace
+
+# Key shapes as (charset, length), covering every way keys are chunked.
+SHAPES = (("a1", 5), ("a1", 6), ("aA1", 5), ("aA1", 8), ("a", 1), ("1", 3))
+
+
+@pytest.mark.parametrize("charset, length", SHAPES)
+def test_urls_match_encode(charset, length):
+    keygen = KeyGenerator("https://example.site/{}/", charset, length)
+    indexes = [random.randrange(keygen.size) for _ in range(1000)]
+    indexes += [0, keygen.size - 1]
+    urls = keygen.urls(indexes)
+    assert urls == [keygen.url(keygen.encode(index)) for index in indexes]
+    for index, url in zip(indexes, urls):
+        assert keygen.decode(keygen.key_from_url(url)) == index
+
+
+def test_encode_follows_pool_order():
+    keygen = KeyGenerator("{}", "1", 3)
+    keys = ["".join(key) for key in itertools.product(keygen.pool, repeat=3)]
+    assert [keygen.encode(index) for index in range(keygen.size)] == keys
+
+
+@pytest.mark.parametrize("charset, length", SHAPES + (("a1", 12),))
+def test_permute_many_matches_permute(charset, length):
+    keyspace = Keyspace(charset, length, seed=1)
+    positions = [random.randrange(keyspace.size) for _ in range(1000)]
+    positions += [0, keyspace.size - 1]
+    assert keyspace.permute_many(positions) == [
+        keyspace.permute(position) for position in positions
+    ]
+    with pytest.raises(IndexError):
+        keyspace.permute_many([keyspace.size])
+
+
+@pytest.mark.parametrize("name", ["gofileio", "upfile"])
+def test_url_batch_follows_walk(name):
+    module = MODULE_DICT[name](agent=False, proxy=False)
+    module.select_shard(0, 1, 1)
+    urls = module._next_url_batch() + module._next_url_batch()
+    assert urls == [
+        module.keygen.url(module.keyspace.key_at(position))
+        for position in range(len(urls))
+    ]
@@ -0,0 +1,56 @@
+"""Tests for the keyspace walk."""
+
+import pytest
+
+from fileroulette.libs.keyspace import Keyspace
+
+
+@pytest.mark.parametrize("charset, length", [("1", 3), ("a", 2), ("a1", 2)])
+def test_walk_visits_every_key_once(charset, length):
+    keyspace = Keyspace(charset, length, seed=3)
+    indexes = [keyspace.permute(p) for p in range(keyspace.size)]
+    assert sorted(indexes) == list(range(keyspace.size))
+    assert [keyspace.position(i) for i in indexes] == list(
+        range(keyspace.size)
+    )
+    keys = list(keyspace.walk())
+    assert len(set(keys)) == keyspace.size == len(keys)
+    assert [keyspace.index(key) for key in keys] == indexes
+
+
+def test_round_trip_in_a_large_keyspace():
+    keyspace = Keyspace("aA1", 8, seed=11)
+    for position in (0, 1, 12345678, keyspace.size - 1):
+        index = keyspace.permute(position)
+        assert 0 <= index < keyspace.size
+        assert keyspace.position(index) == position
+        assert keyspace.index(keyspace.key_at(position)) == index
+
+
+def test_seed_decides_the_order():
+    (first, again, other) = [Keyspace("a1", 5, seed) for seed in (1, 1, 2)]
+    walk = [first.permute(p) for p in range(100)]
+    assert walk == [again.permute(p) for p in range(100)]
+    assert walk != [other.permute(p) for p in range(100)]
+    # Walks are scattered, rather than counting up.
+    assert walk != sorted(walk)
+
+
+def test_shards_split_the_walk():
+    keyspace = Keyspace("a1", 5, seed=1)
+    shards = [keyspace.shard(index, 7, align=256) for index in range(7)]
+    assert shards[0][0] == 0
+    assert shards[-1][1] == keyspace.size
+    for (_, stop), (start, _) in zip(shards, shards[1:]):
+        assert stop == start
+        assert start % 256 == 0
+    with pytest.raises(IndexError):
+        keyspace.shard(7, 7)
+
+
+def test_positions_outside_the_keyspace():
+    keyspace = Keyspace("1", 2, seed=1)
+    with pytest.raises(IndexError):
+        keyspace.permute(100)
+    with pytest.raises(IndexError):
+        keyspace.position(-1)
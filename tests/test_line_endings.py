@@ -0,0 +1,44 @@
+"""Check that every file keeps the line endings of its part of the tree."""
+
+import glob
+import os
+
+import pytest
+
+# The root of the repository.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# The files with CRLF line endings, as in .gitattributes. Every other source
+# file has LF line endings.
+CRLF_PATTERNS = (
+    "fileroulette.py",
+    "fileroulette/**/*.py",
+    "requirements*.txt",
+)
+LF_PATTERNS = ("*.py", "benchmarks/**/*.py", "tests/*.py", "tools/*.py")
+
+
+def _paths(patterns):
+    """List the files matching any of the patterns, relative to ROOT."""
+    found = set()
+    for pattern in patterns:
+        for path in glob.glob(os.path.join(ROOT, pattern), recursive=True):
+            found.add(os.path.relpath(path, ROOT))
+    return sorted(found)
+
+
+def _read(path):
+    with open(os.path.join(ROOT, path), "rb") as source:
+        return source.read()
+
+
+@pytest.mark.parametrize("path", _paths(CRLF_PATTERNS))
+def test_package_files_use_crlf(path):
+    content = _read(path)
+    assert content.count(b"\n") == content.count(b"\r\n")
+
+
+@pytest.mark.parametrize(
+    "path", sorted(set(_paths(LF_PATTERNS)) - set(_paths(CRLF_PATTERNS)))
+)
+def test_other_files_use_lf(path):
+    assert b"\r" not in _read(path)
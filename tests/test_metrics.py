@@ -0,0 +1,80 @@
+"""Tests for exporting and summarizing a scan's metrics."""
+
+import pytest
+
+from fileroulette.libs.metrics import (
+    Histogram,
+    format_summary,
+    render_prometheus,
+)
+
+
+def _histogram(*latencies):
+    histogram = Histogram(buckets=(0.1, 1.0))
+    for latency in latencies:
+        histogram.observe(latency)
+    return histogram
+
+
+def test_buckets_are_cumulative_and_end_at_inf():
+    text = render_prometheus(
+        dict(), {"head": _histogram(0.05, 0.5, 0.7, 3.0)}
+    )
+    lines = text.splitlines()
+    metric = "fileroulette_latency_seconds"
+    assert "# TYPE {} histogram".format(metric) in lines
+    assert [line for line in lines if "_bucket" in line] == [
+        metric + '_bucket{le="0.1",stage="head"} 1',
+        metric + '_bucket{le="1.0",stage="head"} 3',
+        metric + '_bucket{le="+Inf",stage="head"} 4',
+    ]
+    assert metric + '_sum{stage="head"} 4.25' in lines
+    assert metric + '_count{stage="head"} 4' in lines
+
+
+def test_counters_are_labelled_by_category():
+    stats = {"probes": 12, "status_4xx": 10, "exception_Timeout": 2}
+    lines = render_prometheus(stats, dict(), {"module": "upfile"}).splitlines()
+    assert "# TYPE fileroulette_probes_total counter" in lines
+    assert 'fileroulette_probes_total{module="upfile"} 12' in lines
+    assert (
+        'fileroulette_responses_total{category="4xx",module="upfile"} 10'
+        in lines
+    )
+    assert (
+        'fileroulette_exceptions_total{module="upfile",type="Timeout"} 2'
+        in lines
+    )
+
+
+def test_label_values_are_escaped():
+    text = render_prometheus({"probes": 1}, dict(), {"job": 'a "b" \\c'})
+    assert 'fileroulette_probes_total{job="a \\"b\\" \\\\c"} 1' in text
+
+
+def test_quantiles_are_interpolated_within_buckets():
+    histogram = _histogram(0.05, 0.5, 0.7, 3.0)
+    # The median is halfway through the second bucket, which holds two of
+    # the four latencies.
+    assert histogram.quantile(0.5) == pytest.approx(0.55)
+    assert histogram.quantile(0.25) == pytest.approx(0.1)
+    # The unbounded bucket has nothing to interpolate towards.
+    assert histogram.quantile(1.0) == 1.0
+    assert Histogram().quantile(0.5) is None
+
+
+def test_summary_shows_the_rate_and_latencies():
+    stats = {
+        "probes": 300,
+        "hits": 2,
+        "bytes_received": 3 * 1024 * 1024,
+        "status_4xx": 250,
+        "status_2xx": 50,
+        "exception_Timeout": 3,
+    }
+    histograms = {"head": _histogram(0.05, 0.5, 0.7, 3.0), "get": Histogram()}
+    line = format_summary(stats, histograms, {"probes": 100}, 10.0)
+    assert line == (
+        "300 probes (20.0/s), 2 hits, 3.0 MB received | "
+        "head p50=550ms p95=1.0s | 2xx=50 4xx=250 | 3 exceptions"
+    )
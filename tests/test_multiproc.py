@@ -0,0 +1,77 @@
+"""Tests for running a module across several worker processes."""
+
+import pytest
+
+from fileroulette.libs import module_loader, multiproc
+
+from conftest import LocalSite, RecordingSink
+
+
+class _Process(multiproc.multiprocessing.Process):
+    """A worker process which is kept track of, to check how it exited."""
+
+    started = list()
+
+    def start(self):
+        self.started.append(self)
+        super(_Process, self).start()
+
+
+@pytest.fixture
+def local_module(local_site, monkeypatch):
+    """Register modules for the local site, small enough to scan in full."""
+    port = local_site().base_url.split(":")[2].split("/")[0]
+
+    class Local(LocalSite):
+        allowed_chars = "1"
+        key_length = 2
+
+        def __init__(self, agent=False, proxy=False):
+            super(Local, self).__init__(int(port))
+
+    class Empty(Local):
+        def check_content(self, content):
+            return False
+
+    monkeypatch.setitem(module_loader.MODULE_DICT, "local", Local)
+    monkeypatch.setitem(module_loader.MODULE_DICT, "empty", Empty)
+    monkeypatch.setattr(multiproc.multiprocessing, "Process", _Process)
+    _Process.started.clear()
+    return Local
+
+
+def _exit_codes():
+    return [worker.exitcode for worker in _Process.started]
+
+
+def test_every_hit_is_reported_once(local_module, capsys):
+    sink = RecordingSink()
+    stats = multiproc.run_processes(
+        "local", 2, sink=sink, engine="threads", concurrency=4
+    )
+    keys = [key for _, _, key in sink.written]
+    assert len(keys) == len(set(keys)) == stats["hits"] >= 1
+    # Only the first hit is displayed.
+    assert capsys.readouterr().out.count("Found one!") == 1
+    # The workers exited by themselves, rather than being terminated.
+    assert _exit_codes() == [0, 0]
+
+
+def test_shards_cover_the_keyspace_once(local_module, tmp_path):
+    stats = multiproc.run_processes(
+        "empty",
+        2,
+        coverage_dir=str(tmp_path),
+        engine="threads",
+        concurrency=4,
+    )
+    module = local_module()
+    module.enable_coverage(str(tmp_path))
+    try:
+        # Every key was probed by one worker or the other, and none by both.
+        assert stats["probes"] == module.keyspace.size
+        assert module.coverage.count() == module.keyspace.size
+    finally:
+        module.coverage.close()
+    assert stats["hits"] == 0
+    assert _exit_codes() == [0, 0]
@@ -0,0 +1,96 @@
+"""Tests for checking pages in a pool of parser processes."""
+
+import threading
+import time
+
+import pytest
+
+from fileroulette.libs.parsing import ParserPool
+
+from conftest import DEAD_PAGE, LIVE_PAGE, RecordingSink
+
+
+@pytest.fixture
+def parser_pool():
+    pool = ParserPool("upfile", 2)
+    yield pool
+    pool.close()
+
+
+def test_results_are_handed_to_callbacks(parser_pool):
+    results = dict()
+    pages = [("live", LIVE_PAGE.format("abcde")), ("dead", DEAD_PAGE)]
+    for name, page in pages:
+        parser_pool.submit(
+            page.encode(),
+            lambda future, name=name: results.update({name: future.result()}),
+        )
+    parser_pool.wait()
+    assert results == {
+        "live": {"File Name": "file_abcde.zip", "File Size": "1.2 MB"},
+        "dead": False,
+    }
+
+
+def test_wait_covers_the_callbacks(parser_pool):
+    finished = list()
+
+    def slow_callback(future):
+        time.sleep(0.3)
+        finished.append(future.result())
+
+    future = parser_pool.submit(DEAD_PAGE.encode(), slow_callback)
+    future.result()
+    assert finished == []
+    parser_pool.wait()
+    assert finished == [False]
+
+
+def test_closing_cancels_waiting_pages():
+    pool = ParserPool("upfile", 1)
+    futures = [pool.submit(DEAD_PAGE.encode() * 1000) for _ in range(8)]
+    pool.close()
+    pool.wait()
+    assert any(future.cancelled() for future in futures)
+
+
+def test_scans_move_on_while_pages_are_parsed(local_site):
+    module = local_site()
+    module.start_parser_pool(2)
+    displayed = list()
+    module.result_handler = lambda url, result: displayed.append(url)
+    session = module._create_new_session()
+    found = threading.Event()
+    try:
+        scans = 0
+        while not found.wait(0) and scans < 200:
+            # The scan never waits for its page to be checked.
+            assert not module._execute_scan(session, found)
+            scans += 1
+        module._wait_for_parsers()
+    finally:
+        module.stop_parser_pool()
+    assert found.is_set()
+    assert len(displayed) == 1
+    assert module.stats["hits"] >= 1
+
+
+@pytest.mark.parametrize("engine", ["run", "run_pipeline"])
+def test_engines_report_hits_from_the_parser_pool(local_site, engine):
+    module = local_site()
+    module.start_parser_pool(2)
+    displayed = list()
+    module.result_handler = lambda url, result: displayed.append(url)
+    sink = RecordingSink()
+    module.use_sink(sink)
+    try:
+        getattr(module, engine)()
+        written = len(sink.written)
+        # Every hit was reported before the engine returned.
+        time.sleep(0.3)
+        assert len(sink.written) == written == module.stats["hits"] >= 1
+    finally:
+        module.stop_parser_pool()
+    assert len(displayed) == 1
+    (_, _, parsed) = module.histograms["check_output"].snapshot()
+    assert parsed >= 1
@@ -0,0 +1,101 @@
+"""Tests for the staged pipeline engine."""
+
+import itertools
+import threading
+import time
+
+import pytest
+
+from fileroulette.libs.pipeline import Pipeline, Stage
+
+
+def _source(limit):
+    """Return a source stage function counting up to `limit`."""
+    counter = itertools.count()
+    lock = threading.Lock()
+
+    def source(state, item):
+        with lock:
+            number = next(counter)
+        if number >= limit:
+            time.sleep(0.01)
+            return None
+        return number
+
+    return source
+
+
+def test_items_flow_through_every_stage():
+    collected = list()
+    states = list()
+
+    def setup():
+        states.append(object())
+        return states[-1]
+
+    def double(state, item):
+        assert state in states
+        return item * 2
+
+    def collect(state, item):
+        collected.append(item)
+        if len(collected) == 50:
+            pipeline.stop()
+
+    pipeline = Pipeline(
+        [
+            Stage("source", _source(50)),
+            Stage("double", double, workers=3, setup=setup),
+            Stage("collect", collect),
+        ],
+        queue_size=4,
+    )
+    pipeline.run()
+    assert sorted(collected) == list(range(0, 100, 2))
+    # Every worker of the stage got a state of its own.
+    assert len(states) == 3
+
+
+def test_a_slow_stage_holds_back_the_ones_before_it():
+    produced = list()
+    depths = list()
+
+    def source(state, item):
+        produced.append(len(produced))
+        return produced[-1]
+
+    def slow(state, item):
+        time.sleep(0.02)
+        depths.append(pipeline.depths()["slow"])
+        if item == 20:
+            pipeline.stop()
+
+    pipeline = Pipeline([Stage("source", source), Stage("slow", slow)], 5)
+    pipeline.run()
+    assert max(depths) == 5
+    # The source waited for room in the queue, rather than running ahead.
+    assert len(produced) <= 21 + 5 + 1
+
+
+def test_errors_stop_the_pipeline_and_are_raised():
+    def fail(state, item):
+        if item == 3:
+            raise ValueError("bad item")
+        return item
+
+    pipeline = Pipeline(
+        [
+            Stage("source", _source(10)),
+            Stage("fail", fail, workers=2),
+            Stage("drop", lambda state, item: None),
+        ]
+    )
+    with pytest.raises(ValueError, match="bad item"):
+        pipeline.run()
+    assert pipeline.stopped()
+
+
+def test_run_pipeline_stops_at_the_first_hit(local_site, capsys):
+    module = local_site()
+    module.run_pipeline(workers={"probe": 8, "fetch": 2})
+    assert capsys.readouterr().out.count("Found one!") == 1
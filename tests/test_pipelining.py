@@ -0,0 +1,50 @@
+"""Tests for pipelining requests over a keep-alive connection."""
+
+import socket
+
+import requests
+
+from fileroulette.libs.pipelining import PipelinedConnection
+
+
+def _urls(module, count):
+    return [module.keygen.url("key{:02}".format(n)) for n in range(count)]
+
+
+def test_responses_come_back_in_order(local_site):
+    urls = _urls(local_site(), 12)
+    connection = PipelinedConnection(urls[0], read_timeout=5)
+    try:
+        responses = connection.request_many("HEAD", urls)
+        sock = connection._sock
+        # Later batches reuse the same connection.
+        assert len(connection.request_many("GET", urls[:3])) == 3
+        assert connection._sock is sock
+    finally:
+        connection.close()
+    assert [response.url for response in responses] == urls
+    assert [response.status_code for response in responses] == [
+        requests.head(url).status_code for url in urls
+    ]
+
+
+def test_batch_is_sent_again_if_the_idle_connection_was_closed(local_site):
+    urls = _urls(local_site(), 4)
+    connection = PipelinedConnection(urls[0], read_timeout=5)
+    # Stand in for a kept-alive connection the server has since closed.
+    (connection._sock, server_end) = socket.socketpair()
+    server_end.close()
+    try:
+        responses = connection.request_many("HEAD", urls)
+    finally:
+        connection.close()
+    assert [response.url for response in responses] == urls
+
+
+def test_nothing_is_returned_if_the_site_is_down():
+    with socket.socket() as unused:
+        unused.bind(("127.0.0.1", 0))
+        url = "http://127.0.0.1:{}/abcde".format(unused.getsockname()[1])
+    connection = PipelinedConnection(url, connect_timeout=1)
+    assert connection.request_many("HEAD", [url]) == []
+    assert connection._sock is None
@@ -0,0 +1,49 @@
+"""Tests for the probe strategies modules can declare."""
+
+import pytest
+
+from fileroulette.modules import PROBE_API, PROBE_GET, PROBE_HEAD_GET
+
+from conftest import is_live
+
+# The number of keys scanned by each test.
+SCANS = 40
+
+
+def _scan(module):
+    """Scan a few keys, and return the requests the site received."""
+    session = module._create_new_session()
+    for _ in range(SCANS):
+        module._execute_scan(session)
+    return module.received()
+
+
+def _paths(received, method):
+    return [path for sent, path, _ in received if sent == method]
+
+
+def test_head_get_downloads_live_pages_only(local_site):
+    module = local_site("probing/head-get")
+    module.probe_strategy = PROBE_HEAD_GET
+    received = _scan(module)
+    heads = _paths(received, "HEAD")
+    assert len(heads) == len(set(heads)) == SCANS
+    # Only the pages whose header said they're there are downloaded.
+    live = [path for path in heads if is_live(path.split("/")[-1])]
+    assert _paths(received, "GET") == live
+    assert module.stats["hits"] == len(live) >= 1
+
+
+@pytest.mark.parametrize(
+    "strategy, accept", [(PROBE_GET, "*/*"), (PROBE_API, "application/json")]
+)
+def test_single_request_strategies_skip_the_head(local_site, strategy, accept):
+    module = local_site("probing/" + strategy)
+    module.probe_strategy = strategy
+    received = _scan(module)
+    gets = _paths(received, "GET")
+    # Every key costs one request, whether its page is live or not.
+    assert len(received) == len(set(gets)) == SCANS
+    assert {headers["Accept"] for _, _, headers in received} == {accept}
+    live = [path for path in gets if is_live(path.split("/")[-1])]
+    assert module.stats["hits"] == len(live) >= 1
@@ -0,0 +1,50 @@
+"""Tests for fileroulette.libs.profiling."""
+
+import threading
+
+import pytest
+
+from fileroulette.libs.profiling import PROFILERS
+
+
+def _busy():
+    """Use a little CPU time."""
+    return sum(index * index for index in range(200000))
+
+
+@pytest.mark.parametrize("kind", sorted(PROFILERS))
+def test_threaded_scan(kind, local_site, tmp_path):
+    module = local_site()
+    displayed = list()
+    module.result_handler = lambda url, result: displayed.append(url)
+    profiler = PROFILERS[kind]("local", str(tmp_path))
+    profiler.start()
+    try:
+        module.run_threads(concurrency=10)
+    finally:
+        path = profiler.stop()
+    # The profiler mustn't break the scan's threads.
+    assert len(displayed) == 1
+    with open(path) as report_file:
+        report = report_file.read()
+    assert report.startswith("Profile of local ({})".format(kind))
+    if kind == "cprofile":
+        # Calls made on the executor's threads are profiled too.
+        assert "_execute_scan" in report
+        assert "requests" in report.split("Top functions")[0]
+
+
+def test_cprofile_sees_every_thread(tmp_path):
+    profiler = PROFILERS["cprofile"]("threads", str(tmp_path))
+    profiler.start()
+    threads = [threading.Thread(target=_busy) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # A report can be written while the profiler is still running.
+    report = profiler.report()
+    profiler.stop()
+    lines = [line for line in report.split("\n") if "(_busy)" in line]
+    # The calls on all four threads are counted.
+    assert lines and lines[0].split()[0].split("/")[0] == "4"
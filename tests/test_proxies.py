@@ -0,0 +1,237 @@
+"""Tests for checking, ranking and sharing proxies."""
+
+import socket
+import socketserver
+import struct
+import threading
+import time
+
+import pytest
+
+from fileroulette.libs.proxies import (
+    FAILURE_THRESHOLD,
+    NoHealthyProxies,
+    ProxyCheck,
+    ProxyPool,
+    check_proxy,
+    validate_proxies,
+)
+
+
+class _SocksHandler(socketserver.BaseRequestHandler):
+    """Relay a connection as a SOCKS5 proxy, after the server's delay."""
+
+    def _pipe(self, source, target):
+        try:
+            while True:
+                data = source.recv(65536)
+                if not data:
+                    break
+                target.sendall(data)
+        except OSError:
+            pass
+        finally:
+            target.close()
+
+    def _read(self, size):
+        data = b""
+        while len(data) < size:
+            chunk = self.request.recv(size - len(data))
+            if not chunk:
+                raise ConnectionError("The client hung up.")
+            data += chunk
+        return data
+
+    def handle(self):
+        time.sleep(self.server.delay)
+        (_, methods) = self._read(2)
+        self._read(methods)
+        self.request.sendall(b"\x05\x00")
+        (_, _, _, kind) = self._read(4)
+        if kind == 1:
+            host = socket.inet_ntoa(self._read(4))
+        else:
+            host = self._read(self._read(1)[0]).decode()
+        (port,) = struct.unpack("!H", self._read(2))
+        upstream = socket.create_connection((host, port))
+        self.request.sendall(b"\x05\x00\x00\x01" + bytes(6))
+        threading.Thread(
+            target=self._pipe, args=(upstream, self.request), daemon=True
+        ).start()
+        self._pipe(self.request, upstream)
+
+
+class _SocksServer(socketserver.ThreadingTCPServer):
+    """A SOCKS5 proxy on a free local port."""
+
+    daemon_threads = True
+
+
+@pytest.fixture
+def socks_proxy():
+    """Start SOCKS5 proxies, and return a function making one more."""
+    servers = list()
+
+    def start(delay=0.0):
+        server = _SocksServer(("127.0.0.1", 0), _SocksHandler)
+        server.delay = delay
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server.server_address
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def _dead_proxy():
+    """Return the address of a port nobody listens on."""
+    with socket.socket() as unused:
+        unused.bind(("127.0.0.1", 0))
+        return unused.getsockname()
+
+
+@pytest.fixture
+def check_url(local_site):
+    return local_site().base_url.format("abcde")
+
+
+def test_check_proxy(socks_proxy, check_url):
+    proxy = socks_proxy()
+    check = check_proxy(proxy, check_url, timeout=2)
+    assert check.proxy == proxy
+    assert check.alive
+    assert 0 < check.latency < 2
+    dead = _dead_proxy()
+    assert check_proxy(dead, check_url, 2) == ProxyCheck(dead, False, None)
+
+
+def test_validate_proxies_checks_concurrently(socks_proxy, check_url):
+    fast = socks_proxy()
+    slow = [socks_proxy(delay=0.5) for _ in range(4)]
+    dead = _dead_proxy()
+    # A proxy which accepts connections, but never answers.
+    silent = socket.socket()
+    silent.bind(("127.0.0.1", 0))
+    silent.listen()
+    try:
+        started = time.monotonic()
+        checks = validate_proxies(
+            slow + [dead, silent.getsockname(), fast], check_url, timeout=1
+        )
+        elapsed = time.monotonic() - started
+    finally:
+        silent.close()
+    # Every check ran at once, so the whole list took about one timeout.
+    assert elapsed < 2
+    assert checks[0] == ProxyCheck(fast, True, checks[0].latency)
+    assert {check.proxy for check in checks[1:5]} == set(slow)
+    assert all(check.latency >= 0.5 for check in checks[1:5])
+    assert [check.alive for check in checks[5:]] == [False, False]
+    assert validate_proxies([]) == []
+
+
+def test_pool_favours_fast_reliable_proxies():
+    (fast, slow, flaky) = [("10.0.0.{}".format(n), 1080) for n in range(3)]
+    pool = ProxyPool(
+        [
+            ProxyCheck(fast, True, 0.1),
+            ProxyCheck(slow, True, 1.0),
+            ProxyCheck(flaky, True, 0.1),
+        ],
+        retest_interval=3600,
+    )
+    try:
+        for _ in range(FAILURE_THRESHOLD - 1):
+            pool.failure(flaky)
+            pool.success(flaky, 0.1)
+            pool.success(fast, 0.1)
+        chosen = [pool.choose() for _ in range(3000)]
+        assert chosen.count(fast) > chosen.count(flaky) > chosen.count(slow)
+        # A preferred proxy is kept while its breaker is closed.
+        assert pool.choose(preferred=slow) == slow
+    finally:
+        pool.close()
+
+
+def test_breakers_trip_and_recover(socks_proxy, check_url):
+    (live, dead) = (socks_proxy(), _dead_proxy())
+    pool = ProxyPool(
+        [ProxyCheck(live, True, 0.1), ProxyCheck(dead, True, 0.1)],
+        check_url=check_url,
+        check_timeout=2,
+        retest_interval=0.2,
+    )
+    try:
+        # Failures only trip the breaker once they come in a row.
+        pool.failure(dead)
+        pool.success(dead, 0.1)
+        for _ in range(FAILURE_THRESHOLD - 1):
+            assert not pool.failure(dead)
+        assert pool.failure(dead)
+        assert pool.healthy() == 1
+        assert pool.choose(preferred=dead) == live
+        # With every breaker open, choosing waits for the background checks
+        # to revive a live proxy, and the dead one stays out.
+        pool.trip(live)
+        assert pool.healthy() == 0
+        started = time.monotonic()
+        assert pool.choose() == live
+        assert time.monotonic() - started >= 0.1
+        time.sleep(0.5)
+        assert pool.healthy() == 1
+    finally:
+        pool.close()
+
+
+def test_choosing_gives_up_when_no_proxy_recovers(check_url):
+    dead = _dead_proxy()
+    pool = ProxyPool(
+        [ProxyCheck(dead, True, 0.1)],
+        check_url=check_url,
+        check_timeout=1,
+        retest_interval=0.1,
+        wait_timeout=0.5,
+    )
+    try:
+        pool.trip(dead)
+        started = time.monotonic()
+        with pytest.raises(NoHealthyProxies):
+            pool.choose()
+        assert 0.5 <= time.monotonic() - started < 2
+    finally:
+        pool.close()
+
+
+def test_closing_wakes_waiting_choices():
+    proxy = ("10.0.0.1", 1080)
+    pool = ProxyPool([ProxyCheck(proxy, True, 0.1)], retest_interval=3600)
+    pool.trip(proxy)
+    errors = list()
+
+    def choose():
+        try:
+            pool.choose()
+        except NoHealthyProxies as error:
+            errors.append(error)
+
+    thread = threading.Thread(target=choose)
+    thread.start()
+    time.sleep(0.2)
+    pool.close()
+    thread.join(timeout=2)
+    assert not thread.is_alive()
+    assert len(errors) == 1
+
+
+def test_module_stops_once_no_proxy_is_left(local_site, capsys):
+    module = local_site()
+    module.use_proxies([ProxyCheck(_dead_proxy(), True, 0.1)])
+    module.proxy_pool.wait_timeout = 0.2
+    try:
+        module.run()
+    finally:
+        module.proxy_pool.close()
+    assert "No live proxies available!" in capsys.readouterr().out
+    assert module.stats["proxy_trips"] == 1
@@ -0,0 +1,47 @@
+"""Tests for learning how a site redirects its URLs."""
+
+import pytest
+
+from fileroulette.libs.redirects import (
+    CONFIRMATIONS,
+    RedirectCache,
+    _rewrite_rule,
+)
+from fileroulette.modules import PROBE_GET, PROBE_HEAD_GET
+
+
+def test_redirects_become_prefix_rules():
+    assert _rewrite_rule(
+        "https://uploadfiles.io/abcde", "https://ufile.io/abcde"
+    ) == ("https://uploadfiles", "https://ufile")
+    # A redirect which loses the key can't be predicted.
+    assert _rewrite_rule("https://x.io/abcde", "https://x.io/gone") is None
+    assert _rewrite_rule("https://x.io/abcde", "https://y.io/cde") is None
+
+
+def test_rules_are_used_once_confirmed():
+    cache = RedirectCache()
+    for number in range(CONFIRMATIONS):
+        assert cache.predict("https://old.io/key") is None
+        cache.learn(
+            "https://old.io/{}".format(number),
+            "https://new.io/{}".format(number),
+        )
+    assert cache.predict("https://old.io/key") == "https://new.io/key"
+    assert cache.predict("https://other.io/key") is None
+    cache.invalidate("https://old.io/key")
+    assert cache.predict("https://old.io/key") is None
+
+
+@pytest.mark.parametrize("strategy", [PROBE_HEAD_GET, PROBE_GET])
+def test_learned_redirects_are_skipped(local_site, strategy):
+    module = local_site("redirects/{}/old".format(strategy))
+    module.probe_strategy = strategy
+    session = module._create_new_session()
+    for _ in range(20):
+        module._execute_scan(session)
+    moved = [path for _, path, _ in module.received() if "/old/" in path]
+    # Once the rule is learned, probes go straight to the new URLs.
+    assert len(moved) == CONFIRMATIONS
+    assert module.stats["redirects_skipped"] == 20 - CONFIRMATIONS
+    assert module.stats["hits"] >= 1
@@ -0,0 +1,46 @@
+"""Tests for the retry queue."""
+
+import time
+
+from fileroulette.libs.retry import RetryQueue
+
+
+def _wait_and_pop(retries, fresh=False):
+    """Wait until the next retry is due, then take it."""
+    time.sleep(retries.next_due())
+    return retries.pop(fresh)
+
+
+def test_backoff_grows_until_given_up():
+    retries = RetryQueue(max_attempts=4, base_delay=0.04)
+    url = "https://x/abcde"
+    for attempt in range(3):
+        assert retries.push(url)
+        # Pushing a URL that is already waiting doesn't add it twice.
+        assert retries.push(url)
+        delay = 0.04 * 2 ** attempt
+        assert delay / 2 - 0.01 <= retries.next_due() <= delay
+        assert retries.pop() is None
+        assert _wait_and_pop(retries) == url
+    assert not retries.push(url)
+    assert len(retries) == 0
+    assert retries.next_due() is None
+
+
+def test_finish_forgets_dealt_with_urls():
+    retries = RetryQueue(base_delay=0.01)
+    retries.push("https://x/1")
+    assert not retries.finish("https://x/1")
+    assert _wait_and_pop(retries) == "https://x/1"
+    assert retries.finish("https://x/1")
+    assert not retries.finish("https://x/2")
+
+
+def test_retries_share_turns_with_fresh_urls():
+    retries = RetryQueue(base_delay=0.0, share=0.25)
+    for number in range(10):
+        retries.push("https://x/{}".format(number))
+    handed_out = [retries.pop(fresh=True) for _ in range(20)]
+    assert sum(url is not None for url in handed_out) == 5
+    # Once there are no fresh URLs left, retries are handed out at once.
+    assert all(retries.pop(fresh=False) for _ in range(5))
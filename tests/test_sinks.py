@@ -0,0 +1,110 @@
+"""Tests for the result sinks."""
+
+import csv
+import json
+
+import pytest
+
+from fileroulette.libs import sinks
+
+# A result, as a module's `check_output` returns it.
+RESULT = {"File Name": "photos.zip", "File Size": "48.2 MB"}
+
+
+@pytest.mark.parametrize("fsync", sinks.FSYNC_POLICIES)
+def test_jsonl_writes_everything_on_close(tmp_path, fsync):
+    path = str(tmp_path / "results.jsonl")
+    sink = sinks.open_sink(path, fsync=fsync, batch_size=7)
+    for number in range(100):
+        sink.write("upfile", "https://x/{}".format(number), RESULT)
+    sink.close()
+    assert sink.written == 100
+    with open(path, encoding="utf-8") as results:
+        records = [json.loads(line) for line in results]
+    assert [record["url"] for record in records] == [
+        "https://x/{}".format(number) for number in range(100)
+    ]
+    assert records[0]["key"] == records[0]["url"]
+    assert records[0]["data"] == RESULT
+
+
+def test_csv_appends_under_one_header(tmp_path):
+    path = str(tmp_path / "results.csv")
+    for run in range(2):
+        sink = sinks.open_sink(path)
+        assert isinstance(sink, sinks.CSVSink)
+        sink.write("upfile", "https://x/{}".format(run), RESULT, key=str(run))
+        sink.close()
+    with open(path, encoding="utf-8", newline="") as results:
+        rows = list(csv.reader(results))
+    assert rows[0] == sinks.CSVSink.columns
+    assert [row[2] for row in rows[1:]] == ["0", "1"]
+    assert json.loads(rows[1][4]) == RESULT
+
+
+def test_write_after_close_raises(tmp_path):
+    sink = sinks.open_sink(str(tmp_path / "results.jsonl"))
+    sink.close()
+    with pytest.raises(sinks.SinkError):
+        sink.write("upfile", "https://x/0", RESULT)
+    # Closing again does nothing.
+    sink.close()
+
+
+def test_writer_failure_is_reported(tmp_path):
+    class FailingSink(sinks.JSONLSink):
+        def _write_batch(self, records):
+            raise OSError("disk full")
+
+    sink = FailingSink(str(tmp_path / "results.jsonl"))
+    sink.write("upfile", "https://x/0", RESULT)
+    with pytest.raises(sinks.SinkError, match="disk full"):
+        sink.close()
+    with pytest.raises(sinks.SinkError):
+        sink.write("upfile", "https://x/1", RESULT)
+
+
+def test_sqlite_keeps_one_row_per_key(tmp_path):
+    path = str(tmp_path / "results.db")
+    for run in range(3):
+        sink = sinks.open_sink(path)
+        assert isinstance(sink, sinks.SQLiteSink)
+        sink.write("upfile", "https://x/abcde", dict(RESULT, run=run), "abcde")
+        sink.write("gofileio", "https://y/{}".format(run), RESULT)
+        sink.close()
+    rows = sinks.query_results(path)
+    assert len(rows) == 4
+    (row,) = sinks.query_results(path, module="upfile")
+    assert row["sightings"] == 3
+    assert row["data"] == dict(RESULT, run=2)
+    assert row["file_name"] == "photos.zip"
+    assert row["first_seen"] <= row["last_seen"]
+
+
+def test_sqlite_queries(tmp_path):
+    path = str(tmp_path / "results.db")
+    sink = sinks.open_sink(path, fsync=sinks.FSYNC_BATCH)
+    for number in range(10):
+        result = {"File Name": "file{}.zip".format(number)}
+        sink.write("upfile", "https://x/{}".format(number), result)
+    sink.close()
+    assert [row["url"] for row in sinks.query_results(path, limit=3)] == [
+        "https://x/9", "https://x/8", "https://x/7"
+    ]
+    (row,) = sinks.query_results(path, search="file4")
+    assert row["key"] == "https://x/4"
+    assert sinks.query_results(path, since="9999-01-01") == []
+    assert sinks.query_results(path, module="gofileio") == []
+    with pytest.raises(FileNotFoundError):
+        sinks.query_results(str(tmp_path / "missing.db"))
+
+
+@pytest.mark.parametrize("folder", ["a b#c", "50%?x=1"])
+def test_sqlite_query_quotes_the_path(tmp_path, folder):
+    path = tmp_path / folder / "results.db"
+    path.parent.mkdir()
+    sink = sinks.open_sink(str(path))
+    sink.write("upfile", "https://x/abcde", RESULT, "abcde")
+    sink.close()
+    (row,) = sinks.query_results(str(path))
+    assert row["key"] == "abcde"
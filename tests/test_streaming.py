@@ -0,0 +1,68 @@
+"""Tests for inspecting pages while they download."""
+
+import os
+
+import pytest
+
+from fileroulette.libs.streaming import COMPLETE, REJECT, StreamMatcher
+from fileroulette.modules import upfile
+
+# The sample page of a live upfile file.
+LIVE_PAGE = os.path.join(
+    os.path.dirname(__file__), "..", "benchmarks", "pages", "upfile_live.html"
+)
+
+
+class _Response:
+    """Hand out a body in chunks, as a streamed response does."""
+
+    def __init__(self, body):
+        self.body = body
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+    def iter_content(self, chunk_size):
+        for offset in range(0, len(self.body), chunk_size):
+            yield self.body[offset:offset + chunk_size]
+
+
+def _feed(matcher, data, size):
+    """Feed data to a matcher in chunks of `size`, and return its verdict."""
+    for offset in range(0, len(data), size):
+        if matcher.feed(data[offset:offset + size]):
+            break
+    return matcher.verdict
+
+
+@pytest.mark.parametrize("size", [1, 3, 64])
+def test_patterns_split_across_chunks(size):
+    data = b"<p>header</p> ... Sorry it's gone... <p>"
+    assert _feed(StreamMatcher(reject=(b"gone",)), data, size) == REJECT
+    matcher = StreamMatcher(complete=(b"<p>", b"</p>"))
+    assert _feed(matcher, data, size) == COMPLETE
+    assert b"</p>" in matcher.content
+    matcher = StreamMatcher(complete=(b"</p>", b"<p>header"))
+    assert _feed(matcher, data, size) is None
+
+
+def test_reject_wins_within_a_chunk():
+    matcher = StreamMatcher(reject=(b"gone",), complete=(b"<p>",))
+    assert matcher.feed(b"<p>gone") == REJECT
+
+
+def test_upfile_rejects_markers_after_details():
+    module = upfile.Module(agent=False, proxy=False)
+    with open(LIVE_PAGE, "rb") as page:
+        body = page.read()
+    response = _Response(body)
+    content = module._read_content(response)
+    assert content == body
+    assert module.check_output(content.decode())
+    # The marker comes long after the file details.
+    marked = body.replace(b"</main>", b"<p>Premium Access Only</p></main>")
+    assert marked.index(b"Premium") > marked.index(b"Size:") + 1000
+    response = _Response(marked)
+    assert module._read_content(response) is False
+    assert response.closed
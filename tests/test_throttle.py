@@ -0,0 +1,106 @@
+"""Tests for the per-host AIMD throttle."""
+
+import email.utils
+import time
+
+import pytest
+import requests
+
+from fileroulette import run_engine
+from fileroulette.libs.throttle import HostLimiter, parse_retry_after
+from fileroulette.modules import upfile
+
+
+class _StatusTransport:
+    """Answer every request with the next of a list of status codes."""
+
+    multiplexed = False
+
+    def __init__(self, answers):
+        self.answers = list(answers)
+
+    def close(self):
+        pass
+
+    def send(self, session, method, url, **kwargs):
+        (status_code, headers) = self.answers.pop(0)
+        response = requests.Response()
+        response.status_code = status_code
+        response.url = url
+        response.headers.update(headers)
+        response._content = b""
+        return response
+
+
+def _saturate(limiter):
+    """Take all the room a limiter has, and return the start times."""
+    return [limiter.acquire() for _ in range(int(limiter.limit))]
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("120") == 120.0
+    assert parse_retry_after("-5") == 0.0
+    later = email.utils.formatdate(time.time() + 60, usegmt=True)
+    assert 58 <= parse_retry_after(later) <= 60
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
+
+
+def test_limit_grows_while_saturated_and_halves_on_throttling():
+    limiter = HostLimiter(initial=4, maximum=100)
+    for started in _saturate(limiter):
+        limiter.release(started, False)
+    # Slow start: one more for every clean, saturated response.
+    assert limiter.limit == 5
+    # Clean responses which weren't held back don't grow the limit.
+    limiter.release(limiter.acquire(), False)
+    assert limiter.limit == 5
+    started = _saturate(limiter)
+    limiter.release(started[0], True)
+    assert limiter.limit == 2.5
+    # Requests sent before the cut don't cut the limit again.
+    for earlier in started[1:]:
+        limiter.release(earlier, True)
+    assert limiter.limit == 2.5
+    # Out of slow start, the limit grows by one per round trip.
+    for _ in range(2):
+        for started in _saturate(limiter):
+            limiter.release(started, False)
+    assert 3 <= limiter.limit < 4
+
+
+def test_retry_after_pauses_the_host():
+    limiter = HostLimiter(initial=4)
+    limiter.release(limiter.acquire(), True, retry_after=0.3)
+    waited = time.monotonic()
+    limiter.cancel(limiter.acquire())
+    assert time.monotonic() - waited >= 0.25
+
+
+@pytest.mark.parametrize("status_code", [429, 503])
+def test_module_backs_off_when_throttled(status_code):
+    module = upfile.Module(agent=False, proxy=False)
+    module.transport = _StatusTransport(
+        [(404, {})] * 8 + [(status_code, {"Retry-After": "0.3"}), (404, {})]
+    )
+    session = module._create_new_session()
+    url = module.keygen.url("abcde")
+    limiter = module.throttle.for_url(url)
+    for _ in range(8):
+        module._send(session, "GET", url)
+    limit = limiter.limit
+    module._send(session, "GET", url)
+    assert limiter.limit == max(1, limit / 2)
+    assert module.stats["throttled"] == 1
+    waited = time.monotonic()
+    assert module._send(session, "GET", url).status_code == 404
+    assert time.monotonic() - waited >= 0.25
+
+
+def test_hosts_start_with_the_engine_concurrency(local_site):
+    module = local_site()
+    module.result_handler = lambda url, result: None
+    run_engine(module, engine="threads", concurrency=8, warm=False)
+    assert module.throttle.initial == 8
+    (limit,) = module.throttle.limits().values()
+    assert limit >= 8
@@ -0,0 +1,146 @@
+"""Tests for the transports, against a local HTTPS site."""
+
+import http.server
+import shutil
+import socketserver
+import ssl
+import subprocess
+import threading
+
+import pytest
+import requests
+
+from fileroulette.libs.transports import HTTP2Transport, http2_available
+
+pytestmark = pytest.mark.skipif(
+    not http2_available() or shutil.which("openssl") is None,
+    reason="needs httpx with HTTP/2 support, and openssl",
+)
+
+# The body of every page of the local site.
+BODY = b"<html>hello</html>"
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    """Answer every request with BODY, over HTTP/2 or HTTP/1.1."""
+
+    # Keep HTTP/1.1 connections open between requests.
+    protocol_version = "HTTP/1.1"
+
+    def _serve_h2(self):
+        """Answer requests over HTTP/2 until the client hangs up."""
+        import h2.config
+        import h2.connection
+        import h2.events
+
+        connection = h2.connection.H2Connection(
+            h2.config.H2Configuration(client_side=False)
+        )
+        connection.initiate_connection()
+        self.request.sendall(connection.data_to_send())
+        while True:
+            data = self.request.recv(65535)
+            if not data:
+                return
+            for event in connection.receive_data(data):
+                if isinstance(event, h2.events.RequestReceived):
+                    connection.send_headers(
+                        event.stream_id,
+                        [
+                            (":status", "200"),
+                            ("content-type", "text/html"),
+                            ("content-length", str(len(BODY))),
+                        ],
+                    )
+                    connection.send_data(
+                        event.stream_id, BODY, end_stream=True
+                    )
+            self.request.sendall(connection.data_to_send())
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(BODY)))
+        self.end_headers()
+        self.wfile.write(BODY)
+
+    def handle(self):
+        protocol = self.request.selected_alpn_protocol()
+        self.server.protocols.append(protocol)
+        if protocol == "h2":
+            self._serve_h2()
+        else:
+            super().handle()
+
+    def log_message(self, *args):
+        pass
+
+
+class _TLSServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    """An HTTPS server, offering the given protocols over ALPN."""
+
+    daemon_threads = True
+
+    def __init__(self, context):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.context = context
+        self.protocols = list()
+
+    def get_request(self):
+        (connection, address) = super().get_request()
+        connection = self.context.wrap_socket(connection, server_side=True)
+        return (connection, address)
+
+
+@pytest.fixture(scope="module")
+def certificate(tmp_path_factory):
+    folder = tmp_path_factory.mktemp("tls")
+    (cert, key) = (str(folder / "cert.pem"), str(folder / "key.pem"))
+    subprocess.run(
+        [
+            "openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes",
+            "-keyout", key, "-out", cert, "-days", "1",
+            "-subj", "/CN=localhost",
+            "-addext", "subjectAltName=IP:127.0.0.1",
+        ],
+        check=True,
+        capture_output=True,
+    )
+    return (cert, key)
+
+
+def _serve(certificate, protocols):
+    """Start a local HTTPS site offering `protocols`, and return it."""
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(*certificate)
+    context.set_alpn_protocols(protocols)
+    server = _TLSServer(context)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+@pytest.mark.parametrize(
+    "offered, spoken",
+    [(["h2", "http/1.1"], "h2"), (["http/1.1"], "http/1.1")],
+)
+def test_http2_negotiation(certificate, offered, spoken):
+    server = _serve(certificate, offered)
+    transport = HTTP2Transport(
+        connections=1,
+        ssl_context=ssl.create_default_context(cafile=certificate[0]),
+    )
+    url = "https://127.0.0.1:{}/abcde".format(server.server_address[1])
+    try:
+        for _ in range(3):
+            response = transport.send(
+                requests.Session(), "GET", url, timeout=5
+            )
+            assert response.status_code == 200
+            assert response.headers["Content-Type"] == "text/html"
+            assert response.content == BODY
+    finally:
+        transport.close()
+        server.shutdown()
+        server.server_close()
+    # Every request went over one connection, in the negotiated protocol.
+    assert server.protocols == [spoken]